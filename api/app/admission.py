@@ -0,0 +1,140 @@
+"""
+Per-user admission control in front of RunPod.
+
+Each dispatch is charged its estimated GPU-seconds against a token bucket
+keyed by (user, job_type), so a 720p 81-frame video costs hundreds of times
+what an img2img does and draws from a different bucket. Bucket size, refill
+rate, in-flight cap and scheduler priority come from the user's lane
+(ADMISSION_LANES), named by a claim in the token's app_metadata.
+
+Buckets live in process by default. ADMISSION_BACKEND may name a
+"module:Class" with the same async `take` and `refund` methods to share them
+across API processes (e.g. backed by Redis).
+
+A charge is refunded when RunPod refuses or can't be reached, so an outage
+doesn't leave users rate limited for jobs that never ran.
+"""
+import importlib
+import math
+import time
+
+from fastapi import HTTPException
+
+from .config import AdmissionLane, settings
+from .supabase_db import count_inflight_jobs
+
+
+class MemoryBackend:
+    """Token buckets in a dict; good for a single API process."""
+
+    _MAX_BUCKETS = 50000
+
+    def __init__(self):
+        # key -> (tokens, updated_at, full_at)
+        self._buckets: dict[str, tuple[float, float, float]] = {}
+
+    async def take(self, key: str, *, cost: float, rate: float, burst: float) -> float:
+        """Charge `cost`; returns 0 if admitted, else seconds until it would be.
+
+        A bucket may go negative so a job costing more than `burst` is still
+        admitted from a full bucket; the debt then delays the next one.
+        """
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        needed = min(cost, burst)
+        if tokens < needed:
+            self._store(key, tokens, now, rate, burst)
+            return (needed - tokens) / rate if rate > 0 else math.inf
+        self._store(key, tokens - cost, now, rate, burst)
+        return 0.0
+
+    async def refund(self, key: str, *, cost: float, rate: float, burst: float):
+        """Give back a charge taken by `take`, up to a full bucket."""
+        now = time.monotonic()
+        tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+        tokens = min(burst, tokens + (now - updated) * rate + cost)
+        self._store(key, tokens, now, rate, burst)
+
+    def _store(self, key: str, tokens: float, now: float, rate: float, burst: float):
+        full_at = now + (burst - tokens) / rate if rate > 0 else math.inf
+        self._buckets[key] = (tokens, now, full_at)
+        if len(self._buckets) > self._MAX_BUCKETS:
+            # Buckets that have refilled completely carry no state worth keeping
+            for stale in [k for k, (_, _, full) in self._buckets.items() if full <= now]:
+                del self._buckets[stale]
+
+
+def _load_backend(path: str):
+    if not path:
+        return MemoryBackend()
+    module_name, _, class_name = path.partition(":")
+    return getattr(importlib.import_module(module_name), class_name)()
+
+
+def lane_for(plan: str | None) -> tuple[str, AdmissionLane]:
+    name = plan if plan in settings.ADMISSION_LANES else settings.ADMISSION_DEFAULT_LANE
+    return name, settings.ADMISSION_LANES[name]
+
+
+def _too_many(detail: str, retry_after: float):
+    return HTTPException(
+        status_code=429,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(min(retry_after, 86400))))},
+    )
+
+
+class Admission:
+    def __init__(self, *, enabled: bool, backend):
+        self.enabled = enabled
+        self.backend = backend
+        self.stats = {"admitted": 0, "rejected_rate": 0, "rejected_inflight": 0, "refunded": 0}
+
+    async def admit(self, *, user_id: str, lane: AdmissionLane, job_type: str, cost: float | None):
+        """Raise 429 if this user may not start a job now; otherwise charge `cost` GPU-seconds.
+
+        Call after the job is claimed, so it counts toward its own in-flight total.
+        """
+        if not self.enabled:
+            return
+
+        inflight = await count_inflight_jobs(user_id=user_id)
+        if inflight > lane.max_inflight:
+            self.stats["rejected_inflight"] += 1
+            raise _too_many(
+                f"Too many jobs in progress (limit {lane.max_inflight})",
+                settings.ADMISSION_INFLIGHT_RETRY_AFTER,
+            )
+
+        retry_after = await self.backend.take(
+            f"{user_id}:{job_type}",
+            cost=cost if cost is not None else 1.0,
+            rate=lane.rate,
+            burst=lane.burst,
+        )
+        if retry_after > 0:
+            self.stats["rejected_rate"] += 1
+            raise _too_many(f"Rate limit exceeded for {job_type} jobs", retry_after)
+        self.stats["admitted"] += 1
+
+    async def refund(self, *, user_id: str, lane: AdmissionLane, job_type: str, cost: float | None):
+        """Undo an `admit` charge for a job that never started; never raises."""
+        if not self.enabled:
+            return
+        try:
+            await self.backend.refund(
+                f"{user_id}:{job_type}",
+                cost=cost if cost is not None else 1.0,
+                rate=lane.rate,
+                burst=lane.burst,
+            )
+            self.stats["refunded"] += 1
+        except Exception as e:
+            print(f"[admission] refund failed for {user_id}:{job_type}: {e}")
+
+
+admission = Admission(
+    enabled=settings.ADMISSION_ENABLED,
+    backend=_load_backend(settings.ADMISSION_BACKEND),
+)
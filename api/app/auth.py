@@ -1,23 +1,157 @@
-from fastapi import Header, HTTPException
+from collections import OrderedDict
+import asyncio
+import hashlib
+import time
+
+from fastapi import Header, HTTPException, Query
 import httpx
+import jwt
+from .upstream import supabase_auth_client
 from .config import settings
 
-async def get_user_id(authorization: str = Header(...)) -> str:
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing Bearer token")
+# Asymmetric algorithms Supabase publishes in its JWKS
+_JWKS_ALGORITHMS = {"RS256", "ES256", "EdDSA"}
+# Never refetch the JWKS more often than this on an unknown `kid`
+_JWKS_MIN_REFRESH_SECONDS = 30
 
-    token = authorization.split(" ", 1)[1].strip()
-    if not token:
-        raise HTTPException(status_code=401, detail="Empty Bearer token")
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{settings.SUPABASE_URL}/auth/v1/user",
-            headers={
-                "Authorization": f"Bearer {token}",
-                "apikey": settings.SUPABASE_ANON_KEY,
-            },
+class _VerifiedTokenCache:
+    """Bounded map of sha256(token) -> (user_id, exp), evicted LRU or at `exp`."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, tuple[str, float]] = OrderedDict()
+
+    def get(self, token_hash: str) -> str | None:
+        entry = self._entries.get(token_hash)
+        if entry is None:
+            return None
+        user_id, exp = entry
+        if exp <= time.time():
+            del self._entries[token_hash]
+            return None
+        self._entries.move_to_end(token_hash)
+        return user_id
+
+    def put(self, token_hash: str, user_id: str, exp: float):
+        if exp <= time.time():
+            return
+        self._entries[token_hash] = (user_id, exp)
+        self._entries.move_to_end(token_hash)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class _JwksCache:
+    """Signing keys from the Supabase JWKS endpoint, refetched on TTL or unknown `kid`.
+
+    One refresh runs at a time; requests that arrive meanwhile wait for it.
+    If a refresh fails the keys already held keep verifying, and the next
+    attempt waits _JWKS_MIN_REFRESH_SECONDS.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._keys: dict[str, jwt.PyJWK] = {}
+        self._fetched_at = 0.0
+        self._failed_at = float("-inf")
+        self._lock = asyncio.Lock()
+
+    async def refresh(self):
+        client = supabase_auth_client()
+        try:
+            resp = await client.get(
+                f"{settings.SUPABASE_URL}/auth/v1/.well-known/jwks.json",
+                headers={"apikey": settings.SUPABASE_ANON_KEY},
+            )
+        except httpx.HTTPError:
+            raise HTTPException(status_code=503, detail="Unable to fetch signing keys")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=503, detail="Unable to fetch signing keys")
+
+        keys = {}
+        for jwk in resp.json().get("keys", []):
+            try:
+                key = jwt.PyJWK(jwk)
+            except jwt.PyJWTError as e:
+                print(f"[auth] Skipping unusable JWK {jwk.get('kid')}: {e}")
+                continue
+            keys[jwk.get("kid", "")] = key
+        # Replace wholesale so retired keys stop verifying after rotation
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def _refresh_due(self, kid: str) -> bool:
+        now = time.monotonic()
+        if self._keys and now - self._failed_at < _JWKS_MIN_REFRESH_SECONDS:
+            return False
+        age = now - self._fetched_at
+        return age > self.ttl_seconds or (kid not in self._keys and age > _JWKS_MIN_REFRESH_SECONDS)
+
+    async def get_key(self, kid: str) -> jwt.PyJWK | None:
+        if self._refresh_due(kid):
+            async with self._lock:
+                # Another request may have refreshed while this one waited
+                if self._refresh_due(kid):
+                    try:
+                        await self.refresh()
+                    except HTTPException as e:
+                        if not self._keys:
+                            raise
+                        self._failed_at = time.monotonic()
+                        print(f"[auth] JWKS refresh failed ({e.detail}), keeping {len(self._keys)} cached keys")
+        return self._keys.get(kid)
+
+
+_token_cache = _VerifiedTokenCache(max_size=settings.AUTH_TOKEN_CACHE_SIZE)
+_jwks_cache = _JwksCache(ttl_seconds=settings.AUTH_JWKS_TTL)
+
+
+async def _verify_local(token: str) -> tuple[str, float]:
+    """Verify a Supabase JWT against the project secret or JWKS. Returns (user_id, exp)."""
+    try:
+        header = jwt.get_unverified_header(token)
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    alg = header.get("alg")
+    if alg == "HS256":
+        if not settings.SUPABASE_JWT_SECRET:
+            raise HTTPException(status_code=401, detail="Invalid token")
+        key = settings.SUPABASE_JWT_SECRET
+    elif alg in _JWKS_ALGORITHMS:
+        key = await _jwks_cache.get_key(header.get("kid", ""))
+        if key is None:
+            raise HTTPException(status_code=401, detail="Invalid token")
+    else:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    try:
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=[alg],
+            audience=settings.SUPABASE_JWT_AUDIENCE,
+            options={"require": ["exp", "sub"]},
         )
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token expired")
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    return claims["sub"], float(claims["exp"])
+
+
+async def _verify_remote(token: str) -> tuple[str, float]:
+    """Ask Supabase Auth to validate the token. Returns (user_id, exp)."""
+    client = supabase_auth_client()
+    resp = await client.get(
+        f"{settings.SUPABASE_URL}/auth/v1/user",
+        headers={
+            "Authorization": f"Bearer {token}",
+            "apikey": settings.SUPABASE_ANON_KEY,
+        },
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=401, detail="Invalid token")
@@ -27,5 +161,62 @@ async def get_user_id(authorization: str = Header(...)) -> str:
     if not user_id:
         raise HTTPException(status_code=401, detail="Token valid but user id missing")
 
+    # Supabase only vouched for the token as of now: a sign-out or ban revokes it
+    # before `exp`, so its answer is trusted for AUTH_REMOTE_CACHE_SECONDS at most
+    try:
+        exp = float(jwt.decode(token, options={"verify_signature": False}).get("exp", 0))
+    except jwt.PyJWTError:
+        exp = 0.0
+
+    return user_id, min(exp, time.time() + settings.AUTH_REMOTE_CACHE_SECONDS)
+
+
+async def verify_token(token: str) -> str:
+    """Return the user id for a bearer token, from cache or by verifying it."""
+    token_hash = hashlib.sha256(token.encode()).hexdigest()
+    user_id = _token_cache.get(token_hash)
+    if user_id:
+        return user_id
+
+    if settings.AUTH_VERIFY_MODE == "local":
+        user_id, exp = await _verify_local(token)
+    else:
+        user_id, exp = await _verify_remote(token)
+
+    _token_cache.put(token_hash, user_id, exp)
     return user_id
 
+
+async def get_user_id(authorization: str = Header(...)) -> str:
+    if not authorization.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing Bearer token")
+
+    token = authorization.split(" ", 1)[1].strip()
+    if not token:
+        raise HTTPException(status_code=401, detail="Empty Bearer token")
+
+    return await verify_token(token)
+
+
+async def get_user_id_for_stream(
+    authorization: str | None = Header(None),
+    access_token: str | None = Query(None),
+) -> str:
+    """Like get_user_id, but also accepts ?access_token= since EventSource can't set headers."""
+    if authorization:
+        return await get_user_id(authorization)
+    if not access_token:
+        raise HTTPException(status_code=401, detail="Missing Bearer token")
+    return await verify_token(access_token)
+
+
+async def get_user_plan(authorization: str = Header(...)) -> str | None:
+    """Plan name from the token's app_metadata (only the service role can set it)."""
+    await get_user_id(authorization)
+    token = authorization.split(" ", 1)[1].strip()
+    # Signature already checked by get_user_id
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return None
+    return (claims.get("app_metadata") or {}).get(settings.ADMISSION_PLAN_CLAIM)
@@ -0,0 +1,143 @@
+"""
+In-process cache for the LoRA and base-model catalog.
+
+Entries are fresh for CATALOG_TTL seconds. Past that they are still served
+for CATALOG_STALE_TTL more seconds while one background refresh runs
+(stale-while-revalidate). A None value (a slug that doesn't exist) is only
+kept for CATALOG_NEGATIVE_TTL, so a newly added LoRA stops 404ing quickly.
+Concurrent misses for the same key share a single upstream fetch. Each value
+carries a strong ETag over its JSON encoding so routes can answer
+If-None-Match with 304.
+
+Free-text search results live in their own, smaller cache so a stream of
+one-off queries can't evict the listings and slugs everything else reads.
+
+The cache is per process. POST /api/admin/catalog/invalidate only clears the
+process that handles it; every other API process or replica picks up a
+catalog change when its entries age out, within CATALOG_TTL.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi import Request, Response
+from fastapi.responses import JSONResponse
+
+from .config import settings
+
+
+class _Entry:
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value: Any, etag: str, fetched_at: float):
+        self.value = value
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+
+def make_etag(value: Any) -> str:
+    body = json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+    return '"' + hashlib.sha256(body.encode()).hexdigest()[:32] + '"'
+
+
+class CatalogCache:
+    def __init__(self, *, ttl: float, stale_ttl: float, max_entries: int, negative_ttl: float | None = None):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        # Bumped on invalidate so a fetch that started earlier can't repopulate
+        self._generation = 0
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "refreshes": 0}
+
+    def _store(self, key: tuple, value: Any, generation: int) -> _Entry:
+        entry = _Entry(value, make_etag(value), time.monotonic())
+        if generation == self._generation:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def _load(self, key: tuple, loader: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """Start (or join) the single in-flight fetch for a key."""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future
+
+        generation = self._generation
+
+        async def fetch():
+            try:
+                return self._store(key, await loader(), generation)
+            finally:
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+
+        future = asyncio.ensure_future(fetch())
+        self._inflight[key] = future
+        return future
+
+    async def get(self, key: tuple, loader: Callable[[], Awaitable[Any]]) -> _Entry:
+        entry = self._entries.get(key)
+        if entry is not None and entry.value is None:
+            # Negative entries are never served stale: a miss refetches
+            if time.monotonic() - entry.fetched_at >= self.negative_ttl:
+                entry = None
+        if entry is not None:
+            age = time.monotonic() - entry.fetched_at
+            if age < self.ttl:
+                self.stats["hits"] += 1
+                self._entries.move_to_end(key)
+                return entry
+            if age < self.ttl + self.stale_ttl:
+                self.stats["stale_hits"] += 1
+                if key not in self._inflight:
+                    self.stats["refreshes"] += 1
+                    future = self._load(key, loader)
+                    # Background refresh: a failure just leaves the stale entry in place
+                    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                return entry
+
+        self.stats["misses"] += 1
+        # shield: one cancelled request must not cancel the fetch other waiters share
+        return await asyncio.shield(self._load(key, loader))
+
+    def invalidate(self, namespace: str | None = None):
+        """Drop every entry, or only those whose key starts with `namespace`."""
+        self._generation += 1
+        if namespace is None:
+            self._entries.clear()
+            self._inflight.clear()
+            return
+        for key in [k for k in self._entries if k[0] == namespace]:
+            del self._entries[key]
+        for key in [k for k in self._inflight if k[0] == namespace]:
+            del self._inflight[key]
+
+
+def cached_response(request: Request, entry: _Entry) -> Response:
+    """JSON response with an ETag, or a bare 304 when the client already has it."""
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if entry.etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(entry.value, headers=headers)
+
+
+catalog_cache = CatalogCache(
+    ttl=settings.CATALOG_TTL,
+    stale_ttl=settings.CATALOG_STALE_TTL,
+    max_entries=settings.CATALOG_MAX_ENTRIES,
+    negative_ttl=settings.CATALOG_NEGATIVE_TTL,
+)
+search_cache = CatalogCache(
+    ttl=settings.CATALOG_TTL,
+    stale_ttl=settings.CATALOG_STALE_TTL,
+    max_entries=settings.CATALOG_SEARCH_MAX_ENTRIES,
+)
@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from pydantic import Field
+from pydantic import BaseModel, Field
 from pathlib import Path
 import os
 
@@ -21,6 +21,19 @@ def find_env_file():
             return str(candidate)
     return str(PROJECT_ROOT / ".env")
 
+class RunPodRoute(BaseModel):
+    endpoint_id: str
+    # RunPod execution policy, in seconds (sent as milliseconds)
+    execution_timeout: int | None = None  # max run time once a worker picks the job up
+    ttl: int | None = None  # max total lifetime, queue wait included
+    price_per_second: float = 0.0  # GPU price, for cost quotes
+
+class AdmissionLane(BaseModel):
+    rate: float  # estimated GPU-seconds refilled per second, per job type
+    burst: float  # bucket size in GPU-seconds
+    max_inflight: int  # dispatched jobs not yet finished
+    priority: int = 0  # higher lanes are released first by the dispatch scheduler
+
 class Settings(BaseSettings):
     APP_ENV: str = "dev"
     FRONTEND_ORIGIN: str = "http://localhost:3000"
@@ -30,16 +43,107 @@ class Settings(BaseSettings):
     SUPABASE_ANON_KEY: str = Field(validation_alias="NEXT_PUBLIC_SUPABASE_ANON_KEY")
     SUPABASE_SERVICE_ROLE_KEY: str = Field(validation_alias="NEXT_PUBLIC_SUPABASE_SERVICE_ROLE_KEY")
 
+    # Auth: "remote" asks Supabase Auth per token, "local" verifies the JWT in-process
+    AUTH_VERIFY_MODE: str = "remote"
+    SUPABASE_JWT_SECRET: str = ""  # legacy HS256 secret; JWKS is used for asymmetric keys
+    SUPABASE_JWT_AUDIENCE: str = "authenticated"
+    AUTH_JWKS_TTL: int = 600
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    # Remote mode: how long Supabase's answer is trusted, so a sign-out or ban takes effect (0 = every request)
+    AUTH_REMOTE_CACHE_SECONDS: int = 60
+
     # Cloudflare R2
     R2_ACCOUNT_ID: str
     R2_BUCKET_NAME: str
     R2_ACCESS_KEY_ID: str
     R2_SECRET_ACCESS_KEY: str
     R2_ENDPOINT: str
+    R2_UPLOAD_WORKERS: int = 2
 
     # RunPod
     RUNPOD_API_KEY: str
     RUNPOD_ENDPOINT_ID: str
+    RUNPOD_API_BASE: str = "https://api.runpod.ai/v2"
+    # JSON object mapping "job_type" or "job_type:model_name" to a RunPodRoute;
+    # anything unmatched goes to RUNPOD_ENDPOINT_ID. Example:
+    # {"img2img": {"endpoint_id": "abc", "execution_timeout": 120},
+    #  "img2vid": {"endpoint_id": "xyz", "execution_timeout": 1800}}
+    RUNPOD_ROUTES: dict[str, RunPodRoute] = {}
+    RUNPOD_PRICE_PER_SECOND: float = 0.0  # price of the default endpoint's GPU
+    # /runsync fast path: image jobs estimated under RUNSYNC_MAX_ESTIMATE seconds
+    # wait up to RUNSYNC_WAIT for the result, then continue as a normal async job
+    RUNSYNC_ENABLED: bool = True
+    RUNSYNC_MAX_ESTIMATE: float = 8.0
+    RUNSYNC_WAIT: float = 20.0
+    IMAGE_SECONDS_PER_STEP: float = 0.1  # SD 1.5 denoising step, warm worker
+    IMAGE_OVERHEAD_SECONDS: float = 2.0  # download, decode, upload per job
+    VIDEO_SECONDS_PER_MPIX_FRAME_STEP: float = 0.8  # Wan 14B; 720p x 81 frames x 30 steps ~ 30 min
+    VIDEO_OVERHEAD_SECONDS: float = 15.0  # input download, MP4 encode and upload per job
+
+    # Cost model fitted from worker-reported timings (the values above are its prior)
+    COST_MODEL_MIN_SAMPLES: int = 20
+    COST_MODEL_WINDOW: int = 5000  # most recent job_timings rows used per refresh
+    COST_MODEL_REFRESH_INTERVAL: float = 300.0
+    JOB_MAX_GPU_SECONDS: float = 3600.0  # jobs estimated above this are rejected at create
+    # Dispatch reads each input once (ETag for the result cache, header for its size)
+    INPUT_PROBE_CONCURRENCY: int = 16
+    INPUT_PROBE_MAX_INPUTS: int = 100  # more inputs: estimate from params, skip the result cache
+    INPUT_PROBE_TIMEOUT: float = 5.0  # seconds for all of a job's probes
+
+    # Admission control: per-user token buckets of estimated GPU-seconds
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_LANES: dict[str, AdmissionLane] = {
+        "free": AdmissionLane(rate=0.2, burst=600, max_inflight=2, priority=0),
+        "paid": AdmissionLane(rate=2.0, burst=3600, max_inflight=8, priority=10),
+    }
+    ADMISSION_DEFAULT_LANE: str = "free"
+    ADMISSION_PLAN_CLAIM: str = "plan"  # app_metadata key that names the user's lane
+    ADMISSION_INFLIGHT_RETRY_AFTER: float = 15.0
+    ADMISSION_BACKEND: str = ""  # "module:Class" shared limiter; empty = in process
+    # Webhooks are registered on dispatch only when both are set
+    PUBLIC_API_URL: str = ""  # externally reachable base URL of this API
+    RUNPOD_WEBHOOK_SECRET: str = ""
+
+    # LoRA / base-model catalog cache, per process: CATALOG_TTL bounds how long
+    # other processes serve a catalog change the invalidate endpoint didn't reach
+    CATALOG_TTL: float = 60.0
+    CATALOG_STALE_TTL: float = 600.0
+    CATALOG_NEGATIVE_TTL: float = 5.0  # unknown slugs
+    CATALOG_MAX_ENTRIES: int = 1000
+    CATALOG_SEARCH_MAX_ENTRIES: int = 200
+    CATALOG_ADMIN_TOKEN: str = ""  # enables POST /api/admin/catalog/invalidate
+    DOWNLOAD_COUNTER_FLUSH_INTERVAL: float = 5.0
+
+    # Job event streams (/jobs/{id}/events)
+    JOB_EVENTS_POLL_INTERVAL: float = 2.0
+    JOB_EVENTS_HEARTBEAT_SECONDS: float = 15.0
+
+    # Background reconciler that polls RunPod for in-flight jobs
+    RECONCILER_ENABLED: bool = True
+    RECONCILER_INTERVAL: float = 10.0
+    RECONCILER_CONCURRENCY: int = 8
+    RECONCILER_BATCH_SIZE: int = 200
+    RECONCILER_MAX_AGE: float = 86400.0  # fail jobs RunPod hasn't finished this long after dispatch
+
+    # Dispatch scheduler: groups submissions by model/LoRA set when they contend
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_HOLD_SECONDS: float = 0.5  # longest a contended dispatch waits to be grouped
+    SCHEDULER_MAX_PER_USER: int = 4  # releases per user per batch
+    SCHEDULER_SUBMIT_GAP: float = 0.25
+
+    # Content-addressed result cache (seeded jobs only)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_VERSION: str = "2"  # bump when worker models/pipelines change output
+    OUTPUT_RETENTION_DAYS: int = 30  # keep in step with the R2 lifecycle rule; 0 = forever
+
+    # Upstream HTTP pools (Supabase REST, Supabase Auth, RunPod)
+    UPSTREAM_HTTP2: bool = False
+    UPSTREAM_MAX_CONNECTIONS: int = 100
+    UPSTREAM_MAX_KEEPALIVE: int = 20
+    UPSTREAM_KEEPALIVE_EXPIRY: float = 30.0
+    UPSTREAM_CONNECT_TIMEOUT: float = 5.0
+    SUPABASE_TIMEOUT: float = 10.0
+    RUNPOD_TIMEOUT: float = 30.0
 
     class Config:
         env_file = find_env_file()
@@ -0,0 +1,229 @@
+"""
+GPU-time estimates for jobs, fitted from timings workers report.
+
+Workers return per-phase seconds and "work units" (megapixels x frames x
+denoising steps, summed over outputs) with every result; apply_runpod_result
+stores them in job_timings. Every COST_MODEL_REFRESH_INTERVAL seconds the
+recent records are fitted per (job_type, model_name) as
+
+    seconds = intercept + slope * work_units
+
+excluding model load, which depends on what the worker had warm. Until a
+pair has COST_MODEL_MIN_SAMPLES records the static prior from settings is
+used. Estimates drive the create-time quote, the parameter cap, admission
+charges and the /runsync decision.
+"""
+import asyncio
+import statistics
+
+from .config import settings
+from .runpod_routes import resolve_route
+from .supabase_db import insert_job_timing, list_job_timings
+
+_IMAGE_JOB_TYPES = {"img2img", "txt2img"}
+_VIDEO_JOB_TYPES = {"img2vid", "txt2vid"}
+# IMAGE_SECONDS_PER_STEP is quoted at SD 1.5's native 512x512
+_IMAGE_BASE_MPIX = 512 * 512 / 1e6
+# Phases that scale with work; "load" is reported but fitted separately
+_WORK_PHASES = ("download", "inference", "encode", "upload")
+
+
+def sized_by_inputs(job_type: str) -> bool:
+    """Whether the worker runs this job type at its inputs' own pixel sizes."""
+    return job_type in _IMAGE_JOB_TYPES
+
+
+def work_units(
+    *,
+    job_type: str,
+    params: dict,
+    input_count: int,
+    input_sizes: list[tuple[int, int] | None] | None = None,
+) -> float | None:
+    """Same units the worker reports; defaults mirror the worker's.
+
+    Image jobs run at each input's own size, so pass `input_sizes` once the
+    inputs are uploaded; unknown sizes (and create-time quotes) fall back to
+    the width/height params.
+    """
+    try:
+        steps = float(params.get("num_inference_steps", 30))
+        if job_type in _IMAGE_JOB_TYPES:
+            default_width = float(params.get("width", 512))
+            default_height = float(params.get("height", 512))
+            if job_type == "img2img":
+                steps = int(steps * float(params.get("strength", 0.75)))
+            if input_sizes:
+                pixels = 0.0
+                for size in input_sizes:
+                    if size is None:
+                        pixels += default_width * default_height
+                    else:
+                        # The worker resizes each input down to a multiple of 8
+                        pixels += (size[0] // 8 * 8) * (size[1] // 8 * 8)
+                return pixels / 1e6 * steps
+            megapixels = default_width * default_height / 1e6
+            frames = 1.0
+        elif job_type in _VIDEO_JOB_TYPES:
+            megapixels = float(params.get("width", 1280)) * float(params.get("height", 720)) / 1e6
+            frames = float(params.get("num_frames", 81))
+        else:
+            return None
+    except (TypeError, ValueError):
+        return None
+    # txt2vid has no inputs but still renders one output
+    return max(input_count, 1) * megapixels * frames * steps
+
+
+def _prior_seconds(job_type: str, work: float) -> float:
+    if job_type in _VIDEO_JOB_TYPES:
+        return settings.VIDEO_OVERHEAD_SECONDS + work * settings.VIDEO_SECONDS_PER_MPIX_FRAME_STEP
+    return settings.IMAGE_OVERHEAD_SECONDS + work * settings.IMAGE_SECONDS_PER_STEP / _IMAGE_BASE_MPIX
+
+
+def _fit(points: list[tuple[float, float]]) -> tuple[float, float]:
+    """Least-squares (intercept, slope); falls back to a ratio through the origin."""
+    xs = [x for x, _ in points]
+    ys = [y for _, y in points]
+    mean_x, mean_y = statistics.fmean(xs), statistics.fmean(ys)
+    var_x = sum((x - mean_x) ** 2 for x in xs)
+    if var_x > 0:
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / var_x
+        intercept = mean_y - slope * mean_x
+        if slope > 0 and intercept >= 0:
+            return intercept, slope
+    return 0.0, (mean_y / mean_x if mean_x > 0 else 0.0)
+
+
+class CostModel:
+    def __init__(self, *, min_samples: int, window: int, interval: float):
+        self.min_samples = min_samples
+        self.window = window
+        self.interval = interval
+        # (job_type, model_name) -> (intercept, slope, samples)
+        self.fits: dict[tuple[str, str], tuple[float, float, int]] = {}
+        # job_type -> median seconds, for ETAs
+        self.load_seconds: dict[str, float] = {}
+        self.queue_seconds: dict[str, float] = {}
+        self.task: asyncio.Task | None = None
+        self.stats = {"refreshes": 0, "refresh_errors": 0, "records": 0, "record_errors": 0}
+
+    def estimate_seconds(
+        self,
+        *,
+        job_type: str,
+        model_name: str,
+        params: dict,
+        input_count: int,
+        input_sizes: list[tuple[int, int] | None] | None = None,
+    ) -> float | None:
+        """Estimated GPU-seconds of work (model load excluded), or None if unknown."""
+        work = work_units(job_type=job_type, params=params, input_count=input_count, input_sizes=input_sizes)
+        if work is None:
+            return None
+        fit = self.fits.get((job_type, model_name))
+        if fit is None:
+            return _prior_seconds(job_type, work)
+        intercept, slope, _ = fit
+        return intercept + slope * work
+
+    def quote(self, *, job_type: str, model_name: str, params: dict, input_count: int) -> dict | None:
+        """GPU-seconds, wall-clock ETA and price for a job, as returned by /jobs/create."""
+        seconds = self.estimate_seconds(job_type=job_type, model_name=model_name, params=params, input_count=input_count)
+        if seconds is None:
+            return None
+        route = resolve_route(job_type=job_type, model_name=model_name)
+        eta = seconds + self.load_seconds.get(job_type, 0.0) + self.queue_seconds.get(job_type, 0.0)
+        return {
+            "gpu_seconds": round(seconds, 1),
+            "eta_seconds": round(eta, 1),
+            "cost": round(seconds * route.price_per_second, 4),
+        }
+
+    async def record(self, *, job: dict, data: dict):
+        """Store the timings a worker reported with a COMPLETED RunPod payload."""
+        output = data.get("output")
+        metrics = output.get("metrics") if isinstance(output, dict) else None
+        if not isinstance(metrics, dict) or not metrics.get("work_units"):
+            return
+        phases = metrics.get("phases") or {}
+        try:
+            await insert_job_timing(
+                {
+                    "job_id": job["id"],
+                    "job_type": job.get("job_type", "img2img"),
+                    "model_name": job.get("model_name", ""),
+                    "work_units": float(metrics["work_units"]),
+                    "work_seconds": sum(float(phases.get(phase, 0.0)) for phase in _WORK_PHASES),
+                    "load_seconds": float(phases.get("load", 0.0)),
+                    "phases": phases,
+                    # RunPod's own accounting, in ms
+                    "execution_ms": data.get("executionTime"),
+                    "delay_ms": data.get("delayTime"),
+                }
+            )
+            self.stats["records"] += 1
+        except Exception as e:
+            self.stats["record_errors"] += 1
+            print(f"[cost_model] failed to record timings for job {job['id']}: {e}")
+
+    async def refresh(self):
+        rows = await list_job_timings(limit=self.window)
+        points: dict[tuple[str, str], list[tuple[float, float]]] = {}
+        loads: dict[str, list[float]] = {}
+        delays: dict[str, list[float]] = {}
+        for row in rows:
+            points.setdefault((row["job_type"], row["model_name"]), []).append(
+                (float(row["work_units"]), float(row["work_seconds"]))
+            )
+            loads.setdefault(row["job_type"], []).append(float(row["load_seconds"] or 0.0))
+            if row.get("delay_ms") is not None:
+                delays.setdefault(row["job_type"], []).append(row["delay_ms"] / 1000)
+
+        self.fits = {
+            key: (*_fit(samples), len(samples))
+            for key, samples in points.items()
+            if len(samples) >= self.min_samples
+        }
+        self.load_seconds = {job_type: statistics.median(values) for job_type, values in loads.items()}
+        self.queue_seconds = {job_type: statistics.median(values) for job_type, values in delays.items()}
+        self.stats["refreshes"] += 1
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                self.stats["refresh_errors"] += 1
+                print(f"[cost_model] refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def metrics(self) -> dict:
+        return {
+            **self.stats,
+            "fits": {
+                f"{job_type}:{model_name}": {"intercept": round(a, 3), "slope": round(b, 4), "samples": n}
+                for (job_type, model_name), (a, b, n) in self.fits.items()
+            },
+            "median_load_seconds": self.load_seconds,
+            "median_queue_seconds": self.queue_seconds,
+        }
+
+
+cost_model = CostModel(
+    min_samples=settings.COST_MODEL_MIN_SAMPLES,
+    window=settings.COST_MODEL_WINDOW,
+    interval=settings.COST_MODEL_REFRESH_INTERVAL,
+)
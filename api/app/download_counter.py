@@ -0,0 +1,60 @@
+"""
+Write-behind aggregation of LoRA download counts.
+
+Clicks only bump an in-memory delta per LoRA id. A background task flushes
+all pending deltas every DOWNLOAD_COUNTER_FLUSH_INTERVAL seconds with a
+single increment_lora_downloads call, and once more on shutdown. If a flush
+fails its deltas are merged back and retried on the next cycle.
+"""
+import asyncio
+from collections import Counter
+
+from .config import settings
+from .supabase_db import increment_lora_downloads
+
+
+class DownloadCounter:
+    def __init__(self, *, interval: float):
+        self.interval = interval
+        self.pending: Counter[str] = Counter()
+        self.task: asyncio.Task | None = None
+        self.stats = {"increments": 0, "flushes": 0, "flush_errors": 0, "rows_flushed": 0}
+
+    def increment(self, lora_id: str) -> int:
+        """Record one download; returns the count still waiting to be flushed."""
+        self.pending[lora_id] += 1
+        self.stats["increments"] += 1
+        return self.pending[lora_id]
+
+    async def flush(self):
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, Counter()
+        try:
+            self.stats["rows_flushed"] += await increment_lora_downloads(deltas=dict(batch))
+            self.stats["flushes"] += 1
+        except Exception as e:
+            self.stats["flush_errors"] += 1
+            self.pending.update(batch)
+            print(f"[download_counter] flush failed, will retry: {e}")
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.flush()
+
+    def start(self):
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+        await self.flush()
+
+
+download_counter = DownloadCounter(interval=settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL)
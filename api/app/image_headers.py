@@ -0,0 +1,98 @@
+"""
+Pixel dimensions and ETags of uploaded inputs, read once per input at dispatch.
+
+The worker runs img2img at each input's own size, so the cost model needs
+those sizes rather than the job's width/height params; the result cache
+needs each input's ETag. One ranged GET of the header returns both (a HEAD
+when only the ETag is wanted). Sizes are parsed for PNG, JPEG and WebP;
+anything unrecognised is reported as None and the estimate falls back to
+the params.
+
+Probes run INPUT_PROBE_CONCURRENCY at a time under one INPUT_PROBE_TIMEOUT.
+Jobs with more than INPUT_PROBE_MAX_INPUTS inputs, or whose probes time out,
+get no probes at all: the estimate uses the params and the cache is skipped.
+"""
+import asyncio
+import struct
+from typing import NamedTuple
+
+from .config import settings
+from .r2 import head_etag_async, read_prefix_async
+
+# Enough for a JPEG whose SOF marker sits behind EXIF and ICC segments
+_HEADER_BYTES = 64 * 1024
+# SOFn markers that carry the frame size (C4, C8 and CC are other segments)
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def parse_image_size(header: bytes) -> tuple[int, int] | None:
+    """(width, height) from the start of a PNG, JPEG or WebP file, or None."""
+    if header[:8] == b"\x89PNG\r\n\x1a\n" and header[12:16] == b"IHDR" and len(header) >= 24:
+        return struct.unpack(">II", header[16:24])
+
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP" and len(header) >= 30:
+        chunk = header[12:16]
+        if chunk == b"VP8 ":
+            width, height = struct.unpack("<HH", header[26:30])
+            return width & 0x3FFF, height & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(header[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        if chunk == b"VP8X":
+            return int.from_bytes(header[24:27], "little") + 1, int.from_bytes(header[27:30], "little") + 1
+        return None
+
+    if header[:2] == b"\xff\xd8":
+        offset = 2
+        while offset + 9 <= len(header):
+            if header[offset] != 0xFF:
+                return None
+            marker = header[offset + 1]
+            if marker == 0xFF:
+                # Fill byte before a marker
+                offset += 1
+                continue
+            if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                # Standalone markers have no length
+                offset += 2
+                continue
+            if marker in _JPEG_SOF:
+                height, width = struct.unpack(">HH", header[offset + 5:offset + 9])
+                return width, height
+            offset += 2 + struct.unpack(">H", header[offset + 2:offset + 4])[0]
+    return None
+
+
+class InputProbe(NamedTuple):
+    etag: str | None
+    size: tuple[int, int] | None
+
+
+async def probe_inputs(keys: list[str], *, read_headers: bool) -> list[InputProbe] | None:
+    """ETag (and, with `read_headers`, dimensions) of each input; None if skipped.
+
+    A field is None where that input couldn't be read.
+    """
+    if len(keys) > settings.INPUT_PROBE_MAX_INPUTS:
+        print(f"[image_headers] not probing {len(keys)} inputs (limit {settings.INPUT_PROBE_MAX_INPUTS})")
+        return None
+    semaphore = asyncio.Semaphore(settings.INPUT_PROBE_CONCURRENCY)
+
+    async def probe(key: str) -> InputProbe:
+        async with semaphore:
+            try:
+                if not read_headers:
+                    return InputProbe(etag=await head_etag_async(key), size=None)
+                header, etag = await read_prefix_async(key, _HEADER_BYTES)
+                return InputProbe(etag=etag, size=parse_image_size(header))
+            except Exception as e:
+                print(f"[image_headers] could not read {key}: {e}")
+                return InputProbe(etag=None, size=None)
+
+    try:
+        return list(await asyncio.wait_for(
+            asyncio.gather(*(probe(key) for key in keys)), timeout=settings.INPUT_PROBE_TIMEOUT
+        ))
+    except asyncio.TimeoutError:
+        print(f"[image_headers] probing {len(keys)} inputs took over {settings.INPUT_PROBE_TIMEOUT}s")
+        return None
@@ -0,0 +1,130 @@
+"""
+Fan-out of job status/progress to SSE and WebSocket subscribers.
+
+One JobWatcher runs per in-flight job no matter how many tabs are open.
+Each subscriber gets a small bounded queue; when a consumer falls behind,
+its oldest pending event is dropped (the newest state always wins), so a
+slow client can never stall the watcher or other subscribers.
+"""
+import asyncio
+
+from .config import settings
+from .job_results import TERMINAL_STATUSES, apply_runpod_result, fetch_runpod_status
+from .supabase_db import get_job_owned
+
+_SUBSCRIBER_QUEUE_SIZE = 16
+
+# RunPod status -> our job status while the job is in flight
+_RUNPOD_STATUS_MAP = {
+    "IN_QUEUE": "queued",
+    "IN_PROGRESS": "processing",
+}
+
+
+def _event_from_job(job: dict) -> dict:
+    status = job.get("status")
+    return {
+        "job_id": job["id"],
+        "status": status,
+        "progress": 100 if status == "completed" else None,
+        "outputs": [entry["key"] for entry in job.get("output_urls") or [] if entry.get("key")],
+        "error": job.get("error"),
+    }
+
+
+def _progress_from_runpod(data: dict) -> int | None:
+    # Workers report {"progress": pct} through runpod.serverless.progress_update
+    output = data.get("output")
+    if isinstance(output, dict) and isinstance(output.get("progress"), (int, float)):
+        return int(output["progress"])
+    return None
+
+
+class JobWatcher:
+    def __init__(self, *, job_id: str, user_id: str, runpod_job_id: str | None):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.runpod_job_id = runpod_job_id
+        self.subscribers: set[asyncio.Queue] = set()
+        self.last_event: dict | None = None
+        self.task: asyncio.Task | None = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=_SUBSCRIBER_QUEUE_SIZE)
+        if self.last_event is not None:
+            queue.put_nowait(self.last_event)
+        self.subscribers.add(queue)
+        return queue
+
+    def _publish(self, event: dict):
+        if event == self.last_event:
+            return
+        self.last_event = event
+        for queue in self.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    async def _tick(self) -> dict:
+        job = await get_job_owned(job_id=self.job_id, user_id=self.user_id)
+        self.runpod_job_id = self.runpod_job_id or job.get("runpod_job_id")
+        if job.get("status") in TERMINAL_STATUSES or not self.runpod_job_id:
+            return _event_from_job(job)
+
+        data = await fetch_runpod_status(self.runpod_job_id, job.get("runpod_endpoint_id"))
+        updated = await apply_runpod_result(job_id=self.job_id, user_id=self.user_id, data=data)
+        if updated is not None:
+            return _event_from_job(updated)
+
+        event = _event_from_job(job)
+        event["status"] = _RUNPOD_STATUS_MAP.get(data.get("status"), event["status"])
+        event["progress"] = _progress_from_runpod(data)
+        return event
+
+    async def run(self):
+        try:
+            while True:
+                try:
+                    event = await self._tick()
+                except Exception as e:
+                    print(f"[job_events] watcher tick failed for job {self.job_id}: {e}")
+                else:
+                    self._publish(event)
+                    if event["status"] in TERMINAL_STATUSES:
+                        return
+                await asyncio.sleep(settings.JOB_EVENTS_POLL_INTERVAL)
+        finally:
+            if _watchers.get(self.job_id) is self:
+                del _watchers[self.job_id]
+
+
+_watchers: dict[str, JobWatcher] = {}
+
+
+def subscribe(*, job_id: str, user_id: str, runpod_job_id: str | None = None) -> tuple[JobWatcher, asyncio.Queue]:
+    """Attach to the watcher for a job, starting one if none is running."""
+    # Callers must have checked ownership; job ids are unique across users
+    watcher = _watchers.get(job_id)
+    if watcher is None:
+        watcher = JobWatcher(job_id=job_id, user_id=user_id, runpod_job_id=runpod_job_id)
+        _watchers[job_id] = watcher
+        watcher.task = asyncio.create_task(watcher.run())
+    elif runpod_job_id and not watcher.runpod_job_id:
+        watcher.runpod_job_id = runpod_job_id
+    return watcher, watcher.subscribe()
+
+
+def unsubscribe(watcher: JobWatcher, queue: asyncio.Queue):
+    """Detach a subscriber; the watcher stops once nobody is listening."""
+    watcher.subscribers.discard(queue)
+    if not watcher.subscribers and watcher.task is not None and not watcher.task.done():
+        watcher.task.cancel()
+        if _watchers.get(watcher.job_id) is watcher:
+            del _watchers[watcher.job_id]
+
+
+async def shutdown():
+    for watcher in list(_watchers.values()):
+        if watcher.task is not None:
+            watcher.task.cancel()
+    _watchers.clear()
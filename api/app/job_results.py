@@ -0,0 +1,97 @@
+from fastapi import HTTPException
+import uuid
+
+from .config import settings
+from .r2 import upload_base64_async
+from .cost_model import cost_model
+from .result_cache import result_cache
+from .supabase_db import finish_job
+from .upstream import runpod_client
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+class RunPodJobNotFound(HTTPException):
+    """RunPod has no record of the job, usually because its status retention expired."""
+
+    def __init__(self, runpod_job_id: str):
+        super().__init__(status_code=404, detail=f"RunPod job {runpod_job_id} not found")
+
+
+async def fetch_runpod_status(runpod_job_id: str, endpoint_id: str | None = None) -> dict:
+    """GET the RunPod /status payload for a job.
+
+    `endpoint_id` is the endpoint the job was routed to; rows dispatched before
+    routing existed have none and live on the default endpoint.
+    """
+    client = runpod_client()
+    resp = await client.get(
+        f"{settings.RUNPOD_API_BASE}/{endpoint_id or settings.RUNPOD_ENDPOINT_ID}/status/{runpod_job_id}",
+        headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"},
+    )
+
+    if resp.status_code == 404:
+        raise RunPodJobNotFound(runpod_job_id)
+    if resp.status_code != 200:
+        raise HTTPException(status_code=502, detail=f"RunPod error: {resp.text}")
+    return resp.json()
+
+
+async def _extract_outputs(*, job_id: str, user_id: str, output) -> list[dict]:
+    """Turn a RunPod COMPLETED output into our output_urls entries."""
+    outputs = []
+
+    if isinstance(output, dict):
+        # Our custom worker returns: {"status": "success", "outputs": [...]}
+        # Each output has {"key": "r2-key", "type": "video"/"image"}
+        worker_status = output.get("status")
+        worker_outputs = output.get("outputs", [])
+
+        if worker_status == "success" and worker_outputs:
+            # Worker already uploaded to R2, just save the keys
+            outputs = worker_outputs
+        elif "video" in output:
+            # Fallback: pre-built worker returns base64 video
+            video_key = f"users/{user_id}/jobs/{job_id}/output_{uuid.uuid4()}.mp4"
+            try:
+                await upload_base64_async(key=video_key, data=output["video"], content_type="video/mp4")
+                outputs.append({"type": "video", "key": video_key})
+            except Exception as upload_err:
+                print(f"Failed to upload video to R2: {upload_err}")
+
+    return outputs
+
+
+def _extract_error(data: dict) -> str:
+    output = data.get("output")
+    if "error" in data:
+        return data["error"]
+    if isinstance(output, dict):
+        return output.get("error") or output.get("message") or str(output)
+    return "Generation failed"
+
+
+async def apply_runpod_result(*, job_id: str, user_id: str, data: dict) -> dict | None:
+    """Persist a RunPod status payload (from /status or a webhook) idempotently.
+
+    Returns the updated job row if this call moved the job to a terminal
+    state, or None if the payload was not terminal or the job already was.
+    """
+    status = data.get("status")
+
+    if status == "COMPLETED":
+        output = data.get("output")
+        # A worker that caught its own exception still reports COMPLETED
+        if isinstance(output, dict) and output.get("status") == "failed":
+            return await finish_job(job_id=job_id, user_id=user_id, status="failed", error=_extract_error(data))
+        outputs = await _extract_outputs(job_id=job_id, user_id=user_id, output=output)
+        updated = await finish_job(job_id=job_id, user_id=user_id, status="completed", outputs=outputs)
+        if updated is not None:
+            await result_cache.record(updated)
+            await cost_model.record(job=updated, data=data)
+        return updated
+
+    if status in ("FAILED", "CANCELLED", "TIMED_OUT"):
+        return await finish_job(job_id=job_id, user_id=user_id, status="failed", error=_extract_error(data))
+
+    return None
@@ -1,13 +1,43 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .config import settings
+from . import upstream, job_events
+from .reconciler import reconciler
+from .download_counter import download_counter
+from .scheduler import dispatch_scheduler
+from .admission import admission
+from .cost_model import cost_model
 from .routes.jobs import router as jobs_router
 from .routes.storage import router as storage_router
 from .routes.loras import router as loras_router
 from .routes.models import router as models_router
 from .routes.training import router as training_router
+from .routes.webhooks import router as webhooks_router
+from .routes.admin import router as admin_router
+from .catalog_cache import catalog_cache, search_cache
+from .result_cache import result_cache
 
-app = FastAPI(title="queencard-ai control plane")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await upstream.startup()
+    if settings.RECONCILER_ENABLED:
+        reconciler.start()
+    download_counter.start()
+    dispatch_scheduler.start()
+    cost_model.start()
+    try:
+        yield
+    finally:
+        await cost_model.stop()
+        await dispatch_scheduler.stop()
+        await download_counter.stop()
+        await reconciler.stop()
+        await job_events.shutdown()
+        await upstream.shutdown()
+
+app = FastAPI(title="queencard-ai control plane", lifespan=lifespan)
 
 # Allow all origins in development
 origins = [
@@ -30,8 +60,33 @@ app.include_router(storage_router, prefix="/api", tags=["storage"])
 app.include_router(loras_router, prefix="/api", tags=["loras"])
 app.include_router(models_router, prefix="/api", tags=["models"])
 app.include_router(training_router, prefix="/api", tags=["training"])
+app.include_router(webhooks_router, prefix="/api", tags=["webhooks"])
+app.include_router(admin_router, prefix="/api", tags=["admin"])
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+@app.get("/health/upstreams")
+def health_upstreams():
+    return upstream.pool_stats()
+
+@app.get("/health/catalog")
+def health_catalog():
+    return {**catalog_cache.stats, "search": search_cache.stats, "download_counter": download_counter.stats}
+
+@app.get("/health/reconciler")
+def health_reconciler():
+    return {"enabled": settings.RECONCILER_ENABLED, **reconciler.metrics}
+
+@app.get("/health/scheduler")
+def health_scheduler():
+    return {**dispatch_scheduler.stats(), "admission": {"enabled": admission.enabled, **admission.stats}}
+
+@app.get("/health/cost-model")
+def health_cost_model():
+    return cost_model.metrics()
+
+@app.get("/health/result-cache")
+def health_result_cache():
+    return result_cache.metrics()
@@ -0,0 +1,50 @@
+"""
+Opaque keyset cursors.
+
+A cursor is the url-safe base64 of the sort-key values of the last row on a
+page (always including `id` as the tiebreaker). Clients pass it back as-is.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, *, fields: tuple[str, ...]) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, dict) or any(field not in values for field in fields):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def _quote(value) -> str:
+    # PostgREST reserves , . : ( ) inside logic trees; double-quote values
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def keyset_filter(*, column: str, value, tiebreak_value) -> str:
+    """PostgREST `or` filter for rows after (value, id) in `column.desc,id.desc` order."""
+    return (
+        f"({column}.lt.{_quote(value)},"
+        f"and({column}.eq.{_quote(value)},id.lt.{_quote(tiebreak_value)}))"
+    )
+
+
+def page(rows: list[dict], *, limit: int, column: str) -> dict:
+    """Trim a limit+1 fetch to one page and build its next_cursor."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor({column: last[column], "id": last["id"]})
+    return {"items": rows, "next_cursor": next_cursor}
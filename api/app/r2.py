@@ -1,17 +1,39 @@
+import asyncio
 import boto3
 import base64
+import functools
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from botocore.config import Config
+from starlette.concurrency import run_in_threadpool
 from .config import settings
 
+_client = None
+_client_lock = threading.Lock()
+
+# Reuse a signed GET URL until this many seconds before it expires
+_URL_REFRESH_MARGIN = 300
+_URL_CACHE_MAX = 10000
+_url_cache: OrderedDict[tuple[str, int], tuple[str, float]] = OrderedDict()
+_url_cache_lock = threading.Lock()
+
 def r2_client():
-    return boto3.client(
-        "s3",
-        endpoint_url=settings.R2_ENDPOINT,
-        aws_access_key_id=settings.R2_ACCESS_KEY_ID,
-        aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
-        config=Config(signature_version="s3v4"),
-        region_name="auto",
-    )
+    """Process-wide S3 client for R2 (boto3 clients are thread-safe once built)."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = boto3.client(
+                    "s3",
+                    endpoint_url=settings.R2_ENDPOINT,
+                    aws_access_key_id=settings.R2_ACCESS_KEY_ID,
+                    aws_secret_access_key=settings.R2_SECRET_ACCESS_KEY,
+                    config=Config(signature_version="s3v4"),
+                    region_name="auto",
+                )
+    return _client
 
 def presign_put(*, key: str, content_type: str, expires_seconds: int = 600) -> str:
     s3 = r2_client()
@@ -22,23 +44,131 @@ def presign_put(*, key: str, content_type: str, expires_seconds: int = 600) -> s
     )
 
 def presign_get(*, key: str, expires_seconds: int = 1800) -> str:
+    """Sign a GET URL, reusing a cached one while it has enough lifetime left."""
+    cache_key = (key, expires_seconds)
+    now = time.time()
+    with _url_cache_lock:
+        cached = _url_cache.get(cache_key)
+        if cached is not None and cached[1] - _URL_REFRESH_MARGIN > now:
+            _url_cache.move_to_end(cache_key)
+            return cached[0]
+
     s3 = r2_client()
-    return s3.generate_presigned_url(
+    url = s3.generate_presigned_url(
         "get_object",
         Params={"Bucket": settings.R2_BUCKET_NAME, "Key": key},
         ExpiresIn=expires_seconds,
     )
 
-def upload_base64(*, key: str, data: str, content_type: str = "video/mp4") -> str:
-    """Upload base64-encoded data to R2 and return the key."""
+    with _url_cache_lock:
+        _url_cache[cache_key] = (url, now + expires_seconds)
+        _url_cache.move_to_end(cache_key)
+        while len(_url_cache) > _URL_CACHE_MAX:
+            _url_cache.popitem(last=False)
+    return url
+
+def presign_get_many(*, keys: list[str], expires_seconds: int = 1800) -> dict[str, str]:
+    return {key: presign_get(key=key, expires_seconds=expires_seconds) for key in keys}
+
+async def presign_put_async(*, key: str, content_type: str, expires_seconds: int = 600) -> str:
+    return await run_in_threadpool(presign_put, key=key, content_type=content_type, expires_seconds=expires_seconds)
+
+async def presign_get_async(*, key: str, expires_seconds: int = 1800) -> str:
+    return await run_in_threadpool(presign_get, key=key, expires_seconds=expires_seconds)
+
+async def presign_get_many_async(*, keys: list[str], expires_seconds: int = 1800) -> dict[str, str]:
+    return await run_in_threadpool(presign_get_many, keys=keys, expires_seconds=expires_seconds)
+
+def head_etag(key: str) -> str:
+    """ETag of an object; for single-part uploads this is the MD5 of its bytes."""
     s3 = r2_client()
-    # Decode base64 data
-    binary_data = base64.b64decode(data)
-    s3.put_object(
+    return s3.head_object(Bucket=settings.R2_BUCKET_NAME, Key=key)["ETag"].strip('"')
+
+def read_prefix(key: str, length: int) -> tuple[bytes, str]:
+    """First `length` bytes of an object (all of it if shorter) and its ETag, in one ranged GET."""
+    s3 = r2_client()
+    resp = s3.get_object(Bucket=settings.R2_BUCKET_NAME, Key=key, Range=f"bytes=0-{length - 1}")
+    return resp["Body"].read(), resp["ETag"].strip('"')
+
+def copy_object(*, source_key: str, dest_key: str, if_match: str | None = None) -> str:
+    """Server-side copy within the bucket; no bytes pass through this process.
+
+    Returns the copy's ETag. With `if_match`, fails (412) unless the source
+    still has that ETag.
+    """
+    s3 = r2_client()
+    extra = {"CopySourceIfMatch": if_match} if if_match else {}
+    resp = s3.copy_object(
         Bucket=settings.R2_BUCKET_NAME,
-        Key=key,
-        Body=binary_data,
-        ContentType=content_type,
+        Key=dest_key,
+        CopySource={"Bucket": settings.R2_BUCKET_NAME, "Key": source_key},
+        **extra,
     )
+    return resp["CopyObjectResult"]["ETag"].strip('"')
+
+async def head_etag_async(key: str) -> str:
+    return await run_in_threadpool(head_etag, key)
+
+async def read_prefix_async(key: str, length: int) -> tuple[bytes, str]:
+    return await run_in_threadpool(read_prefix, key, length)
+
+async def copy_object_async(*, source_key: str, dest_key: str, if_match: str | None = None) -> str:
+    return await run_in_threadpool(copy_object, source_key=source_key, dest_key=dest_key, if_match=if_match)
+
+# 8 MiB parts, decoded in 1 MiB slices. Slices are a multiple of 3 bytes so each
+# base64 slice decodes on its own; small slices keep GIL hold times short.
+_SLICE_B64_CHARS = 1024 * 1024 // 3 * 4
+_PART_B64_CHARS = _SLICE_B64_CHARS * 8
+
+# Large result ingestion gets its own threads so it can't starve signing
+_upload_executor = ThreadPoolExecutor(max_workers=settings.R2_UPLOAD_WORKERS, thread_name_prefix="r2-upload")
+
+def upload_base64(*, key: str, data: str, content_type: str = "video/mp4") -> str:
+    """Upload base64-encoded data to R2 and return the key.
+
+    Decodes one part at a time into a multipart upload, so peak memory is
+    one part on top of the input string regardless of object size.
+    """
+    s3 = r2_client()
+    if len(data) <= _PART_B64_CHARS:
+        s3.put_object(
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=key,
+            Body=base64.b64decode(data),
+            ContentType=content_type,
+        )
+        return key
+
+    upload = s3.create_multipart_upload(Bucket=settings.R2_BUCKET_NAME, Key=key, ContentType=content_type)
+    upload_id = upload["UploadId"]
+    parts = []
+    try:
+        for part_number, offset in enumerate(range(0, len(data), _PART_B64_CHARS), start=1):
+            chunk = bytearray()
+            for start in range(offset, min(offset + _PART_B64_CHARS, len(data)), _SLICE_B64_CHARS):
+                chunk += base64.b64decode(data[start:start + _SLICE_B64_CHARS])
+            resp = s3.upload_part(
+                Bucket=settings.R2_BUCKET_NAME,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=bytes(chunk),
+            )
+            parts.append({"PartNumber": part_number, "ETag": resp["ETag"]})
+        s3.complete_multipart_upload(
+            Bucket=settings.R2_BUCKET_NAME,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=settings.R2_BUCKET_NAME, Key=key, UploadId=upload_id)
+        raise
     return key
 
+async def upload_base64_async(*, key: str, data: str, content_type: str = "video/mp4") -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _upload_executor,
+        functools.partial(upload_base64, key=key, data=data, content_type=content_type),
+    )
@@ -0,0 +1,132 @@
+"""
+Background reconciliation of in-flight jobs against RunPod.
+
+A single task per API process lists dispatched, non-terminal jobs and polls
+their RunPod status with bounded concurrency, persisting any terminal
+transition through apply_runpod_result. finish_job makes this safe to run
+alongside webhooks, event watchers and other API processes.
+
+Jobs RunPod no longer knows (it drops job status after a retention period)
+and jobs still unfinished RECONCILER_MAX_AGE after dispatch are failed, so
+dead rows can't fill the oldest-first batch and starve newer jobs. Jobs left
+in processing without a RunPod id can't be polled and are only expired.
+"""
+import asyncio
+import time
+from datetime import datetime, timezone
+
+from .config import settings
+from .job_results import RunPodJobNotFound, apply_runpod_result, fetch_runpod_status
+from .supabase_db import finish_job, list_inflight_jobs
+
+
+class Reconciler:
+    def __init__(self, *, interval: float, concurrency: int, batch_size: int, max_age: float):
+        self.interval = interval
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.max_age = max_age
+        self.task: asyncio.Task | None = None
+        self._stopping = asyncio.Event()
+        self.metrics = {
+            "cycles": 0,
+            "polls": 0,
+            "poll_errors": 0,
+            "transitions": 0,
+            "lost": 0,
+            "expired": 0,
+            "last_cycle_jobs": 0,
+            "last_cycle_seconds": 0.0,
+            "last_loop_lag_seconds": 0.0,
+            "max_loop_lag_seconds": 0.0,
+        }
+
+    def _age(self, job: dict) -> float:
+        since = job.get("dispatched_at") or job.get("created_at")
+        if not since:
+            return 0.0
+        return (datetime.now(timezone.utc) - datetime.fromisoformat(since)).total_seconds()
+
+    async def _fail(self, job: dict, error: str):
+        if await finish_job(job_id=job["id"], user_id=job["user_id"], status="failed", error=error) is not None:
+            self.metrics["transitions"] += 1
+
+    async def _poll_one(self, semaphore: asyncio.Semaphore, job: dict):
+        async with semaphore:
+            try:
+                if not job.get("runpod_job_id"):
+                    # Claimed but RunPod never confirmed an id (a lost /runsync answer,
+                    # or the id failed to save): only the webhook can finish it
+                    if self._age(job) > self.max_age:
+                        self.metrics["expired"] += 1
+                        await self._fail(job, f"No result from RunPod {self.max_age:.0f}s after dispatch")
+                    return
+                try:
+                    data = await fetch_runpod_status(job["runpod_job_id"], job.get("runpod_endpoint_id"))
+                except RunPodJobNotFound:
+                    self.metrics["lost"] += 1
+                    await self._fail(job, "RunPod no longer has this job")
+                    return
+                self.metrics["polls"] += 1
+                updated = await apply_runpod_result(job_id=job["id"], user_id=job["user_id"], data=data)
+                if updated is not None:
+                    self.metrics["transitions"] += 1
+                elif self._age(job) > self.max_age:
+                    self.metrics["expired"] += 1
+                    await self._fail(job, f"No result from RunPod {self.max_age:.0f}s after dispatch")
+            except Exception as e:
+                self.metrics["poll_errors"] += 1
+                print(f"[reconciler] poll failed for job {job['id']}: {e}")
+
+    async def run_once(self):
+        started = time.monotonic()
+        jobs = await list_inflight_jobs(limit=self.batch_size)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        await asyncio.gather(*(self._poll_one(semaphore, job) for job in jobs))
+        self.metrics["cycles"] += 1
+        self.metrics["last_cycle_jobs"] = len(jobs)
+        self.metrics["last_cycle_seconds"] = time.monotonic() - started
+
+    async def run(self):
+        next_due = time.monotonic()
+        while not self._stopping.is_set():
+            # How late this cycle starts versus schedule: event-loop or cycle overrun
+            lag = max(time.monotonic() - next_due, 0.0)
+            self.metrics["last_loop_lag_seconds"] = lag
+            self.metrics["max_loop_lag_seconds"] = max(self.metrics["max_loop_lag_seconds"], lag)
+
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"[reconciler] cycle failed: {e}")
+
+            next_due = max(next_due + self.interval, time.monotonic())
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=next_due - time.monotonic())
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._stopping.clear()
+        self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        """Let the current cycle finish, then exit; cancel if it overruns."""
+        if self.task is None:
+            return
+        self._stopping.set()
+        try:
+            await asyncio.wait_for(self.task, timeout=settings.RUNPOD_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+
+
+reconciler = Reconciler(
+    interval=settings.RECONCILER_INTERVAL,
+    concurrency=settings.RECONCILER_CONCURRENCY,
+    batch_size=settings.RECONCILER_BATCH_SIZE,
+    max_age=settings.RECONCILER_MAX_AGE,
+)
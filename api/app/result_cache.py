@@ -0,0 +1,210 @@
+"""
+Content-addressed cache of generation results.
+
+A seeded job's fingerprint hashes everything that determines its output:
+job type, model, sorted LoRAs, prompt, normalized params and the ETags of
+its input objects. When a completed job with the same fingerprint exists,
+dispatch copies its outputs into the new job's prefix and finishes the job
+without touching RunPod. Identical input bytes and seed mean the caller
+could have produced the same pixels, so reuse across users leaks nothing.
+
+Entries expire with the outputs they point at (OUTPUT_RETENTION_DAYS, which
+must match the R2 lifecycle rule). A hit re-points the entry at the fresh
+copies, so popular results stay cached as long as they keep being reused.
+Each cached output carries its ETag and is copied only if it still matches;
+an entry whose objects are gone or were overwritten is deleted.
+"""
+import asyncio
+import hashlib
+import json
+import posixpath
+import time
+from datetime import datetime, timedelta, timezone
+
+from .config import settings
+from .r2 import copy_object_async, head_etag_async
+from .supabase_db import (
+    delete_result_cache_entry,
+    finish_job,
+    get_result_cache_entry,
+    prune_result_cache,
+    put_result_cache_entry,
+)
+
+_PRUNE_INTERVAL = 3600
+
+
+def _normalize(value):
+    """Canonical form for hashing: drop nulls, 7.0 -> 7, recurse into containers."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items() if v is not None}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    return value
+
+
+def _explicit_seed(params: dict) -> int | None:
+    seed = _normalize(params.get("seed"))
+    if isinstance(seed, int) and not isinstance(seed, bool) and seed >= 0:
+        return seed
+    return None
+
+
+class ResultCache:
+    def __init__(self, *, enabled: bool, version: str, retention_days: int):
+        self.enabled = enabled
+        self.version = version
+        self.retention_days = retention_days
+        self._last_prune = 0.0
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "misses": 0,
+            "unseeded": 0,
+            "stale_entries": 0,
+            "stores": 0,
+            "pruned": 0,
+            "errors": 0,
+        }
+
+    def cacheable(self, job: dict) -> bool:
+        """Whether a job can have a fingerprint: the cache is on and the job has an explicit seed."""
+        return self.enabled and _explicit_seed(_normalize(job.get("params") or {})) is not None
+
+    def fingerprint(self, job: dict, *, input_etags: list[str | None] | None) -> str | None:
+        """Fingerprint for a job, or None if it is not cacheable.
+
+        `input_etags` are the ETags of the job's inputs in order, as read at
+        dispatch; None (or a None entry) means they couldn't all be read.
+        """
+        if not self.enabled:
+            return None
+        params = _normalize(job.get("params") or {})
+        if _explicit_seed(params) is None:
+            self.stats["unseeded"] += 1
+            return None
+        if input_etags is None or any(etag is None for etag in input_etags):
+            self.stats["errors"] += 1
+            print(f"[result_cache] could not hash inputs of job {job['id']}")
+            return None
+        # Stored separately on the row; dispatch copies them into params
+        params.pop("prompt", None)
+        params.pop("lora_names", None)
+
+        canonical = {
+            "v": self.version,
+            "job_type": job.get("job_type", "img2img"),
+            "model_name": job.get("model_name", ""),
+            "lora_names": sorted(job.get("lora_names") or []),
+            "prompt": job.get("prompt", ""),
+            "params": params,
+            "inputs": list(input_etags),
+        }
+        body = json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(body.encode()).hexdigest()
+
+    async def lookup(self, fingerprint: str) -> list[dict] | None:
+        self.stats["lookups"] += 1
+        try:
+            entry = await get_result_cache_entry(fingerprint=fingerprint)
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[result_cache] lookup failed: {e}")
+            return None
+        if entry is None or not entry.get("outputs"):
+            self.stats["misses"] += 1
+            return None
+        return entry["outputs"]
+
+    async def complete_from_cache(self, *, job_id: str, user_id: str, fingerprint: str, outputs: list[dict]) -> dict | None:
+        """Copy cached outputs into this job's prefix and finish it.
+
+        Returns the finished job row, or None (counted as a miss) if the cached
+        objects are gone; the caller then dispatches normally.
+        """
+        prefix = f"users/{user_id}/jobs/{job_id}/outputs/"
+        dest_keys = [prefix + posixpath.basename(entry["key"]) for entry in outputs]
+        try:
+            etags = await asyncio.gather(*(
+                copy_object_async(source_key=entry["key"], dest_key=dest_key, if_match=entry.get("etag"))
+                for entry, dest_key in zip(outputs, dest_keys)
+            ))
+        except Exception as e:
+            # Source outputs were deleted ahead of the entry's expiry, or overwritten
+            self.stats["misses"] += 1
+            self.stats["stale_entries"] += 1
+            print(f"[result_cache] cached outputs unavailable for {fingerprint[:12]}: {e}")
+            try:
+                await delete_result_cache_entry(fingerprint=fingerprint)
+            except Exception:
+                pass
+            return None
+
+        self.stats["hits"] += 1
+        new_outputs = [
+            {**{k: v for k, v in entry.items() if k != "etag"}, "key": key}
+            for entry, key in zip(outputs, dest_keys)
+        ]
+        finished = await finish_job(job_id=job_id, user_id=user_id, status="completed", outputs=new_outputs)
+        if finished is not None:
+            await self.record(finished, etags=list(etags))
+        return finished
+
+    async def record(self, job: dict, *, etags: list[str] | None = None):
+        """Remember a completed job's outputs, with their ETags, under its fingerprint.
+
+        `etags` are the outputs' ETags when already known; otherwise each output is HEADed.
+        """
+        fingerprint = job.get("fingerprint")
+        outputs = job.get("output_urls") or []
+        if not fingerprint or not outputs or job.get("status") != "completed":
+            return
+        if etags is None:
+            try:
+                etags = await asyncio.gather(*(head_etag_async(entry["key"]) for entry in outputs))
+            except Exception as e:
+                # Without ETags a later overwrite couldn't be detected; don't cache
+                self.stats["errors"] += 1
+                print(f"[result_cache] could not read outputs of job {job['id']}: {e}")
+                return
+        expires_at = None
+        if self.retention_days > 0:
+            expires_at = (datetime.now(timezone.utc) + timedelta(days=self.retention_days)).isoformat()
+        try:
+            await put_result_cache_entry(
+                fingerprint=fingerprint,
+                outputs=[{**entry, "etag": etag} for entry, etag in zip(outputs, etags)],
+                source_job_id=job["id"],
+                expires_at=expires_at,
+            )
+            self.stats["stores"] += 1
+        except Exception as e:
+            self.stats["errors"] += 1
+            print(f"[result_cache] store failed for job {job['id']}: {e}")
+        await self._maybe_prune()
+
+    async def _maybe_prune(self):
+        if self.retention_days <= 0 or time.monotonic() - self._last_prune < _PRUNE_INTERVAL:
+            return
+        self._last_prune = time.monotonic()
+        try:
+            self.stats["pruned"] += await prune_result_cache()
+        except Exception as e:
+            print(f"[result_cache] prune failed: {e}")
+
+    def metrics(self) -> dict:
+        resolved = self.stats["hits"] + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / resolved, 4) if resolved else 0.0,
+        }
+
+
+result_cache = ResultCache(
+    enabled=settings.RESULT_CACHE_ENABLED,
+    version=settings.RESULT_CACHE_VERSION,
+    retention_days=settings.OUTPUT_RETENTION_DAYS,
+)
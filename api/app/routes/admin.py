@@ -0,0 +1,37 @@
+from fastapi import APIRouter, Header, HTTPException
+from pydantic import BaseModel
+from typing import Optional
+import hmac
+
+from ..config import settings
+from ..catalog_cache import catalog_cache, search_cache
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+class InvalidateCatalogRequest(BaseModel):
+    namespace: Optional[str] = None  # "loras", "models", or everything
+
+
+def _require_admin(token: Optional[str]):
+    if not settings.CATALOG_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not found")
+    if not token or not hmac.compare_digest(token, settings.CATALOG_ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+
+@router.post("/catalog/invalidate")
+async def invalidate_catalog(
+    req: Optional[InvalidateCatalogRequest] = None,
+    x_admin_token: Optional[str] = Header(None),
+):
+    """Drop cached catalog entries after LoRAs or models are upserted.
+
+    Only this process's cache is cleared; other processes and replicas catch
+    up within CATALOG_TTL.
+    """
+    _require_admin(x_admin_token)
+    namespace = req.namespace if req else None
+    catalog_cache.invalidate(namespace)
+    search_cache.invalidate(namespace)
+    return {"ok": True, "namespace": namespace, "scope": "process"}
@@ -1,23 +1,41 @@
 # api/app/routes/jobs.py
 
+import asyncio
+import json
 import httpx
-import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 
 from ..config import settings
-from ..auth import get_user_id
+from ..upstream import runpod_client
+from ..auth import get_user_id, get_user_id_for_stream, get_user_plan, verify_token
+from ..admission import admission, lane_for
+from .. import job_events
 from ..supabase_db import (
     create_job,
     get_job_owned,
-    set_job_status,
-    append_job_outputs,
+    list_jobs_for_user,
+    mark_job_dispatched,
+    release_job_claim,
+    update_job_fields,
 )
-from ..r2 import upload_base64
+from ..pagination import decode_cursor, keyset_filter, page
+from ..r2 import presign_get_many_async
+from ..result_cache import result_cache
+from ..scheduler import affinity_key, dispatch_scheduler
+from ..runpod_routes import execution_policy, resolve_route, sync_wait
+from ..cost_model import cost_model, sized_by_inputs
+from ..image_headers import probe_inputs
+from ..job_results import TERMINAL_STATUSES, apply_runpod_result, fetch_runpod_status
+from .webhooks import runpod_webhook_url
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
+JOB_STATUSES = {"queued", "processing", "completed", "failed"}
+
 
 class CreateJobRequest(BaseModel):
     prompt: str = ""
@@ -39,9 +57,65 @@ class JobStatusResponse(BaseModel):
     error: Optional[str] = None
 
 
+# Hard ceilings on worker parameters, independent of the cost estimate
+PARAM_LIMITS = {
+    "num_inference_steps": 150,
+    "num_frames": 241,
+    "width": 1920,
+    "height": 1920,
+}
+
+
+# Image encodings the worker can write (avif falls back to webp without an encoder)
+OUTPUT_FORMATS = {"png", "webp", "jpeg", "avif"}
+# Formats without a lossless mode in the worker's encoders
+LOSSY_FORMATS = {"jpeg", "avif"}
+# name -> (min, max) for output encoding options
+ENCODING_LIMITS = {
+    "quality": (1, 100),
+    "compress_level": (0, 9),
+}
+
+
+def _check_params(params: dict):
+    for name, limit in PARAM_LIMITS.items():
+        value = params.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or not 0 < value <= limit:
+            raise HTTPException(status_code=400, detail=f"{name} must be between 1 and {limit}")
+
+    output_format = params.get("output_format")
+    if output_format is not None and output_format not in OUTPUT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"output_format must be one of: {', '.join(sorted(OUTPUT_FORMATS))}",
+        )
+    for name, (low, high) in ENCODING_LIMITS.items():
+        value = params.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, int) or isinstance(value, bool) or not low <= value <= high:
+            raise HTTPException(status_code=400, detail=f"{name} must be an integer between {low} and {high}")
+    if not isinstance(params.get("lossless", False), bool):
+        raise HTTPException(status_code=400, detail="lossless must be true or false")
+    if params.get("lossless") and output_format in LOSSY_FORMATS:
+        # The worker has no lossless mode for these; quality=100 would still be lossy
+        raise HTTPException(status_code=400, detail=f"lossless is not supported for {output_format}")
+
+
 @router.post("/create")
 async def create_new_job(req: CreateJobRequest, user_id: str = Depends(get_user_id)):
     """Create a new job in the database (status: queued)"""
+    _check_params(req.params)
+    # Inputs are uploaded after create; quote for one (txt2vid has none)
+    quote = cost_model.quote(job_type=req.job_type, model_name=req.model_name, params=req.params, input_count=1)
+    if quote is not None and quote["gpu_seconds"] > settings.JOB_MAX_GPU_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estimated GPU time {quote['gpu_seconds']:.0f}s exceeds the {settings.JOB_MAX_GPU_SECONDS:.0f}s limit",
+        )
+
     job = await create_job(
         user_id=user_id,
         prompt=req.prompt,
@@ -50,11 +124,54 @@ async def create_new_job(req: CreateJobRequest, user_id: str = Depends(get_user_
         lora_names=req.lora_names,
         job_type=req.job_type,
     )
-    return {"job_id": job["id"], "status": job["status"], "job_type": job.get("job_type", "img2img")}
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "job_type": job.get("job_type", "img2img"),
+        "estimate": quote,
+    }
+
+
+@router.get("")
+async def list_jobs(
+    status: Optional[str] = None,
+    job_type: Optional[str] = None,
+    limit: int = Query(default=24, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user_id: str = Depends(get_user_id),
+):
+    """List the user's jobs newest first, with a signed thumbnail URL per job"""
+    filters = {}
+    if status:
+        # Comma-separated, e.g. ?status=queued,processing
+        statuses = [s.strip() for s in status.split(",") if s.strip()]
+        unknown = set(statuses) - JOB_STATUSES
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown status: {', '.join(sorted(unknown))}")
+        filters["status"] = f"in.({','.join(statuses)})"
+    if job_type:
+        filters["job_type"] = f"eq.{job_type}"
+    if cursor:
+        after = decode_cursor(cursor, fields=("created_at", "id"))
+        filters["or"] = keyset_filter(column="created_at", value=after["created_at"], tiebreak_value=after["id"])
+
+    rows = await list_jobs_for_user(user_id=user_id, filters=filters, limit=limit + 1)
+    result = page(rows, limit=limit, column="created_at")
+
+    keys = [job["thumbnail"]["key"] for job in result["items"] if (job.get("thumbnail") or {}).get("key")]
+    urls = await presign_get_many_async(keys=keys) if keys else {}
+    for job in result["items"]:
+        thumbnail = job.get("thumbnail") or {}
+        job["thumbnail"] = {**thumbnail, "url": urls[thumbnail["key"]]} if thumbnail.get("key") else None
+    return result
 
 
 @router.post("/{job_id}/dispatch")
-async def dispatch_job(job_id: str, user_id: str = Depends(get_user_id)):
+async def dispatch_job(
+    job_id: str,
+    user_id: str = Depends(get_user_id),
+    plan: Optional[str] = Depends(get_user_plan),
+):
     """Dispatch a job to RunPod for processing"""
     job = await get_job_owned(job_id=job_id, user_id=user_id)
 
@@ -81,23 +198,210 @@ async def dispatch_job(job_id: str, user_id: str = Depends(get_user_id)):
         "params": params,
     }
 
+    route = resolve_route(job_type=runpod_input["job_type"], model_name=runpod_input["model_name"])
     runpod_payload = {"input": runpod_input}
+    policy = execution_policy(route)
+    if policy:
+        runpod_payload["policy"] = policy
+    webhook = runpod_webhook_url(job_id=job_id, user_id=user_id)
+    if webhook:
+        runpod_payload["webhook"] = webhook
+
+    # One read per input serves both the estimate (real sizes, the same work
+    # units the worker will report) and the result cache fingerprint (ETags)
+    sized = sized_by_inputs(runpod_input["job_type"])
+    probes = None
+    if sized or result_cache.cacheable(job):
+        probes = await probe_inputs(input_keys, read_headers=sized)
+    input_sizes = [probe.size for probe in probes] if sized and probes else None
+    estimate = cost_model.estimate_seconds(
+        job_type=runpod_input["job_type"],
+        model_name=runpod_input["model_name"],
+        params=params,
+        input_count=len(input_keys),
+        input_sizes=input_sizes,
+    )
+    if estimate is not None and estimate > settings.JOB_MAX_GPU_SECONDS:
+        # create quoted a single input; many uploads can push a job over the limit
+        raise HTTPException(
+            status_code=400,
+            detail=f"Estimated GPU time {estimate:.0f}s exceeds the {settings.JOB_MAX_GPU_SECONDS:.0f}s limit",
+        )
+
+    fingerprint = result_cache.fingerprint(
+        job, input_etags=[probe.etag for probe in probes] if probes is not None else None
+    )
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.post(
-            f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/run",
-            headers={
-                "Authorization": f"Bearer {settings.RUNPOD_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json=runpod_payload,
+    # Claim the job first so a fast webhook can't be overwritten by this update
+    claim = {"fingerprint": fingerprint, "dispatched_at": datetime.now(timezone.utc).isoformat()}
+    if await mark_job_dispatched(job_id=job_id, user_id=user_id, fields=claim) is None:
+        raise HTTPException(status_code=400, detail="Job already dispatched")
+
+    try:
+        cached = await _complete_from_cache(job_id=job_id, user_id=user_id, fingerprint=fingerprint)
+        if cached is not None:
+            return cached
+        runpod_data = await _submit_claimed(
+            user_id=user_id,
+            plan=plan,
+            estimate=estimate,
+            route=route,
+            runpod_payload=runpod_payload,
         )
+    except _SubmitUncertain as e:
+        # RunPod may be running it: keep the claim so it can't be paid for twice.
+        # The webhook finishes it, or the reconciler expires it
+        print(f"RunPod submit for job {job_id} may have gone through: {e}")
+        raise HTTPException(
+            status_code=504,
+            detail="RunPod did not confirm the job; it stays in processing until its result arrives or it expires",
+        )
+    except BaseException:
+        # Rate limited, RunPod refused or something broke before the submit: let
+        # the user dispatch again instead of stranding the job in processing
+        try:
+            await release_job_claim(job_id=job_id, user_id=user_id)
+        except Exception as e:
+            print(f"Failed to release claim on job {job_id}: {e}")
+        raise
+
+    # RunPod accepted the job; from here on it stays claimed whatever fails
+    return await _record_submitted(job_id=job_id, user_id=user_id, route=route, runpod_data=runpod_data)
+
+
+class _SubmitUncertain(Exception):
+    """The submit failed after the request may have reached RunPod."""
+
+
+async def _complete_from_cache(*, job_id: str, user_id: str, fingerprint: str | None) -> dict | None:
+    """Finish the job from an identical seeded job's outputs, skipping the GPU; None on a miss."""
+    if fingerprint is None:
+        return None
+    cached_outputs = await result_cache.lookup(fingerprint)
+    if not cached_outputs:
+        return None
+    finished = await result_cache.complete_from_cache(
+        job_id=job_id, user_id=user_id, fingerprint=fingerprint, outputs=cached_outputs
+    )
+    if finished is None:
+        return None
+    return await _finished_response(finished, runpod_job_id=None, cached=True)
+
+
+async def _submit_claimed(
+    *,
+    user_id: str,
+    plan: Optional[str],
+    estimate: float | None,
+    route,
+    runpod_payload: dict,
+) -> dict:
+    """Admission, scheduler and the RunPod submit for a claimed job; returns RunPod's response."""
+    runpod_input = runpod_payload["input"]
+
+    _, lane = lane_for(plan)
+    # A 429 leaves nothing started; the user can dispatch again after Retry-After
+    await admission.admit(user_id=user_id, lane=lane, job_type=runpod_input["job_type"], cost=estimate)
+
+    # Short image jobs block on /runsync so the response can carry the outputs
+    wait = sync_wait(estimate=estimate)
+    run_url = f"{settings.RUNPOD_API_BASE}/{route.endpoint_id}/run"
+    request_options = {}
+    if wait is not None:
+        run_url = f"{settings.RUNPOD_API_BASE}/{route.endpoint_id}/runsync"
+        request_options = {"params": {"wait": int(wait * 1000)}, "timeout": settings.RUNPOD_TIMEOUT + wait}
+
+    key = affinity_key(
+        job_type=runpod_input["job_type"],
+        model_name=runpod_input["model_name"],
+        lora_names=runpod_input["params"]["lora_names"],
+    )
+    client = runpod_client()
+    try:
+        async with dispatch_scheduler.slot(user_id=user_id, key=key, priority=lane.priority):
+            resp = await client.post(
+                run_url,
+                headers={
+                    "Authorization": f"Bearer {settings.RUNPOD_API_KEY}",
+                    "Content-Type": "application/json",
+                },
+                json=runpod_payload,
+                **request_options,
+            )
+    except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+        # Never sent
+        await admission.refund(user_id=user_id, lane=lane, job_type=runpod_input["job_type"], cost=estimate)
+        raise HTTPException(status_code=502, detail=f"RunPod unreachable: {e}")
+    except httpx.HTTPError as e:
+        # Sent, but the answer was lost (e.g. a /runsync read timeout)
+        raise _SubmitUncertain(str(e) or type(e).__name__) from e
 
     if resp.status_code != 200:
+        # Nothing is running, let the user retry without waiting out the charge
+        await admission.refund(user_id=user_id, lane=lane, job_type=runpod_input["job_type"], cost=estimate)
         raise HTTPException(status_code=502, detail=f"RunPod error: {resp.text}")
 
-    runpod_data = resp.json()
-    return {"runpod_job_id": runpod_data.get("id"), "status": "dispatched"}
+    return resp.json()
+
+
+# Writing the RunPod id after a submit: attempts, and seconds between them (linear backoff)
+_PERSIST_ATTEMPTS = 3
+_PERSIST_BACKOFF = 0.2
+
+
+async def _persist_runpod_ids(*, job_id: str, user_id: str, fields: dict):
+    """Store the RunPod ids on a submitted job, retrying briefly; never raises."""
+    for attempt in range(_PERSIST_ATTEMPTS):
+        try:
+            await update_job_fields(job_id=job_id, user_id=user_id, fields=fields)
+            return
+        except Exception as e:
+            if attempt + 1 == _PERSIST_ATTEMPTS:
+                # The webhook still finishes the job; the reconciler expires it otherwise
+                print(f"Failed to store RunPod id {fields['runpod_job_id']} on job {job_id}: {e}")
+                return
+            await asyncio.sleep(_PERSIST_BACKOFF * (attempt + 1))
+
+
+async def _record_submitted(*, job_id: str, user_id: str, route, runpod_data: dict) -> dict:
+    """Bookkeeping for a job RunPod accepted. Failures here leave the job in processing."""
+    runpod_job_id = runpod_data.get("id")
+    # Lets the reconciler and event watchers follow the job without the browser
+    await _persist_runpod_ids(
+        job_id=job_id,
+        user_id=user_id,
+        fields={"runpod_job_id": runpod_job_id, "runpod_endpoint_id": route.endpoint_id},
+    )
+
+    # /runsync that outlived its wait returns IN_QUEUE/IN_PROGRESS: the job keeps
+    # running on RunPod and the caller polls as for /run
+    if runpod_data.get("status") in ("COMPLETED", "FAILED", "CANCELLED", "TIMED_OUT"):
+        try:
+            finished = await apply_runpod_result(job_id=job_id, user_id=user_id, data=runpod_data)
+            if finished is None:
+                # A webhook persisted it first
+                finished = await get_job_owned(job_id=job_id, user_id=user_id)
+            return await _finished_response(finished, runpod_job_id=runpod_job_id)
+        except Exception as e:
+            # The webhook or reconciler persists it; the caller polls meanwhile
+            print(f"Failed to store the /runsync result for job {job_id}: {e}")
+
+    return {"runpod_job_id": runpod_job_id, "status": "dispatched"}
+
+
+async def _finished_response(job: dict, *, runpod_job_id: str | None, cached: bool = False) -> dict:
+    """Dispatch response for a job that finished inline, with signed output URLs."""
+    outputs = [entry for entry in job.get("output_urls") or [] if entry.get("key")]
+    urls = await presign_get_many_async(keys=[entry["key"] for entry in outputs]) if outputs else {}
+    response = {
+        "runpod_job_id": runpod_job_id,
+        "status": job["status"],
+        "outputs": [{**entry, "url": urls[entry["key"]]} for entry in outputs],
+        "error": job.get("error"),
+    }
+    if cached:
+        response["cached"] = True
+    return response
 
 
 @router.get("/{job_id}/status")
@@ -117,62 +421,35 @@ async def get_job_status(job_id: str, user_id: str = Depends(get_user_id)):
     )
 
 
+def _runpod_shaped(job: dict, runpod_job_id: str) -> dict:
+    """Describe a finished job in the shape /runpod-status callers expect."""
+    if job["status"] == "completed":
+        return {
+            "id": runpod_job_id,
+            "status": "COMPLETED",
+            "output": {"status": "completed", "outputs": job.get("output_urls") or []},
+        }
+    return {"id": runpod_job_id, "status": "FAILED", "error": job.get("error") or "Generation failed"}
+
+
 @router.get("/{job_id}/runpod-status")
 async def get_runpod_status(job_id: str, runpod_job_id: str, user_id: str = Depends(get_user_id)):
     """Check RunPod job status"""
     # Verify user owns the job
     job = await get_job_owned(job_id=job_id, user_id=user_id)
 
-    async with httpx.AsyncClient(timeout=30) as client:
-        resp = await client.get(
-            f"https://api.runpod.ai/v2/{settings.RUNPOD_ENDPOINT_ID}/status/{runpod_job_id}",
-            headers={"Authorization": f"Bearer {settings.RUNPOD_API_KEY}"},
-        )
+    # Already finished (e.g. via webhook): answer from our own row
+    if job.get("status") in TERMINAL_STATUSES:
+        return _runpod_shaped(job, runpod_job_id)
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=502, detail=f"RunPod error: {resp.text}")
-    data = resp.json()
+    data = await fetch_runpod_status(runpod_job_id, job.get("runpod_endpoint_id"))
 
     # Opportunistically persist results to DB when completed/failed
     try:
-        status = data.get("status")
-        output = data.get("output")
-
-        if status == "COMPLETED" and job.get("status") != "completed":
-            # Our custom worker returns: {"status": "success", "outputs": [...]}
-            # Each output has {"key": "r2-key", "type": "video"/"image"}
-            outputs = []
-
-            if isinstance(output, dict):
-                worker_status = output.get("status")
-                worker_outputs = output.get("outputs", [])
-
-                if worker_status == "success" and worker_outputs:
-                    # Worker already uploaded to R2, just save the keys
-                    outputs = worker_outputs
-                elif "video" in output:
-                    # Fallback: pre-built worker returns base64 video
-                    video_key = f"users/{user_id}/jobs/{job_id}/output_{uuid.uuid4()}.mp4"
-                    try:
-                        upload_base64(key=video_key, data=output["video"], content_type="video/mp4")
-                        outputs.append({"type": "video", "key": video_key})
-                    except Exception as upload_err:
-                        print(f"Failed to upload video to R2: {upload_err}")
-
-            if outputs:
-                await append_job_outputs(job_id=job_id, user_id=user_id, outputs=outputs)
-            await set_job_status(job_id=job_id, user_id=user_id, status="completed", error=None)
-
+        updated = await apply_runpod_result(job_id=job_id, user_id=user_id, data=data)
+        if updated is not None:
             # Return clean response
-            data["output"] = {"status": "completed", "outputs": outputs}
-
-        elif status == "FAILED":
-            err_msg = "Generation failed"
-            if "error" in data:
-                err_msg = data["error"]
-            elif isinstance(output, dict):
-                err_msg = output.get("error") or output.get("message") or str(output)
-            await set_job_status(job_id=job_id, user_id=user_id, status="failed", error=err_msg)
+            return _runpod_shaped(updated, runpod_job_id)
     except Exception as e:
         # Don't break the status endpoint if DB update fails
         print(f"runpod-status side-effect failed for job {job_id}: {e}")
@@ -181,3 +458,63 @@ async def get_runpod_status(job_id: str, runpod_job_id: str, user_id: str = Depe
 
     return data
 
+
+@router.get("/{job_id}/events")
+async def stream_job_events(
+    job_id: str,
+    request: Request,
+    runpod_job_id: Optional[str] = None,
+    user_id: str = Depends(get_user_id_for_stream),
+):
+    """Server-Sent Events stream of status, progress and output keys"""
+    await get_job_owned(job_id=job_id, user_id=user_id)
+    watcher, queue = job_events.subscribe(job_id=job_id, user_id=user_id, runpod_job_id=runpod_job_id)
+
+    async def event_stream():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=settings.JOB_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+                if event["status"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            job_events.unsubscribe(watcher, queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.websocket("/{job_id}/ws")
+async def job_events_socket(websocket: WebSocket, job_id: str, access_token: str, runpod_job_id: Optional[str] = None):
+    """WebSocket variant of /events; authenticates with ?access_token="""
+    try:
+        user_id = await verify_token(access_token)
+        await get_job_owned(job_id=job_id, user_id=user_id)
+    except HTTPException:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    watcher, queue = job_events.subscribe(job_id=job_id, user_id=user_id, runpod_job_id=runpod_job_id)
+    try:
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.JOB_EVENTS_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                await websocket.send_json({"type": "heartbeat"})
+                continue
+            await websocket.send_json({"type": "status", **event})
+            if event["status"] in TERMINAL_STATUSES:
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        pass
+    finally:
+        job_events.unsubscribe(watcher, queue)
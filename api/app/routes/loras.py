@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
 from typing import Optional
-import httpx
 
 from ..config import settings
+from ..upstream import supabase_rest_client
 from ..auth import get_user_id
+from ..catalog_cache import catalog_cache, cached_response, search_cache
+from ..download_counter import download_counter
+from ..pagination import decode_cursor, keyset_filter, page
 
 router = APIRouter(prefix="/loras", tags=["loras"])
 
@@ -36,39 +39,63 @@ class LoraResponse(BaseModel):
 
 @router.get("")
 async def list_loras(
+    request: Request,
     category: Optional[str] = None,
     is_nsfw: Optional[bool] = None,
     search: Optional[str] = None,
-    limit: int = Query(default=50, le=100),
-    offset: int = 0,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    paged: bool = False,
+    offset: int = Query(default=0, ge=0, deprecated=True),
 ):
-    """List available LoRAs"""
+    """List available LoRAs.
+
+    With `paged=true` (or a `cursor`): newest first, keyset paginated, as
+    {items, next_cursor}. Otherwise the original bare list, most downloaded
+    first with offset paging, for clients that predate cursors.
+    """
+    paged = paged or cursor is not None
     params = {
-        "select": "id,name,slug,description,preview_url,category,tags,trigger_words,base_model,is_nsfw,download_count",
+        "select": "id,name,slug,description,preview_url,category,tags,trigger_words,base_model,is_nsfw,download_count,created_at",
         "is_public": "eq.true",
-        "order": "download_count.desc",
-        "limit": str(limit),
-        "offset": str(offset),
     }
-    
+    if paged:
+        # Keyset on an immutable key; download_count moves between page requests
+        params["order"] = "created_at.desc,id.desc"
+        # One extra row tells us whether there is a next page
+        params["limit"] = str(limit + 1)
+    else:
+        params["order"] = "download_count.desc,id.desc"
+        params["limit"] = str(limit)
+        params["offset"] = str(offset)
+
     if category:
         params["category"] = f"eq.{category}"
     if is_nsfw is not None:
         params["is_nsfw"] = f"eq.{str(is_nsfw).lower()}"
     if search:
         params["name"] = f"ilike.%{search}%"
+    if cursor:
+        after = decode_cursor(cursor, fields=("created_at", "id"))
+        params["or"] = keyset_filter(column="created_at", value=after["created_at"], tiebreak_value=after["id"])
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async def load():
+        client = supabase_rest_client()
         resp = await client.get(
             f"{_rest_base()}/loras",
             headers=_headers_service(),
             params=params,
         )
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch loras: {resp.text}")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch loras: {resp.text}")
 
-    return resp.json()
+        if not paged:
+            return resp.json()
+        return page(resp.json(), limit=limit, column="created_at")
+
+    entry = await catalog_cache.get(("loras", tuple(sorted(params.items()))), load)
+    return cached_response(request, entry)
 
 
 @router.get("/categories")
@@ -85,50 +112,68 @@ async def list_categories():
     ]
 
 
-@router.get("/{slug}")
-async def get_lora(slug: str):
-    """Get a specific LoRA by slug"""
-    async with httpx.AsyncClient(timeout=10) as client:
+@router.get("/search")
+async def search_loras(
+    request: Request,
+    q: str = Query(min_length=1, max_length=100),
+    category: Optional[str] = None,
+    is_nsfw: Optional[bool] = None,
+    limit: int = Query(default=20, ge=1, le=100),
+):
+    """Relevance-ranked LoRA search with highlighted matches"""
+    args = {"p_query": q.strip(), "p_category": category, "p_is_nsfw": is_nsfw, "p_limit": limit}
+
+    async def load():
+        client = supabase_rest_client()
+        resp = await client.post(
+            f"{_rest_base()}/rpc/search_loras",
+            headers=_headers_service(),
+            json=args,
+        )
+
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to search loras: {resp.text}")
+
+        return resp.json()
+
+    entry = await search_cache.get(("loras", "search", tuple(sorted(args.items()))), load)
+    return cached_response(request, entry)
+
+
+async def _get_lora_entry(slug: str):
+    async def load():
+        client = supabase_rest_client()
         resp = await client.get(
             f"{_rest_base()}/loras",
             headers=_headers_service(),
             params={"slug": f"eq.{slug}", "select": "*", "limit": "1"},
         )
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch lora: {resp.text}")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch lora: {resp.text}")
 
-    rows = resp.json()
-    if not rows:
+        rows = resp.json()
+        return rows[0] if rows else None
+
+    entry = await catalog_cache.get(("loras", "slug", slug), load)
+    if entry.value is None:
         raise HTTPException(status_code=404, detail="LoRA not found")
-    
-    return rows[0]
+    return entry
+
+
+@router.get("/{slug}")
+async def get_lora(slug: str, request: Request):
+    """Get a specific LoRA by slug"""
+    entry = await _get_lora_entry(slug)
+    return cached_response(request, entry)
 
 
 @router.post("/{slug}/download")
 async def increment_download(slug: str, user_id: str = Depends(get_user_id)):
     """Increment download count for a LoRA"""
-    async with httpx.AsyncClient(timeout=10) as client:
-        # Get current count
-        resp = await client.get(
-            f"{_rest_base()}/loras",
-            headers=_headers_service(),
-            params={"slug": f"eq.{slug}", "select": "id,download_count,r2_key"},
-        )
-        
-        if resp.status_code != 200 or not resp.json():
-            raise HTTPException(status_code=404, detail="LoRA not found")
-        
-        lora = resp.json()[0]
-        new_count = (lora.get("download_count") or 0) + 1
-        
-        # Update count
-        await client.patch(
-            f"{_rest_base()}/loras",
-            headers=_headers_service(),
-            params={"id": f"eq.{lora['id']}"},
-            json={"download_count": new_count},
-        )
-    
-    return {"r2_key": lora["r2_key"], "download_count": new_count}
+    # Served from the catalog cache; the count is flushed in batches by download_counter
+    lora = (await _get_lora_entry(slug)).value
+    pending = download_counter.increment(lora["id"])
 
+    # Approximate until the next flush and cache refresh
+    return {"r2_key": lora["r2_key"], "download_count": (lora.get("download_count") or 0) + pending}
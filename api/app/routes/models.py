@@ -1,7 +1,8 @@
-from fastapi import APIRouter, HTTPException
-import httpx
+from fastapi import APIRouter, HTTPException, Request
 
 from ..config import settings
+from ..upstream import supabase_rest_client
+from ..catalog_cache import catalog_cache, cached_response
 
 router = APIRouter(prefix="/models", tags=["models"])
 
@@ -19,7 +20,7 @@ def _headers_service() -> dict:
 
 
 @router.get("")
-async def list_models(model_type: str = None):
+async def list_models(request: Request, model_type: str = None):
     """List available base models"""
     params = {
         "select": "*",
@@ -29,35 +30,42 @@ async def list_models(model_type: str = None):
     if model_type:
         params["model_type"] = f"eq.{model_type}"
 
-    async with httpx.AsyncClient(timeout=10) as client:
+    async def load():
+        client = supabase_rest_client()
         resp = await client.get(
             f"{_rest_base()}/base_models",
             headers=_headers_service(),
             params=params,
         )
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch models: {resp.text}")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch models: {resp.text}")
 
-    return resp.json()
+        return resp.json()
+
+    entry = await catalog_cache.get(("models", tuple(sorted(params.items()))), load)
+    return cached_response(request, entry)
 
 
 @router.get("/{slug}")
-async def get_model(slug: str):
+async def get_model(slug: str, request: Request):
     """Get a specific model by slug"""
-    async with httpx.AsyncClient(timeout=10) as client:
+    async def load():
+        client = supabase_rest_client()
         resp = await client.get(
             f"{_rest_base()}/base_models",
             headers=_headers_service(),
             params={"slug": f"eq.{slug}", "select": "*", "limit": "1"},
         )
 
-    if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to fetch model: {resp.text}")
+        if resp.status_code != 200:
+            raise HTTPException(status_code=500, detail=f"Failed to fetch model: {resp.text}")
+
+        rows = resp.json()
+        return rows[0] if rows else None
 
-    rows = resp.json()
-    if not rows:
+    entry = await catalog_cache.get(("models", "slug", slug), load)
+    if entry.value is None:
         raise HTTPException(status_code=404, detail="Model not found")
-    
-    return rows[0]
 
+    return cached_response(request, entry)
@@ -1,10 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
+from typing import Optional
 import uuid
 
 from ..auth import get_user_id
-from ..r2 import presign_put, presign_get
-from ..supabase_db import get_job_owned, append_job_input
+from ..r2 import presign_put_async, presign_get_async, presign_get_many_async
+from ..supabase_db import get_job_owned, append_job_inputs
 
 router = APIRouter(prefix="/storage", tags=["storage"])
 
@@ -15,6 +16,8 @@ ALLOWED_MIME = {
 }
 
 MAX_BYTES = 25 * 1024 * 1024  # 25 MB
+MAX_BATCH_KEYS = 200
+MAX_UPLOAD_FILES = 20
 
 class UploadUrlReq(BaseModel):
     job_id: str
@@ -22,42 +25,99 @@ class UploadUrlReq(BaseModel):
     mime: str
     bytes: int
 
+class UploadFileSpec(BaseModel):
+    filename: str
+    mime: str
+    bytes: int
+
+class UploadUrlsReq(BaseModel):
+    job_id: str
+    files: list[UploadFileSpec]
+
 class DownloadUrlReq(BaseModel):
     key: str
 
+class DownloadUrlsReq(BaseModel):
+    job_id: Optional[str] = None  # sign every output of this job
+    keys: list[str] = []
+
 def _make_input_key(*, user_id: str, job_id: str, ext: str) -> str:
     file_id = str(uuid.uuid4())
     return f"users/{user_id}/jobs/{job_id}/inputs/{file_id}.{ext}"
 
-@router.post("/upload-url")
-async def generateUploadUrl(req: UploadUrlReq, user_id: str = Depends(get_user_id)):
-    job = await get_job_owned(job_id=req.job_id, user_id=user_id)
-
-    if job.get("status") != "queued":
-        raise HTTPException(status_code=400, detail="Job not in 'queued' state")
-
-    if req.bytes <= 0 or req.bytes > MAX_BYTES:
+def _validate_file(*, mime: str, size: int):
+    if size <= 0 or size > MAX_BYTES:
         raise HTTPException(status_code=400, detail="File size not allowed")
 
-    if req.mime not in ALLOWED_MIME:
+    if mime not in ALLOWED_MIME:
         raise HTTPException(status_code=400, detail="MIME type not allowed")
 
+@router.post("/upload-url")
+async def generateUploadUrl(req: UploadUrlReq, user_id: str = Depends(get_user_id)):
+    _validate_file(mime=req.mime, size=req.bytes)
+
     ext = ALLOWED_MIME[req.mime]
     key = _make_input_key(user_id=user_id, job_id=req.job_id, ext=ext)
 
-    put_url = presign_put(key=key, content_type=req.mime, expires_seconds=600)
+    put_url = await presign_put_async(key=key, content_type=req.mime, expires_seconds=600)
 
     input_entry = {"key": key, "mime": req.mime, "bytes": req.bytes}
-    await append_job_input(job_id=req.job_id, user_id=user_id, input_entry=input_entry)
+    job = await append_job_inputs(job_id=req.job_id, user_id=user_id, input_entries=[input_entry])
+    if job is None:
+        await get_job_owned(job_id=req.job_id, user_id=user_id)
+        raise HTTPException(status_code=400, detail="Job not in 'queued' state")
 
     return {"key": key, "put_url": put_url}
 
+@router.post("/upload-urls")
+async def generateUploadUrls(req: UploadUrlsReq, user_id: str = Depends(get_user_id)):
+    if not req.files or len(req.files) > MAX_UPLOAD_FILES:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {MAX_UPLOAD_FILES} files per request")
+
+    for f in req.files:
+        _validate_file(mime=f.mime, size=f.bytes)
+
+    entries = []
+    uploads = []
+    for f in req.files:
+        key = _make_input_key(user_id=user_id, job_id=req.job_id, ext=ALLOWED_MIME[f.mime])
+        put_url = await presign_put_async(key=key, content_type=f.mime, expires_seconds=600)
+        entries.append({"key": key, "mime": f.mime, "bytes": f.bytes})
+        uploads.append({"key": key, "put_url": put_url})
+
+    job = await append_job_inputs(job_id=req.job_id, user_id=user_id, input_entries=entries)
+    if job is None:
+        # Only pay for the lookup on failure, to report 404 vs wrong state
+        await get_job_owned(job_id=req.job_id, user_id=user_id)
+        raise HTTPException(status_code=400, detail="Job not in 'queued' state")
+
+    return {"uploads": uploads}
+
 @router.post("/download-url")
 async def generateDownloadUrl(req: DownloadUrlReq, user_id: str = Depends(get_user_id)):
     prefix = f"users/{user_id}/"
     if not req.key.startswith(prefix):
         raise HTTPException(status_code=403, detail="Not allowed")
 
-    get_url = presign_get(key=req.key, expires_seconds=1800)
+    get_url = await presign_get_async(key=req.key, expires_seconds=1800)
     return {"get_url": get_url}
 
+@router.post("/download-urls")
+async def generateDownloadUrls(req: DownloadUrlsReq, user_id: str = Depends(get_user_id)):
+    keys = list(req.keys)
+    if req.job_id:
+        job = await get_job_owned(job_id=req.job_id, user_id=user_id)
+        keys.extend(entry["key"] for entry in job.get("output_urls") or [] if entry.get("key"))
+
+    # Preserve order, drop duplicates
+    keys = list(dict.fromkeys(keys))
+    if len(keys) > MAX_BATCH_KEYS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_KEYS} keys per request")
+
+    prefix = f"users/{user_id}/"
+    if any(not key.startswith(prefix) for key in keys):
+        raise HTTPException(status_code=403, detail="Not allowed")
+
+    urls = await presign_get_many_async(keys=keys, expires_seconds=1800)
+    return {"urls": [{"key": key, "get_url": urls[key]} for key in keys]}
+
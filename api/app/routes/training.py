@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
 from typing import Optional
-import httpx
 
 from ..config import settings
+from ..upstream import supabase_rest_client
 from ..auth import get_user_id
+from ..supabase_db import append_training_images
+from ..pagination import decode_cursor, keyset_filter, page
 
 router = APIRouter(prefix="/training", tags=["training"])
 
@@ -55,13 +57,13 @@ async def create_training_job(req: CreateTrainingJobRequest, user_id: str = Depe
         "progress": 0,
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={"select": "*"},
-            json=payload,
-        )
+    client = supabase_rest_client()
+    resp = await client.post(
+        f"{_rest_base()}/training_jobs",
+        headers=_headers_service(),
+        params={"select": "*"},
+        json=payload,
+    )
 
     if resp.status_code not in (200, 201):
         raise HTTPException(status_code=500, detail=f"Failed to create training job: {resp.text}")
@@ -70,38 +72,57 @@ async def create_training_job(req: CreateTrainingJobRequest, user_id: str = Depe
 
 
 @router.get("")
-async def list_training_jobs(user_id: str = Depends(get_user_id)):
-    """List user's training jobs"""
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={
-                "user_id": f"eq.{user_id}",
-                "select": "*",
-                "order": "created_at.desc",
-            },
-        )
+async def list_training_jobs(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    paged: bool = False,
+    user_id: str = Depends(get_user_id),
+):
+    """List user's training jobs, newest first.
+
+    With `paged=true` (or a `cursor`): keyset paginated as {items, next_cursor}.
+    Otherwise the original bare list of every job.
+    """
+    paged = paged or cursor is not None
+    params = {
+        "user_id": f"eq.{user_id}",
+        "select": "*",
+        "order": "created_at.desc,id.desc",
+    }
+    if paged:
+        params["limit"] = str(limit + 1)
+    if cursor:
+        after = decode_cursor(cursor, fields=("created_at", "id"))
+        params["or"] = keyset_filter(column="created_at", value=after["created_at"], tiebreak_value=after["id"])
+
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/training_jobs",
+        headers=_headers_service(),
+        params=params,
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to fetch jobs: {resp.text}")
 
-    return resp.json()
+    if not paged:
+        return resp.json()
+    return page(resp.json(), limit=limit, column="created_at")
 
 
 @router.get("/{job_id}")
 async def get_training_job(job_id: str, user_id: str = Depends(get_user_id)):
     """Get a specific training job"""
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={
-                "id": f"eq.{job_id}",
-                "user_id": f"eq.{user_id}",
-                "select": "*",
-            },
-        )
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/training_jobs",
+        headers=_headers_service(),
+        params={
+            "id": f"eq.{job_id}",
+            "user_id": f"eq.{user_id}",
+            "select": "*",
+        },
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to fetch job: {resp.text}")
@@ -116,67 +137,43 @@ async def get_training_job(job_id: str, user_id: str = Depends(get_user_id)):
 @router.post("/{job_id}/upload-image")
 async def add_training_image(job_id: str, image_key: str, user_id: str = Depends(get_user_id)):
     """Add an uploaded image to training job"""
-    # Get existing job
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={
-                "id": f"eq.{job_id}",
-                "user_id": f"eq.{user_id}",
-                "select": "*",
-            },
-        )
-        
-        if resp.status_code != 200 or not resp.json():
-            raise HTTPException(status_code=404, detail="Training job not found")
-        
-        job = resp.json()[0]
-        images = job.get("input_images") or []
-        images.append({"key": image_key})
-        
-        # Update
-        resp = await client.patch(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={"id": f"eq.{job_id}"},
-            json={"input_images": images},
-        )
-
-    return {"image_count": len(images)}
+    job = await append_training_images(job_id=job_id, user_id=user_id, images=[{"key": image_key}])
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+
+    return {"image_count": len(job.get("input_images") or [])}
 
 
 @router.post("/{job_id}/start")
 async def start_training(job_id: str, user_id: str = Depends(get_user_id)):
     """Start the training job on RunPod"""
     # Get job
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "select": "*"},
-        )
-        
-        if not resp.json():
-            raise HTTPException(status_code=404, detail="Job not found")
-        
-        job = resp.json()[0]
-        
-        if job["status"] != "queued":
-            raise HTTPException(status_code=400, detail="Job already started")
-        
-        if len(job.get("input_images", [])) < 5:
-            raise HTTPException(status_code=400, detail="Need at least 5 training images")
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/training_jobs",
+        headers=_headers_service(),
+        params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "select": "*"},
+    )
+
+    if not resp.json():
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    job = resp.json()[0]
+
+    if job["status"] != "queued":
+        raise HTTPException(status_code=400, detail="Job already started")
+
+    if len(job.get("input_images", [])) < 5:
+        raise HTTPException(status_code=400, detail="Need at least 5 training images")
 
     # TODO: Dispatch to RunPod training endpoint
     # For now, just update status
-    async with httpx.AsyncClient(timeout=10) as client:
-        await client.patch(
-            f"{_rest_base()}/training_jobs",
-            headers=_headers_service(),
-            params={"id": f"eq.{job_id}"},
-            json={"status": "processing"},
-        )
+    await client.patch(
+        f"{_rest_base()}/training_jobs",
+        headers=_headers_service(),
+        params={"id": f"eq.{job_id}"},
+        json={"status": "processing"},
+    )
 
     return {"status": "processing", "message": "Training job started"}
 
@@ -0,0 +1,62 @@
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Request
+from urllib.parse import urlencode
+import hashlib
+import hmac
+
+from ..config import settings
+from ..job_results import apply_runpod_result
+
+router = APIRouter(prefix="/webhooks", tags=["webhooks"])
+
+
+def _sign(*, job_id: str, user_id: str) -> str:
+    message = f"{job_id}:{user_id}".encode()
+    return hmac.new(settings.RUNPOD_WEBHOOK_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def runpod_webhook_url(*, job_id: str, user_id: str) -> str | None:
+    """Callback URL for RunPod, or None when webhooks aren't configured.
+
+    RunPod doesn't sign its callbacks, so the URL carries an HMAC of the
+    job/user pair that only this API can produce.
+    """
+    if not settings.PUBLIC_API_URL or not settings.RUNPOD_WEBHOOK_SECRET:
+        return None
+    query = urlencode({"job_id": job_id, "user_id": user_id, "token": _sign(job_id=job_id, user_id=user_id)})
+    return f"{settings.PUBLIC_API_URL.rstrip('/')}/api/webhooks/runpod?{query}"
+
+
+async def _persist(*, job_id: str, user_id: str, data: dict):
+    try:
+        await apply_runpod_result(job_id=job_id, user_id=user_id, data=data)
+    except Exception as e:
+        print(f"runpod webhook persist failed for job {job_id}: {e}")
+        import traceback
+        traceback.print_exc()
+
+
+@router.post("/runpod")
+async def runpod_webhook(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    job_id: str,
+    user_id: str,
+    token: str,
+):
+    """Receive RunPod job completion callbacks"""
+    if not settings.RUNPOD_WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Not found")
+
+    if not hmac.compare_digest(token, _sign(job_id=job_id, user_id=user_id)):
+        raise HTTPException(status_code=401, detail="Invalid webhook token")
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid JSON body")
+    if not isinstance(data, dict):
+        raise HTTPException(status_code=400, detail="Invalid payload")
+
+    # Ack right away; finish_job makes redeliveries and poll races no-ops
+    background_tasks.add_task(_persist, job_id=job_id, user_id=user_id, data=data)
+    return {"ok": True}
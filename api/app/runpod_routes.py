@@ -0,0 +1,35 @@
+"""
+Job-type-aware selection of the RunPod endpoint a job is dispatched to.
+
+Image and video jobs run on separate endpoints (and GPU classes) so cheap
+SD 1.5 work never queues behind 720p Wan renders. Routes come from
+settings.RUNPOD_ROUTES; the most specific key wins.
+"""
+from .config import RunPodRoute, settings
+
+
+def resolve_route(*, job_type: str, model_name: str | None = None) -> RunPodRoute:
+    """Route for a job: "job_type:model_name", then "job_type", then the default endpoint."""
+    routes = settings.RUNPOD_ROUTES
+    if model_name and f"{job_type}:{model_name}" in routes:
+        return routes[f"{job_type}:{model_name}"]
+    if job_type in routes:
+        return routes[job_type]
+    return RunPodRoute(endpoint_id=settings.RUNPOD_ENDPOINT_ID, price_per_second=settings.RUNPOD_PRICE_PER_SECOND)
+
+
+def execution_policy(route: RunPodRoute) -> dict | None:
+    """RunPod `policy` block for a /run request, or None to use endpoint defaults."""
+    policy = {}
+    if route.execution_timeout:
+        policy["executionTimeout"] = route.execution_timeout * 1000
+    if route.ttl:
+        policy["ttl"] = route.ttl * 1000
+    return policy or None
+
+
+def sync_wait(*, estimate: float | None) -> float | None:
+    """Seconds to block on /runsync for a job estimated at `estimate` GPU-seconds, or None for /run."""
+    if not settings.RUNSYNC_ENABLED or estimate is None or estimate > settings.RUNSYNC_MAX_ESTIMATE:
+        return None
+    return settings.RUNSYNC_WAIT
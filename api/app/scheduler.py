@@ -0,0 +1,204 @@
+"""
+Affinity-aware ordering of RunPod submissions.
+
+Warm workers reload weights whenever consecutive jobs need a different SD
+model, LoRA set or Wan pipeline, and RunPod hands queued jobs to workers in
+submission order. When nothing else is being submitted a dispatch goes
+straight through. Dispatches that arrive while other submits are in flight
+wait until those return, at most SCHEDULER_HOLD_SECONDS from the oldest
+waiting job, and are then released grouped by (job_type, model_name, LoRA
+set): higher-priority lanes first, then the group the previous batch ended
+on, then the rest oldest-first. Each user gets at most
+SCHEDULER_MAX_PER_USER releases per batch so one burst can't push everyone
+else back; the remainder goes in the next batch, which starts immediately.
+
+A group's submits go out concurrently; the next group is released once they
+have returned or SCHEDULER_SUBMIT_GAP passed (a /runsync call holds its
+response open, but RunPod has queued it long before that).
+"""
+import asyncio
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from .config import settings
+
+
+def affinity_key(*, job_type: str, model_name: str, lora_names: list[str]) -> tuple:
+    """Jobs with equal keys can run back to back on a worker without reloading."""
+    return (job_type, model_name, tuple(sorted(lora_names or [])))
+
+
+class _Ticket:
+    __slots__ = ("user_id", "key", "priority", "arrived", "turn", "submitted")
+
+    def __init__(self, *, user_id: str, key: tuple, priority: int):
+        self.user_id = user_id
+        self.key = key
+        self.priority = priority
+        self.arrived = time.monotonic()
+        loop = asyncio.get_running_loop()
+        self.turn = loop.create_future()
+        self.submitted = loop.create_future()
+
+
+def order_batch(tickets: list, *, last_key: tuple | None, max_per_user: int) -> tuple[list[list], list]:
+    """Split waiting tickets (oldest first) into (groups in release order, deferred)."""
+    per_user = defaultdict(int)
+    eligible, deferred = [], []
+    for ticket in tickets:
+        if per_user[ticket.user_id] < max_per_user:
+            per_user[ticket.user_id] += 1
+            eligible.append(ticket)
+        else:
+            deferred.append(ticket)
+
+    # Priority lanes split groups, so a paid job never waits behind free ones
+    groups: dict[tuple, list] = {}
+    for ticket in eligible:
+        groups.setdefault((ticket.priority, ticket.key), []).append(ticket)
+    # Dicts keep insertion order; the stable sort leaves ties oldest-first
+    order = sorted(groups, key=lambda group: (-group[0], group[1] != last_key))
+    return [groups[group] for group in order], deferred
+
+
+class DispatchScheduler:
+    def __init__(self, *, enabled: bool, hold: float, max_per_user: int, submit_gap: float):
+        self.enabled = enabled
+        self.hold = hold
+        self.max_per_user = max_per_user
+        self.submit_gap = submit_gap
+        self.waiting: list[_Ticket] = []
+        self.releasing: list[_Ticket] = []
+        # Released tickets whose submit has neither returned nor used up submit_gap
+        self.submitting: set[_Ticket] = set()
+        self.last_key: tuple | None = None
+        self.task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+        self._idle: asyncio.Future | None = None
+        self.metrics = {
+            "batches": 0,
+            "immediate": 0,
+            "released": 0,
+            "deferred": 0,
+            "group_switches": 0,
+            "max_wait_seconds": 0.0,
+        }
+
+    @asynccontextmanager
+    async def slot(self, *, user_id: str, key: tuple, priority: int = 0):
+        """Wait for this job's turn; submit to RunPod inside the block."""
+        if not self.enabled or self.task is None:
+            yield
+            return
+
+        ticket = _Ticket(user_id=user_id, key=key, priority=priority)
+        if not self.waiting and not self.releasing and not self.submitting:
+            # No contention, so nothing to group with
+            self.metrics["immediate"] += 1
+            self._release(ticket)
+        else:
+            self.waiting.append(ticket)
+            self._wakeup.set()
+        try:
+            await ticket.turn
+        except asyncio.CancelledError:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+            raise
+        try:
+            yield
+        finally:
+            if not ticket.submitted.done():
+                ticket.submitted.set_result(None)
+
+    def _release(self, ticket: _Ticket) -> bool:
+        if ticket.turn.done():
+            # The request went away while queued
+            return False
+        wait = time.monotonic() - ticket.arrived
+        self.metrics["max_wait_seconds"] = max(self.metrics["max_wait_seconds"], wait)
+        if ticket.key != self.last_key:
+            self.metrics["group_switches"] += 1
+            self.last_key = ticket.key
+        ticket.turn.set_result(None)
+        self.metrics["released"] += 1
+
+        self.submitting.add(ticket)
+        gap = asyncio.get_running_loop().call_later(self.submit_gap, self._submitted, ticket)
+        ticket.submitted.add_done_callback(lambda _: (gap.cancel(), self._submitted(ticket)))
+        return True
+
+    def _submitted(self, ticket: _Ticket):
+        self.submitting.discard(ticket)
+        if not self.submitting and self._idle is not None and not self._idle.done():
+            self._idle.set_result(None)
+
+    async def _hold(self):
+        """Wait while submits are in flight, until the oldest ticket has held for `hold`."""
+        loop = asyncio.get_running_loop()
+        while self.submitting:
+            remaining = self.waiting[0].arrived + self.hold - time.monotonic()
+            if remaining <= 0:
+                return
+            self._idle = loop.create_future()
+            # asyncio.wait, unlike wait_for, never swallows a cancel from stop()
+            await asyncio.wait([self._idle], timeout=remaining)
+
+    async def run(self):
+        while True:
+            if not self.waiting:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            await self._hold()
+
+            batch, self.waiting = self.waiting, []
+            groups, deferred = order_batch(batch, last_key=self.last_key, max_per_user=self.max_per_user)
+            # Deferred tickets keep their place ahead of anything that arrives meanwhile
+            self.waiting = deferred + self.waiting
+            self.metrics["batches"] += 1
+            self.metrics["deferred"] += len(deferred)
+            self.releasing = [ticket for group in groups for ticket in group]
+            for group in groups:
+                released = [ticket.submitted for ticket in group if self._release(ticket)]
+                if released:
+                    await asyncio.wait(released, timeout=self.submit_gap)
+            self.releasing = []
+
+    def start(self):
+        if self.enabled:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
+        # Let anything still queued go straight through
+        for ticket in self.releasing + self.waiting:
+            if not ticket.turn.done():
+                ticket.turn.set_result(None)
+        self.releasing, self.waiting = [], []
+        self.submitting.clear()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "waiting": len(self.waiting),
+            "submitting": len(self.submitting),
+            **self.metrics,
+        }
+
+
+dispatch_scheduler = DispatchScheduler(
+    enabled=settings.SCHEDULER_ENABLED,
+    hold=settings.SCHEDULER_HOLD_SECONDS,
+    max_per_user=settings.SCHEDULER_MAX_PER_USER,
+    submit_gap=settings.SCHEDULER_SUBMIT_GAP,
+)
@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-import httpx
+from .upstream import supabase_rest_client
 from .config import settings
 
 def _rest_base() -> str:
@@ -29,13 +29,13 @@ async def create_job(*, user_id: str, prompt: str, params: dict, model_name: str
         "error": None,
     }
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.post(
-            f"{_rest_base()}/jobs",
-            headers=_headers_service(),
-            params={"select": "*"},
-            json=payload,
-        )
+    client = supabase_rest_client()
+    resp = await client.post(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={"select": "*"},
+        json=payload,
+    )
 
     if resp.status_code not in (200, 201):
         raise HTTPException(status_code=500, detail=f"Failed to create job: {resp.text}")
@@ -43,17 +43,17 @@ async def create_job(*, user_id: str, prompt: str, params: dict, model_name: str
     return resp.json()[0]
 
 async def get_job_owned(*, job_id: str, user_id: str) -> dict:
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.get(
-            f"{_rest_base()}/jobs",
-            headers=_headers_service(),
-            params={
-                "id": f"eq.{job_id}",
-                "user_id": f"eq.{user_id}",
-                "select": "*",
-                "limit": "1",
-            },
-        )
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={
+            "id": f"eq.{job_id}",
+            "user_id": f"eq.{user_id}",
+            "select": "*",
+            "limit": "1",
+        },
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to fetch job: {resp.text}")
@@ -63,34 +63,52 @@ async def get_job_owned(*, job_id: str, user_id: str) -> dict:
         raise HTTPException(status_code=404, detail="Job not found")
     return rows[0]
 
-async def append_job_input(*, job_id: str, user_id: str, input_entry: dict) -> dict:
-    job = await get_job_owned(job_id=job_id, user_id=user_id)
-    inputs = job.get("input_urls") or []
-    inputs.append(input_entry)
-
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.patch(
-            f"{_rest_base()}/jobs",
-            headers=_headers_service(),
-            params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "select": "*"},
-            json={"input_urls": inputs},
-        )
+async def _call_rpc(fn: str, args: dict):
+    """POST to a Postgres function through PostgREST and return the decoded body."""
+    client = supabase_rest_client()
+    resp = await client.post(
+        f"{_rest_base()}/rpc/{fn}",
+        headers=_headers_service(),
+        json=args,
+    )
 
     if resp.status_code != 200:
-        raise HTTPException(status_code=500, detail=f"Failed to update inputs: {resp.text}")
+        raise HTTPException(status_code=500, detail=f"Failed to call {fn}: {resp.text}")
 
-    return resp.json()[0]
+    return resp.json()
+
+
+async def _rpc(fn: str, args: dict) -> list[dict]:
+    """Call a set-returning Postgres function and return the rows it produced."""
+    return await _call_rpc(fn, args) or []
+
+
+async def _rpc_scalar(fn: str, args: dict) -> int:
+    """Call a Postgres function that returns a single count."""
+    return await _call_rpc(fn, args) or 0
+
+
+async def append_job_inputs(*, job_id: str, user_id: str, input_entries: list[dict]) -> dict | None:
+    """Atomically append entries to a queued job's input_urls in one round trip.
+
+    Returns the updated row, or None if the job is missing, not owned or not queued.
+    """
+    rows = await _rpc(
+        "append_job_inputs",
+        {"p_job_id": job_id, "p_user_id": user_id, "p_entries": input_entries},
+    )
+    return rows[0] if rows else None
 
 
 async def update_job_fields(*, job_id: str, user_id: str, fields: dict) -> dict:
     """Patch arbitrary fields on a job row and return the updated row."""
-    async with httpx.AsyncClient(timeout=10) as client:
-        resp = await client.patch(
-            f"{_rest_base()}/jobs",
-            headers=_headers_service(),
-            params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "select": "*"},
-            json=fields,
-        )
+    client = supabase_rest_client()
+    resp = await client.patch(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "select": "*"},
+        json=fields,
+    )
 
     if resp.status_code != 200:
         raise HTTPException(status_code=500, detail=f"Failed to update job: {resp.text}")
@@ -98,18 +116,227 @@ async def update_job_fields(*, job_id: str, user_id: str, fields: dict) -> dict:
     return resp.json()[0]
 
 
-async def set_job_status(*, job_id: str, user_id: str, status: str, error: str | None = None) -> dict:
-    payload = {"status": status}
-    # Explicitly set/clear error if provided
-    if error is not None:
-        payload["error"] = error
-    return await update_job_fields(job_id=job_id, user_id=user_id, fields=payload)
+async def mark_job_dispatched(*, job_id: str, user_id: str, fields: dict | None = None) -> dict | None:
+    """Claim a queued job for dispatch. Returns None if it was not queued.
+
+    `fields` are written in the same update as the claim.
+    """
+    client = supabase_rest_client()
+    resp = await client.patch(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "status": "eq.queued", "select": "*"},
+        json={**(fields or {}), "status": "processing"},
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to update job: {resp.text}")
+
+    rows = resp.json()
+    return rows[0] if rows else None
+
+
+async def release_job_claim(*, job_id: str, user_id: str) -> dict | None:
+    """Return a claimed job to queued so it can be dispatched again.
+
+    Only touches a job still in processing, so a result that landed meanwhile
+    is never undone. Returns None if there was nothing to release.
+    """
+    client = supabase_rest_client()
+    resp = await client.patch(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={"id": f"eq.{job_id}", "user_id": f"eq.{user_id}", "status": "eq.processing", "select": "*"},
+        json={"status": "queued"},
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to update job: {resp.text}")
+
+    rows = resp.json()
+    return rows[0] if rows else None
+
+
+# Job history rows: no params or input arrays, just the first output for a thumbnail
+_JOB_SUMMARY_SELECT = "id,status,job_type,prompt,model_name,lora_names,error,created_at,thumbnail:output_urls->0"
+
+async def list_jobs_for_user(*, user_id: str, filters: dict, limit: int) -> list[dict]:
+    """A user's jobs newest first; `filters` are extra PostgREST query params."""
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={
+            **filters,
+            "user_id": f"eq.{user_id}",
+            "select": _JOB_SUMMARY_SELECT,
+            "order": "created_at.desc,id.desc",
+            "limit": str(limit),
+        },
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch jobs: {resp.text}")
+
+    return resp.json()
+
+
+async def count_inflight_jobs(*, user_id: str) -> int:
+    """How many of a user's jobs are dispatched and not yet finished."""
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/jobs",
+        headers={**_headers_service(), "Prefer": "count=exact"},
+        params={"user_id": f"eq.{user_id}", "status": "eq.processing", "select": "id", "limit": "0"},
+    )
+
+    if resp.status_code not in (200, 206):
+        raise HTTPException(status_code=500, detail=f"Failed to count jobs: {resp.text}")
+
+    # Content-Range: */<total>
+    return int(resp.headers.get("content-range", "*/0").rsplit("/", 1)[1])
+
+
+async def insert_job_timing(row: dict) -> None:
+    """Store one worker timing record; a retried webhook for the same job is ignored."""
+    client = supabase_rest_client()
+    resp = await client.post(
+        f"{_rest_base()}/job_timings",
+        headers={**_headers_service(), "Prefer": "resolution=ignore-duplicates,return=minimal"},
+        params={"on_conflict": "job_id"},
+        json=row,
+    )
+
+    if resp.status_code not in (200, 201, 204):
+        raise HTTPException(status_code=500, detail=f"Failed to store job timing: {resp.text}")
+
+
+async def list_job_timings(*, limit: int) -> list[dict]:
+    """Most recent timing records, newest first."""
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/job_timings",
+        headers=_headers_service(),
+        params={
+            "select": "job_type,model_name,work_units,work_seconds,load_seconds,delay_ms",
+            "order": "created_at.desc",
+            "limit": str(limit),
+        },
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch job timings: {resp.text}")
+
+    return resp.json()
+
+
+async def list_inflight_jobs(*, limit: int) -> list[dict]:
+    """Dispatched jobs that haven't reached a terminal state yet, oldest first.
+
+    Includes jobs whose RunPod id was never stored, so they can still expire.
+    """
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/jobs",
+        headers=_headers_service(),
+        params={
+            "status": "eq.processing",
+            "select": "id,user_id,status,runpod_job_id,runpod_endpoint_id,created_at,dispatched_at",
+            "order": "created_at.asc",
+            "limit": str(limit),
+        },
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch jobs: {resp.text}")
+
+    return resp.json()
+
+
+async def finish_job(*, job_id: str, user_id: str, status: str, outputs: list[dict] | None = None, error: str | None = None) -> dict | None:
+    """Move an in-flight job to completed/failed once.
+
+    Returns the updated row on the transition, or None if it was already terminal.
+    """
+    rows = await _rpc(
+        "finish_job",
+        {
+            "p_job_id": job_id,
+            "p_user_id": user_id,
+            "p_status": status,
+            "p_outputs": outputs or [],
+            "p_error": error,
+        },
+    )
+    return rows[0] if rows else None
+
+
+async def append_training_images(*, job_id: str, user_id: str, images: list[dict]) -> dict | None:
+    """Append image entries to a training job's input_images; None if not found/owned."""
+    rows = await _rpc(
+        "append_training_images",
+        {"p_job_id": job_id, "p_user_id": user_id, "p_entries": images},
+    )
+    return rows[0] if rows else None
+
+
+async def increment_lora_downloads(*, deltas: dict[str, int]) -> int:
+    """Add per-LoRA download deltas in one statement; returns rows updated."""
+    return await _rpc_scalar("increment_lora_downloads", {"p_deltas": deltas})
+
+
+async def get_result_cache_entry(*, fingerprint: str) -> dict | None:
+    """Unexpired result_cache row for a fingerprint, if any."""
+    client = supabase_rest_client()
+    resp = await client.get(
+        f"{_rest_base()}/result_cache",
+        headers=_headers_service(),
+        params={
+            "fingerprint": f"eq.{fingerprint}",
+            "or": "(expires_at.is.null,expires_at.gt.now)",
+            "select": "fingerprint,outputs,source_job_id,expires_at",
+            "limit": "1",
+        },
+    )
+
+    if resp.status_code != 200:
+        raise HTTPException(status_code=500, detail=f"Failed to fetch result cache: {resp.text}")
+
+    rows = resp.json()
+    return rows[0] if rows else None
+
+
+async def put_result_cache_entry(*, fingerprint: str, outputs: list[dict], source_job_id: str, expires_at: str | None) -> None:
+    """Insert or replace the outputs cached for a fingerprint."""
+    client = supabase_rest_client()
+    resp = await client.post(
+        f"{_rest_base()}/result_cache",
+        headers={**_headers_service(), "Prefer": "resolution=merge-duplicates,return=minimal"},
+        params={"on_conflict": "fingerprint"},
+        json={
+            "fingerprint": fingerprint,
+            "outputs": outputs,
+            "source_job_id": source_job_id,
+            "expires_at": expires_at,
+        },
+    )
+
+    if resp.status_code not in (200, 201, 204):
+        raise HTTPException(status_code=500, detail=f"Failed to store result cache: {resp.text}")
+
+
+async def delete_result_cache_entry(*, fingerprint: str) -> None:
+    client = supabase_rest_client()
+    resp = await client.delete(
+        f"{_rest_base()}/result_cache",
+        headers=_headers_service(),
+        params={"fingerprint": f"eq.{fingerprint}"},
+    )
 
+    if resp.status_code not in (200, 204):
+        raise HTTPException(status_code=500, detail=f"Failed to delete result cache entry: {resp.text}")
 
-async def append_job_outputs(*, job_id: str, user_id: str, outputs: list[dict]) -> dict:
-    """Append output entries to a job's output_urls array."""
-    job = await get_job_owned(job_id=job_id, user_id=user_id)
-    existing = job.get("output_urls") or []
-    updated = existing + outputs
-    return await update_job_fields(job_id=job_id, user_id=user_id, fields={"output_urls": updated})
 
+async def prune_result_cache() -> int:
+    """Delete expired result_cache rows; returns how many were removed."""
+    return await _rpc_scalar("prune_result_cache", {})
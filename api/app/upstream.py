@@ -0,0 +1,98 @@
+import httpx
+from .config import settings
+
+SUPABASE_REST = "supabase_rest"
+SUPABASE_AUTH = "supabase_auth"
+RUNPOD = "runpod"
+
+
+class UpstreamPool:
+    """A shared keep-alive httpx client for one upstream, with reuse counters."""
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self.client: httpx.AsyncClient | None = None
+        self.requests = 0
+        self.connections_opened = 0
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = settings.UPSTREAM_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print(f"[upstream] h2 not installed, {self.name} falling back to HTTP/1.1")
+                http2 = False
+
+        return httpx.AsyncClient(
+            http2=http2,
+            timeout=httpx.Timeout(self.timeout, connect=settings.UPSTREAM_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.UPSTREAM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.UPSTREAM_MAX_KEEPALIVE,
+                keepalive_expiry=settings.UPSTREAM_KEEPALIVE_EXPIRY,
+            ),
+            event_hooks={"request": [self._on_request]},
+        )
+
+    async def _on_request(self, request: httpx.Request):
+        self.requests += 1
+        request.extensions["trace"] = self._on_trace
+
+    async def _on_trace(self, event_name: str, info: dict):
+        # Only fired when the pool has no idle connection to hand out
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def get(self) -> httpx.AsyncClient:
+        if self.client is None or self.client.is_closed:
+            self.client = self._build_client()
+        return self.client
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "connections_reused": max(self.requests - self.connections_opened, 0),
+        }
+
+
+_pools: dict[str, UpstreamPool] = {
+    SUPABASE_REST: UpstreamPool(SUPABASE_REST, timeout=settings.SUPABASE_TIMEOUT),
+    SUPABASE_AUTH: UpstreamPool(SUPABASE_AUTH, timeout=settings.SUPABASE_TIMEOUT),
+    RUNPOD: UpstreamPool(RUNPOD, timeout=settings.RUNPOD_TIMEOUT),
+}
+
+
+def supabase_rest_client() -> httpx.AsyncClient:
+    return _pools[SUPABASE_REST].get()
+
+
+def supabase_auth_client() -> httpx.AsyncClient:
+    return _pools[SUPABASE_AUTH].get()
+
+
+def runpod_client() -> httpx.AsyncClient:
+    return _pools[RUNPOD].get()
+
+
+async def startup():
+    """Open every upstream pool. Called from the app lifespan."""
+    for pool in _pools.values():
+        pool.get()
+
+
+async def shutdown():
+    """Close every upstream pool, draining idle keep-alive connections."""
+    for pool in _pools.values():
+        await pool.close()
+
+
+def pool_stats() -> dict:
+    return {name: pool.stats() for name, pool in _pools.items()}
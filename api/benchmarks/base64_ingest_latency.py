@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Event-loop lag while a large base64 result is ingested.
+
+Run from api/ (needs requirements-dev.txt for moto):
+    python benchmarks/base64_ingest_latency.py [--mib 64] [--tick-ms 5]
+
+Uploads a random result to a local moto S3 server twice: once by calling
+r2.upload_base64 on the event loop, the way a blocking handler would, and
+once through r2.upload_base64_async as apply_runpod_result does. Meanwhile a
+ticker task sleeps --tick-ms at a time and records how late each wake-up
+is; that lateness is what every other request on the worker sees.
+"""
+import argparse
+import asyncio
+import base64
+import logging
+import os
+import socket
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Settings are read at import; only the R2 client is used, against moto
+for name, placeholder in [
+    ("NEXT_PUBLIC_SUPABASE_URL", "http://127.0.0.1:9"),
+    ("NEXT_PUBLIC_SUPABASE_ANON_KEY", "unused"),
+    ("NEXT_PUBLIC_SUPABASE_SERVICE_ROLE_KEY", "unused"),
+    ("R2_ACCOUNT_ID", "unused"),
+    ("R2_BUCKET_NAME", "ingest-benchmark"),
+    ("R2_ACCESS_KEY_ID", "testing"),
+    ("R2_SECRET_ACCESS_KEY", "testing"),
+    ("R2_ENDPOINT", "http://127.0.0.1:9"),
+    ("RUNPOD_API_KEY", "unused"),
+    ("RUNPOD_ENDPOINT_ID", "unused"),
+]:
+    os.environ.setdefault(name, placeholder)
+
+import boto3  # noqa: E402
+from moto.server import ThreadedMotoServer  # noqa: E402
+
+from app import r2  # noqa: E402
+from app.config import settings  # noqa: E402
+
+
+def _start_moto():
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    client = boto3.client(
+        "s3",
+        endpoint_url=f"http://127.0.0.1:{port}",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="auto",
+    )
+    client.create_bucket(Bucket=settings.R2_BUCKET_NAME, CreateBucketConfiguration={"LocationConstraint": "auto"})
+    return server, client
+
+
+async def _measure(upload, tick: float) -> tuple[float, list[float]]:
+    """Run `upload` alongside a ticker; returns (seconds, lateness per tick in ms)."""
+    lags: list[float] = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(tick)
+            lags.append((time.perf_counter() - started - tick) * 1000)
+
+    task = asyncio.create_task(ticker())
+    await asyncio.sleep(tick * 5)
+    started = time.perf_counter()
+    await upload()
+    elapsed = time.perf_counter() - started
+    done.set()
+    await task
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mib", type=int, default=64, help="decoded result size")
+    parser.add_argument("--tick-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server, client = _start_moto()
+    r2._client = client
+    data = base64.b64encode(os.urandom(args.mib * 1024 * 1024)).decode()
+    tick = args.tick_ms / 1000
+
+    async def inline():
+        r2.upload_base64(key="bench/inline.mp4", data=data)
+
+    async def offloaded():
+        await r2.upload_base64_async(key="bench/offloaded.mp4", data=data)
+
+    try:
+        print(f"{args.mib} MiB result, {args.tick_ms:g} ms ticker, {settings.R2_UPLOAD_WORKERS} upload workers")
+        print(f"{'path':<22}{'upload s':>10}{'ticks':>8}{'p50 lag ms':>12}{'p99 lag ms':>12}{'max lag ms':>12}")
+        for label, upload in [("inline on the loop", inline), ("upload_base64_async", offloaded)]:
+            elapsed, lags = asyncio.run(_measure(upload, tick))
+            p99 = statistics.quantiles(lags, n=100, method="inclusive")[98] if len(lags) >= 2 else max(lags)
+            print(
+                f"{label:<22}{elapsed:>10.2f}{len(lags):>8}"
+                f"{statistics.median(lags):>12.1f}{p99:>12.1f}{max(lags):>12.1f}"
+            )
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
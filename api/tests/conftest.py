@@ -0,0 +1,185 @@
+"""
+API tests import the app with placeholder credentials; nothing here talks to
+the real Supabase, R2 or RunPod. Settings are read at import time, so the
+environment is filled in before any `app` module is imported.
+"""
+import os
+import sys
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.update(
+    {
+        "NEXT_PUBLIC_SUPABASE_URL": "http://supabase.test",
+        "NEXT_PUBLIC_SUPABASE_ANON_KEY": "anon",
+        "NEXT_PUBLIC_SUPABASE_SERVICE_ROLE_KEY": "service-role",
+        "R2_ACCOUNT_ID": "account",
+        "R2_BUCKET_NAME": "api-tests",
+        "R2_ACCESS_KEY_ID": "testing",
+        "R2_SECRET_ACCESS_KEY": "testing",
+        "R2_ENDPOINT": "https://account.r2.cloudflarestorage.com",
+        "RUNPOD_API_KEY": "runpod-key",
+        "RUNPOD_ENDPOINT_ID": "default-endpoint",
+    }
+)
+
+
+class FakeRunPod:
+    """In-process stand-in for the RunPod serverless API.
+
+    `statuses` maps RunPod job ids to the payload /status returns (unknown ids
+    get RunPod's 404). `runsync_payload` is what /runsync answers with; /run
+    and a runsync that outlives its wait queue the job. A set `submit_error`
+    makes every submit fail with a 500.
+    """
+
+    def __init__(self):
+        self.statuses: dict[str, dict] = {}
+        self.runsync_payload: dict | None = None
+        self.submit_error: str | None = None
+        self.calls: list[tuple[str, str]] = []
+        self.next_id = 0
+        self.app = FastAPI()
+
+        @self.app.post("/v2/{endpoint_id}/{action}")
+        async def submit(endpoint_id: str, action: str, request: Request):
+            self.calls.append((action, endpoint_id))
+            if self.submit_error:
+                return JSONResponse({"error": self.submit_error}, status_code=500)
+            self.next_id += 1
+            runpod_job_id = f"rp-{self.next_id}"
+            if action == "runsync" and self.runsync_payload is not None:
+                return {"id": runpod_job_id, **self.runsync_payload}
+            self.statuses[runpod_job_id] = {"id": runpod_job_id, "status": "IN_QUEUE"}
+            return {"id": runpod_job_id, "status": "IN_QUEUE"}
+
+        @self.app.get("/v2/{endpoint_id}/status/{runpod_job_id}")
+        async def status(endpoint_id: str, runpod_job_id: str):
+            self.calls.append(("status", endpoint_id))
+            if runpod_job_id not in self.statuses:
+                return JSONResponse({"error": "job not found"}, status_code=404)
+            return self.statuses[runpod_job_id]
+
+
+@pytest.fixture
+def fake_runpod():
+    from app import upstream
+
+    fake = FakeRunPod()
+    pool = upstream._pools[upstream.RUNPOD]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    yield fake
+    pool.client = None
+
+
+USER = "user-1"
+
+
+@pytest.fixture
+def input_sizes():
+    """Input key -> (width, height) that dispatch reads from the object header; unknown keys read as None."""
+    return {}
+
+
+@pytest.fixture
+def store(monkeypatch, input_sizes):
+    """In-memory jobs table behind the Supabase helpers dispatch uses."""
+    from app import admission as admission_module
+    from app import job_results
+    from app.image_headers import InputProbe
+    from app.routes import jobs as jobs_routes
+
+    rows = {}
+
+    async def get_job_owned(*, job_id, user_id):
+        if job_id not in rows:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return dict(rows[job_id])
+
+    async def mark_job_dispatched(*, job_id, user_id, fields=None):
+        row = rows[job_id]
+        if row["status"] != "queued":
+            return None
+        row.update(fields or {}, status="processing")
+        return dict(row)
+
+    async def release_job_claim(*, job_id, user_id):
+        row = rows[job_id]
+        if row["status"] != "processing":
+            return None
+        row["status"] = "queued"
+        return dict(row)
+
+    async def update_job_fields(*, job_id, user_id, fields):
+        rows[job_id].update(fields)
+        return dict(rows[job_id])
+
+    async def finish_job(*, job_id, user_id, status, outputs=None, error=None):
+        row = rows[job_id]
+        if row["status"] != "processing":
+            return None
+        row.update(status=status, output_urls=(row.get("output_urls") or []) + (outputs or []), error=error)
+        return dict(row)
+
+    async def probe_inputs(keys, *, read_headers):
+        return [
+            InputProbe(etag=f"etag-{key}", size=input_sizes.get(key) if read_headers else None)
+            for key in keys
+        ]
+
+    async def count_inflight_jobs(*, user_id):
+        return sum(1 for row in rows.values() if row["status"] == "processing")
+
+    for name, fake in [
+        ("get_job_owned", get_job_owned),
+        ("mark_job_dispatched", mark_job_dispatched),
+        ("release_job_claim", release_job_claim),
+        ("update_job_fields", update_job_fields),
+        ("probe_inputs", probe_inputs),
+    ]:
+        monkeypatch.setattr(jobs_routes, name, fake)
+    monkeypatch.setattr(job_results, "finish_job", finish_job)
+    monkeypatch.setattr(admission_module, "count_inflight_jobs", count_inflight_jobs)
+    monkeypatch.setattr(admission_module.admission, "backend", admission_module.MemoryBackend())
+    return rows
+
+
+@pytest.fixture
+def make_job(store):
+    """Add a queued img2img job with one input; returns its id."""
+
+    def make(job_id="job-1", **params):
+        store[job_id] = {
+            "id": job_id,
+            "user_id": USER,
+            "status": "queued",
+            "job_type": "img2img",
+            "model_name": "realistic-vision-v5",
+            "prompt": "a lighthouse",
+            "lora_names": [],
+            "params": params,
+            "input_urls": [{"key": f"users/{USER}/jobs/{job_id}/inputs/a.png"}],
+            "output_urls": [],
+        }
+        return job_id
+
+    return make
+
+
+@pytest.fixture
+def client():
+    """TestClient signed in as USER on the paid lane (no lifespan, so no background tasks)."""
+    from fastapi.testclient import TestClient
+
+    from app.auth import get_user_id, get_user_plan
+    from app.main import app
+
+    app.dependency_overrides[get_user_id] = lambda: USER
+    app.dependency_overrides[get_user_plan] = lambda: "paid"
+    yield TestClient(app, raise_server_exceptions=False, headers={"Authorization": "Bearer test"})
+    app.dependency_overrides.clear()
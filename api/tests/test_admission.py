@@ -0,0 +1,154 @@
+"""
+Token-bucket admission: refill, debt for jobs bigger than the bucket, the
+Retry-After a rejection carries, and refunds for submits RunPod refused.
+"""
+import asyncio
+import math
+
+import pytest
+from fastapi import HTTPException
+
+from app import admission as admission_module
+from app.admission import Admission, MemoryBackend
+from app.config import AdmissionLane
+
+USER = "user-1"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(admission_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def _take(backend, cost, *, rate=2.0, burst=100.0):
+    return asyncio.run(backend.take("u:img2img", cost=cost, rate=rate, burst=burst))
+
+
+def test_bucket_starts_full_and_refills_at_rate(clock):
+    backend = MemoryBackend()
+
+    assert _take(backend, 60) == 0
+    assert _take(backend, 40) == 0
+    # Empty: 30 tokens at 2/s is 15s away
+    assert _take(backend, 30) == pytest.approx(15.0)
+    clock[0] += 10
+    assert _take(backend, 30) == pytest.approx(5.0)
+    clock[0] += 5
+    assert _take(backend, 30) == 0
+
+
+def test_refill_is_capped_at_burst(clock):
+    backend = MemoryBackend()
+    _take(backend, 100)
+    clock[0] += 3600
+
+    assert _take(backend, 100) == 0
+    assert _take(backend, 1) == pytest.approx(0.5)
+
+
+def test_job_bigger_than_burst_runs_from_a_full_bucket_and_leaves_debt(clock):
+    backend = MemoryBackend()
+
+    assert _take(backend, 250) == 0
+    # 150 tokens in debt: even a 1-second job waits for 151 tokens at 2/s
+    assert _take(backend, 1) == pytest.approx(75.5)
+    # Another oversized job only needs a full bucket again, not its whole cost
+    clock[0] += 125
+    assert _take(backend, 250) == 0
+
+
+def test_zero_rate_never_refills(clock):
+    backend = MemoryBackend()
+    _take(backend, 10, rate=0.0, burst=10.0)
+
+    assert _take(backend, 1, rate=0.0, burst=10.0) == math.inf
+
+
+def test_buckets_are_per_key(clock):
+    backend = MemoryBackend()
+    asyncio.run(backend.take("u:img2vid", cost=100, rate=2.0, burst=100.0))
+
+    assert asyncio.run(backend.take("u:img2img", cost=100, rate=2.0, burst=100.0)) == 0
+
+
+def test_refund_returns_the_charge_up_to_burst(clock):
+    backend = MemoryBackend()
+    _take(backend, 80)
+    asyncio.run(backend.refund("u:img2img", cost=80, rate=2.0, burst=100.0))
+    assert _take(backend, 100) == 0
+
+    clock[0] += 10
+    asyncio.run(backend.refund("u:img2img", cost=500, rate=2.0, burst=100.0))
+    assert _take(backend, 100) == 0
+    assert _take(backend, 1) > 0
+
+
+def _admission(monkeypatch, *, inflight=0):
+    async def count_inflight_jobs(*, user_id):
+        return inflight
+
+    monkeypatch.setattr(admission_module, "count_inflight_jobs", count_inflight_jobs)
+    return Admission(enabled=True, backend=MemoryBackend())
+
+
+LANE = AdmissionLane(rate=0.5, burst=60, max_inflight=2)
+
+
+def _admit(admission, cost):
+    asyncio.run(admission.admit(user_id=USER, lane=LANE, job_type="img2img", cost=cost))
+
+
+def test_rejection_carries_retry_after_in_whole_seconds(clock, monkeypatch):
+    admission = _admission(monkeypatch)
+    _admit(admission, 50)
+
+    with pytest.raises(HTTPException) as rejected:
+        _admit(admission, 20.2)
+
+    assert rejected.value.status_code == 429
+    # (20.2 - 10) / 0.5 = 20.4s, rounded up
+    assert rejected.value.headers["Retry-After"] == "21"
+    assert admission.stats == {"admitted": 1, "rejected_rate": 1, "rejected_inflight": 0, "refunded": 0}
+
+
+def test_unknown_cost_charges_one_second(clock, monkeypatch):
+    admission = _admission(monkeypatch)
+    for _ in range(60):
+        _admit(admission, None)
+
+    with pytest.raises(HTTPException) as rejected:
+        _admit(admission, None)
+    assert rejected.value.headers["Retry-After"] == "2"
+
+
+def test_inflight_cap_is_checked_before_the_bucket(clock, monkeypatch):
+    admission = _admission(monkeypatch, inflight=3)
+
+    with pytest.raises(HTTPException) as rejected:
+        _admit(admission, 1)
+
+    assert rejected.value.headers["Retry-After"] == "15"
+    assert admission.stats["rejected_inflight"] == 1
+    # Nothing was charged
+    assert asyncio.run(admission.backend.take(f"{USER}:img2img", cost=60, rate=0.5, burst=60)) == 0
+
+
+def test_refused_submit_refunds_the_charge(client, store, make_job, fake_runpod, monkeypatch, clock):
+    from app.config import settings
+
+    monkeypatch.setitem(settings.ADMISSION_LANES, "paid", LANE)
+    monkeypatch.setattr(admission_module.admission, "enabled", True)
+    refunded = admission_module.admission.stats["refunded"]
+    # Bigger than the bucket: without a refund the retry would wait out the debt
+    job_id = make_job(num_inference_steps=150)
+    fake_runpod.submit_error = "no capacity"
+
+    assert client.post(f"/api/jobs/{job_id}/dispatch").status_code == 502
+
+    fake_runpod.submit_error = None
+    resp = client.post(f"/api/jobs/{job_id}/dispatch")
+    assert resp.status_code == 200
+    assert store[job_id]["status"] == "processing"
+    assert admission_module.admission.stats["refunded"] == refunded + 1
@@ -0,0 +1,129 @@
+"""
+Server-side JSONB appends: each helper is one RPC round trip, concurrent
+appends don't lose entries, and the upload-URL routes tell a missing job
+(404) from one that is no longer queued (400) only after the RPC misses.
+
+A fake PostgREST applies each append function in a single step, the way the
+SQL functions in migrations 003/004 run as one UPDATE.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app import supabase_db
+
+# The user the client fixture signs in as
+USER = "user-1"
+
+# fn -> (table, column, queued rows only)
+_APPEND_FUNCTIONS = {
+    "append_job_inputs": ("jobs", "input_urls", True),
+    "append_training_images": ("training_jobs", "input_images", False),
+}
+
+
+class FakePostgREST:
+    def __init__(self):
+        self.tables = {"jobs": {}, "training_jobs": {}}
+        self.requests: list[tuple[str, str]] = []
+        self.app = FastAPI()
+
+        @self.app.post("/rest/v1/rpc/{fn}")
+        async def rpc(fn: str, request: Request):
+            self.requests.append(("POST", fn))
+            args = await request.json()
+            table, column, queued_only = _APPEND_FUNCTIONS[fn]
+            # Let other requests interleave, as they would between statements
+            await asyncio.sleep(0)
+            row = self.tables[table].get(args["p_job_id"])
+            if row is None or row["user_id"] != args["p_user_id"] or (queued_only and row["status"] != "queued"):
+                return []
+            row[column] = (row.get(column) or []) + args["p_entries"]
+            return [dict(row)]
+
+        @self.app.get("/rest/v1/jobs")
+        async def select_jobs(request: Request):
+            self.requests.append(("GET", "jobs"))
+            job_id = request.query_params["id"].removeprefix("eq.")
+            user_id = request.query_params["user_id"].removeprefix("eq.")
+            row = self.tables["jobs"].get(job_id)
+            return [dict(row)] if row and row["user_id"] == user_id else []
+
+    def add_job(self, job_id, *, status="queued", table="jobs"):
+        self.tables[table][job_id] = {"id": job_id, "user_id": USER, "status": status}
+
+
+@pytest.fixture
+def postgrest():
+    from app import upstream
+
+    fake = FakePostgREST()
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    yield fake
+    pool.client = None
+
+
+def test_concurrent_appends_keep_every_entry(postgrest):
+    postgrest.add_job("job-1")
+    postgrest.add_job("train-1", table="training_jobs")
+
+    async def append_all():
+        await asyncio.gather(
+            *(
+                supabase_db.append_job_inputs(job_id="job-1", user_id=USER, input_entries=[{"key": f"in-{i}"}])
+                for i in range(40)
+            ),
+            *(
+                supabase_db.append_training_images(job_id="train-1", user_id=USER, images=[{"key": f"img-{i}"}])
+                for i in range(40)
+            ),
+        )
+
+    asyncio.run(append_all())
+
+    inputs = postgrest.tables["jobs"]["job-1"]["input_urls"]
+    images = postgrest.tables["training_jobs"]["train-1"]["input_images"]
+    assert sorted(entry["key"] for entry in inputs) == sorted(f"in-{i}" for i in range(40))
+    assert sorted(entry["key"] for entry in images) == sorted(f"img-{i}" for i in range(40))
+    # One RPC per append, never a read-modify-write
+    assert len(postgrest.requests) == 80
+    assert {method for method, _ in postgrest.requests} == {"POST"}
+
+
+def test_batch_upload_urls_append_in_one_round_trip(client, postgrest):
+    postgrest.add_job("job-1")
+    files = [{"filename": f"{i}.png", "mime": "image/png", "bytes": 1000} for i in range(3)]
+
+    resp = client.post("/api/storage/upload-urls", json={"job_id": "job-1", "files": files})
+
+    assert resp.status_code == 200
+    uploads = resp.json()["uploads"]
+    assert [entry["key"] for entry in postgrest.tables["jobs"]["job-1"]["input_urls"]] == [u["key"] for u in uploads]
+    assert all(u["key"].startswith(f"users/{USER}/jobs/job-1/inputs/") and u["put_url"] for u in uploads)
+    assert postgrest.requests == [("POST", "append_job_inputs")]
+
+
+@pytest.mark.parametrize("path", ["/api/storage/upload-urls", "/api/storage/upload-url"])
+def test_upload_urls_missing_job_is_404(client, postgrest, path):
+    body = {"job_id": "nope", "filename": "a.png", "mime": "image/png", "bytes": 10}
+    if path.endswith("urls"):
+        body = {"job_id": "nope", "files": [{"filename": "a.png", "mime": "image/png", "bytes": 10}]}
+
+    resp = client.post(path, json=body)
+
+    assert resp.status_code == 404
+    # The lookup only happens after the append matched nothing
+    assert postgrest.requests == [("POST", "append_job_inputs"), ("GET", "jobs")]
+
+
+def test_upload_urls_after_dispatch_is_400(client, postgrest):
+    postgrest.add_job("job-1", status="processing")
+    files = [{"filename": "a.png", "mime": "image/png", "bytes": 10}]
+
+    resp = client.post("/api/storage/upload-urls", json={"job_id": "job-1", "files": files})
+
+    assert resp.status_code == 400
+    assert "input_urls" not in postgrest.tables["jobs"]["job-1"]
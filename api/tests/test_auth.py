@@ -0,0 +1,169 @@
+"""
+Token verification against a fake Supabase Auth: local JWKS verification
+(expiry, bad signatures, key rotation, refresh failures, single-flight
+refresh) and how long remote-mode answers are cached.
+"""
+import asyncio
+import time
+
+import httpx
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse
+
+
+def _rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _jwk(private_key, kid: str) -> dict:
+    jwk = jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key(), as_dict=True)
+    return {**jwk, "kid": kid, "alg": "RS256", "use": "sig"}
+
+
+def _token(private_key, kid: str, *, sub="user-1", exp_in=3600) -> str:
+    claims = {"sub": sub, "aud": "authenticated", "exp": int(time.time()) + exp_in}
+    return jwt.encode(claims, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+class FakeSupabaseAuth:
+    """Serves a mutable JWKS and /auth/v1/user for a set of live tokens."""
+
+    def __init__(self):
+        self.jwks: list[dict] = []
+        self.jwks_error = False
+        self.jwks_fetches = 0
+        self.live_tokens: dict[str, str] = {}
+        self.user_calls = 0
+        self.app = FastAPI()
+
+        @self.app.get("/auth/v1/.well-known/jwks.json")
+        async def jwks():
+            self.jwks_fetches += 1
+            # Give concurrent callers a chance to pile up behind the lock
+            await asyncio.sleep(0.01)
+            if self.jwks_error:
+                return JSONResponse({"error": "unavailable"}, status_code=503)
+            return {"keys": self.jwks}
+
+        @self.app.get("/auth/v1/user")
+        async def user(request: Request):
+            self.user_calls += 1
+            token = request.headers["authorization"].split(" ", 1)[1]
+            if token not in self.live_tokens:
+                return JSONResponse({"msg": "invalid JWT"}, status_code=401)
+            return {"id": self.live_tokens[token]}
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    from app import auth as auth_module
+    from app import upstream
+
+    fake = FakeSupabaseAuth()
+    pool = upstream._pools[upstream.SUPABASE_AUTH]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    monkeypatch.setattr(auth_module, "_token_cache", auth_module._VerifiedTokenCache(max_size=100))
+    monkeypatch.setattr(auth_module, "_jwks_cache", auth_module._JwksCache(ttl_seconds=600))
+    monkeypatch.setattr(auth_module.settings, "AUTH_VERIFY_MODE", "local")
+    yield fake
+    pool.client = None
+
+
+def _verify(token):
+    from app.auth import verify_token
+
+    return asyncio.run(verify_token(token))
+
+
+def _rejected(token) -> str:
+    with pytest.raises(HTTPException) as excinfo:
+        _verify(token)
+    assert excinfo.value.status_code == 401
+    return excinfo.value.detail
+
+
+def test_local_verifies_signature_and_expiry(auth):
+    key = _rsa_key()
+    auth.jwks = [_jwk(key, "k1")]
+
+    assert _verify(_token(key, "k1")) == "user-1"
+    assert _rejected(_token(key, "k1", sub="user-2", exp_in=-60)) == "Token expired"
+    # Right kid, wrong private key
+    assert _rejected(_token(_rsa_key(), "k1", sub="user-3")) == "Invalid token"
+    assert _rejected(_token(key, "unknown-kid", sub="user-4")) == "Invalid token"
+
+
+def test_rotation_picks_up_new_keys_and_retires_old_ones(auth, monkeypatch):
+    from app import auth as auth_module
+
+    monkeypatch.setattr(auth_module, "_JWKS_MIN_REFRESH_SECONDS", 0)
+    old, new = _rsa_key(), _rsa_key()
+    auth.jwks = [_jwk(old, "old")]
+    assert _verify(_token(old, "old")) == "user-1"
+
+    auth.jwks = [_jwk(new, "new")]
+    # An unknown kid triggers a refetch rather than waiting out the TTL
+    assert _verify(_token(new, "new", sub="user-2")) == "user-2"
+    assert _rejected(_token(old, "old", sub="user-3")) == "Invalid token"
+    assert auth.jwks_fetches == 3
+
+
+def test_failed_refresh_keeps_cached_keys(auth, monkeypatch):
+    from app import auth as auth_module
+
+    key = _rsa_key()
+    auth.jwks = [_jwk(key, "k1")]
+    assert _verify(_token(key, "k1")) == "user-1"
+
+    auth.jwks_error = True
+    auth_module._jwks_cache.ttl_seconds = 0
+    assert _verify(_token(key, "k1", sub="user-2")) == "user-2"
+    assert _verify(_token(key, "k1", sub="user-3")) == "user-3"
+    # The failure backs off instead of refetching on every request
+    assert auth.jwks_fetches == 2
+
+
+def test_failed_first_fetch_is_503(auth):
+    auth.jwks_error = True
+    with pytest.raises(HTTPException) as excinfo:
+        _verify(_token(_rsa_key(), "k1"))
+    assert excinfo.value.status_code == 503
+
+
+def test_concurrent_misses_share_one_jwks_fetch(auth):
+    from app.auth import verify_token
+
+    key = _rsa_key()
+    auth.jwks = [_jwk(key, "k1")]
+    tokens = [_token(key, "k1", sub=f"user-{i}") for i in range(20)]
+
+    async def verify_all():
+        return await asyncio.gather(*(verify_token(token) for token in tokens))
+
+    assert asyncio.run(verify_all()) == [f"user-{i}" for i in range(20)]
+    assert auth.jwks_fetches == 1
+
+
+def test_remote_answers_are_cached_briefly(auth, monkeypatch):
+    from app import auth as auth_module
+
+    monkeypatch.setattr(auth_module.settings, "AUTH_VERIFY_MODE", "remote")
+    token = _token(_rsa_key(), "k1")
+    auth.live_tokens[token] = "user-1"
+
+    assert _verify(token) == "user-1"
+    assert _verify(token) == "user-1"
+    assert auth.user_calls == 1
+    (_, cached_until), = auth_module._token_cache._entries.values()
+    assert cached_until <= time.time() + auth_module.settings.AUTH_REMOTE_CACHE_SECONDS
+
+    # With caching off a sign-out is seen on the very next request
+    monkeypatch.setattr(auth_module.settings, "AUTH_REMOTE_CACHE_SECONDS", 0)
+    auth_module._token_cache._entries.clear()
+    assert _verify(token) == "user-1"
+    del auth.live_tokens[token]
+    assert _rejected(token) == "Invalid token"
+    assert auth.user_calls == 3
@@ -0,0 +1,102 @@
+"""
+Catalog cache: unknown slugs are only cached briefly, and search results
+can't push listings or slugs out of the main cache.
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from app.catalog_cache import CatalogCache
+
+
+def test_negative_entries_expire_after_negative_ttl(monkeypatch):
+    from app import catalog_cache as catalog_module
+
+    now = [1000.0]
+    monkeypatch.setattr(catalog_module.time, "monotonic", lambda: now[0])
+    cache = CatalogCache(ttl=60, stale_ttl=600, max_entries=10, negative_ttl=5)
+    rows = {}
+    fetches = []
+
+    async def lookup(slug):
+        async def load():
+            fetches.append(slug)
+            return rows.get(slug)
+
+        return (await cache.get(("loras", "slug", slug), load)).value
+
+    assert asyncio.run(lookup("new-lora")) is None
+    rows["new-lora"] = {"slug": "new-lora"}
+    now[0] += 4
+    assert asyncio.run(lookup("new-lora")) is None
+    now[0] += 2
+    # Past the negative TTL the miss refetches rather than serving stale
+    assert asyncio.run(lookup("new-lora")) == {"slug": "new-lora"}
+    # Positive entries keep the full TTL
+    now[0] += 30
+    assert asyncio.run(lookup("new-lora")) == {"slug": "new-lora"}
+    assert fetches == ["new-lora", "new-lora"]
+
+
+class FakeCatalog:
+    """PostgREST stand-in for the LoRA slug lookup and search RPC."""
+
+    def __init__(self):
+        self.requests = []
+        self.app = FastAPI()
+
+        @self.app.get("/rest/v1/loras")
+        async def by_slug(request: Request):
+            slug = request.query_params["slug"].removeprefix("eq.")
+            self.requests.append(("slug", slug))
+            return [{"id": "lora-1", "slug": slug, "r2_key": f"loras/{slug}.safetensors"}]
+
+        @self.app.post("/rest/v1/rpc/search_loras")
+        async def search(request: Request):
+            query = (await request.json())["p_query"]
+            self.requests.append(("search", query))
+            return [{"slug": "lora-1", "headline": query}]
+
+
+@pytest.fixture
+def catalog(monkeypatch):
+    from app import upstream
+    from app.catalog_cache import catalog_cache, search_cache
+
+    fake = FakeCatalog()
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    monkeypatch.setattr(search_cache, "max_entries", 5)
+    catalog_cache.invalidate()
+    search_cache.invalidate()
+    yield fake
+    pool.client = None
+    catalog_cache.invalidate()
+    search_cache.invalidate()
+
+
+def test_search_churn_does_not_evict_catalog_entries(client, catalog):
+    from app.catalog_cache import catalog_cache, search_cache
+
+    assert client.get("/api/loras/popular-style").status_code == 200
+    for i in range(50):
+        assert client.get("/api/loras/search", params={"q": f"query {i}"}).status_code == 200
+    assert client.get("/api/loras/popular-style").status_code == 200
+
+    assert catalog.requests.count(("slug", "popular-style")) == 1
+    assert len(search_cache._entries) == 5
+    assert list(catalog_cache._entries) == [("loras", "slug", "popular-style")]
+
+
+def test_admin_invalidate_clears_search_too(client, catalog, monkeypatch):
+    from app.config import settings
+
+    monkeypatch.setattr(settings, "CATALOG_ADMIN_TOKEN", "admin-secret")
+    client.get("/api/loras/search", params={"q": "anime"})
+    resp = client.post("/api/admin/catalog/invalidate", json={"namespace": "loras"}, headers={"X-Admin-Token": "admin-secret"})
+    assert resp.json() == {"ok": True, "namespace": "loras", "scope": "process"}
+    client.get("/api/loras/search", params={"q": "anime"})
+
+    assert catalog.requests.count(("search", "anime")) == 2
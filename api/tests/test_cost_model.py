@@ -0,0 +1,78 @@
+"""
+Work units the API estimates with match what the worker reports, and each
+job family has its own prior.
+"""
+import io
+
+import pytest
+
+from app.config import settings
+from app.cost_model import CostModel, work_units
+from app.image_headers import parse_image_size
+
+
+def _encode(size, image_format, **options):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", size, (120, 80, 40)).save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    "image_format, options",
+    [
+        ("PNG", {}),
+        ("JPEG", {}),
+        ("JPEG", {"progressive": True, "exif": b"Exif\x00\x00" + b"\x00" * 30000}),
+        ("WEBP", {"quality": 80}),
+        ("WEBP", {"lossless": True}),
+    ],
+)
+def test_parse_image_size(image_format, options):
+    header = _encode((777, 513), image_format, **options)[:64 * 1024]
+    assert parse_image_size(header) == (777, 513)
+
+
+def test_parse_image_size_rejects_unknown_formats():
+    assert parse_image_size(b"GIF89a" + b"\x00" * 64) is None
+    assert parse_image_size(b"\x89PNG\r\n\x1a\n") is None
+    assert parse_image_size(b"") is None
+
+
+def test_img2img_work_units_use_input_sizes():
+    params = {"num_inference_steps": 30, "strength": 0.5, "width": 512, "height": 512}
+    # The worker floors each input to a multiple of 8 and denoises int(30 * 0.5) steps
+    expected = (1024 * 768 + 640 * 480) / 1e6 * 15
+    assert work_units(
+        job_type="img2img", params=params, input_count=2, input_sizes=[(1030, 770), (640, 487)]
+    ) == pytest.approx(expected)
+
+    # An unreadable header counts at the params size
+    assert work_units(
+        job_type="img2img", params=params, input_count=2, input_sizes=[(1030, 770), None]
+    ) == pytest.approx((1024 * 768 + 512 * 512) / 1e6 * 15)
+
+
+def test_video_prior_has_its_own_overhead(monkeypatch):
+    monkeypatch.setattr(settings, "IMAGE_OVERHEAD_SECONDS", 2.0)
+    monkeypatch.setattr(settings, "VIDEO_OVERHEAD_SECONDS", 40.0)
+    model = CostModel(min_samples=20, window=100, interval=300)
+    params = {"num_inference_steps": 1, "num_frames": 1, "width": 1, "height": 1}
+
+    video = model.estimate_seconds(job_type="txt2vid", model_name="wan", params=params, input_count=0)
+    image = model.estimate_seconds(job_type="txt2img", model_name="sd", params=params, input_count=0)
+    assert video == pytest.approx(40.0 + 1e-6 * settings.VIDEO_SECONDS_PER_MPIX_FRAME_STEP)
+    assert image == pytest.approx(2.0, abs=0.01)
+
+
+def test_dispatch_estimates_from_real_input_size(client, store, make_job, fake_runpod, input_sizes, monkeypatch):
+    # A 512x512 job is well under the cap; the upload is actually 2048x2048
+    monkeypatch.setattr(settings, "JOB_MAX_GPU_SECONDS", 30.0)
+    job_id = make_job(num_inference_steps=30, strength=0.75)
+    input_sizes[store[job_id]["input_urls"][0]["key"]] = (2048, 2048)
+
+    resp = client.post(f"/api/jobs/{job_id}/dispatch")
+
+    assert resp.status_code == 400
+    assert "exceeds" in resp.json()["detail"]
+    assert fake_runpod.calls == []
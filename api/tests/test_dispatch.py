@@ -0,0 +1,127 @@
+import httpx
+from fastapi import HTTPException
+
+from app import admission as admission_module
+from app.routes import jobs as jobs_routes
+
+
+def _dispatch(client, job_id):
+    return client.post(f"/api/jobs/{job_id}/dispatch")
+
+
+def test_runpod_error_releases_claim(client, store, make_job, fake_runpod):
+    job_id = make_job()
+    fake_runpod.submit_error = "no capacity"
+
+    resp = _dispatch(client, job_id)
+
+    assert resp.status_code == 502
+    assert "no capacity" in resp.json()["detail"]
+    assert store[job_id]["status"] == "queued"
+
+def test_unexpected_failure_after_claim_releases_claim(client, store, make_job, fake_runpod, monkeypatch):
+    job_id = make_job()
+
+    async def supabase_down(*, user_id):
+        raise httpx.ConnectError("supabase unreachable")
+
+    monkeypatch.setattr(admission_module, "count_inflight_jobs", supabase_down)
+    resp = _dispatch(client, job_id)
+
+    assert resp.status_code == 500
+    assert store[job_id]["status"] == "queued"
+    assert fake_runpod.calls == []
+
+def test_failed_bookkeeping_after_submit_keeps_claim(client, store, make_job, fake_runpod, monkeypatch):
+    job_id = make_job()
+    attempts = []
+
+    async def write_fails(*, job_id, user_id, fields):
+        attempts.append(fields)
+        raise HTTPException(status_code=500, detail="Failed to update job")
+
+    monkeypatch.setattr(jobs_routes, "update_job_fields", write_fails)
+    monkeypatch.setattr(jobs_routes, "_PERSIST_BACKOFF", 0)
+    resp = _dispatch(client, job_id)
+
+    # RunPod has the job: re-queueing it would let the user pay for it twice
+    assert resp.status_code == 200
+    assert resp.json() == {"runpod_job_id": "rp-1", "status": "dispatched"}
+    assert store[job_id]["status"] == "processing"
+    assert len(attempts) == jobs_routes._PERSIST_ATTEMPTS
+    assert fake_runpod.calls == [("runsync", "default-endpoint")]
+
+def test_runpod_id_write_is_retried(client, store, make_job, fake_runpod, monkeypatch):
+    job_id = make_job()
+    real_update = jobs_routes.update_job_fields
+    failures = [HTTPException(status_code=500, detail="Failed to update job")]
+
+    async def flaky_write(*, job_id, user_id, fields):
+        if failures:
+            raise failures.pop()
+        return await real_update(job_id=job_id, user_id=user_id, fields=fields)
+
+    monkeypatch.setattr(jobs_routes, "update_job_fields", flaky_write)
+    monkeypatch.setattr(jobs_routes, "_PERSIST_BACKOFF", 0)
+    _dispatch(client, job_id)
+
+    assert store[job_id]["status"] == "processing"
+    assert store[job_id]["runpod_job_id"] == "rp-1"
+
+def test_failed_runsync_result_write_keeps_claim(client, store, make_job, fake_runpod, monkeypatch):
+    fake_runpod.runsync_payload = {"status": "COMPLETED", "output": {"status": "success", "outputs": []}}
+    job_id = make_job()
+
+    async def finish_fails(*, job_id, user_id, data):
+        raise HTTPException(status_code=500, detail="Failed to finish job")
+
+    monkeypatch.setattr(jobs_routes, "apply_runpod_result", finish_fails)
+    resp = _dispatch(client, job_id)
+
+    # The webhook or reconciler stores the result later
+    assert resp.json() == {"runpod_job_id": "rp-1", "status": "dispatched"}
+    assert store[job_id]["status"] == "processing"
+    assert store[job_id]["runpod_job_id"] == "rp-1"
+
+def _runpod_raises(monkeypatch, error):
+    from app import upstream
+
+    def handler(request):
+        raise error
+
+    monkeypatch.setattr(
+        upstream._pools[upstream.RUNPOD], "client", httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    )
+
+def test_lost_runsync_answer_keeps_claim(client, store, make_job, monkeypatch):
+    job_id = make_job()
+    _runpod_raises(monkeypatch, httpx.ReadTimeout("timed out"))
+
+    resp = _dispatch(client, job_id)
+
+    # RunPod may be running it, so it must not be dispatchable again
+    assert resp.status_code == 504
+    assert store[job_id]["status"] == "processing"
+    assert _dispatch(client, job_id).status_code == 400
+
+def test_unreachable_runpod_releases_claim(client, store, make_job, monkeypatch):
+    job_id = make_job()
+    _runpod_raises(monkeypatch, httpx.ConnectError("connection refused"))
+
+    resp = _dispatch(client, job_id)
+
+    assert resp.status_code == 502
+    assert store[job_id]["status"] == "queued"
+
+def test_rate_limited_dispatch_is_requeued(client, store, make_job, fake_runpod, monkeypatch):
+    job_id = make_job()
+
+    async def empty_bucket(key, *, cost, rate, burst):
+        return 12.0
+
+    monkeypatch.setattr(admission_module.admission.backend, "take", empty_bucket)
+    resp = _dispatch(client, job_id)
+
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "12"
+    assert store[job_id]["status"] == "queued"
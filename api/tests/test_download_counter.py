@@ -0,0 +1,102 @@
+"""
+Write-behind download counts: clicks are batched into one
+increment_lora_downloads call, a failed flush keeps its deltas for the next
+one, and stop() flushes whatever is still pending.
+"""
+import asyncio
+
+import pytest
+
+from app import download_counter as download_counter_module
+from app.download_counter import DownloadCounter
+
+
+class FakeIncrements:
+    def __init__(self):
+        self.calls: list[dict[str, int]] = []
+        self.fail = False
+
+    async def __call__(self, *, deltas: dict[str, int]) -> int:
+        if self.fail:
+            raise RuntimeError("postgrest down")
+        self.calls.append(deltas)
+        return len(deltas)
+
+
+@pytest.fixture
+def increments(monkeypatch):
+    fake = FakeIncrements()
+    monkeypatch.setattr(download_counter_module, "increment_lora_downloads", fake)
+    return fake
+
+
+def test_increments_are_batched_into_one_flush(increments):
+    counter = DownloadCounter(interval=60)
+
+    assert [counter.increment(lora_id) for lora_id in ("a", "b", "a", "a")] == [1, 1, 2, 3]
+    asyncio.run(counter.flush())
+
+    assert increments.calls == [{"a": 3, "b": 1}]
+    assert not counter.pending
+    assert counter.stats == {"increments": 4, "flushes": 1, "flush_errors": 0, "rows_flushed": 2}
+
+
+def test_nothing_pending_skips_the_call(increments):
+    counter = DownloadCounter(interval=60)
+
+    asyncio.run(counter.flush())
+
+    assert increments.calls == []
+
+
+def test_failed_flush_merges_counts_back(increments):
+    counter = DownloadCounter(interval=60)
+    counter.increment("a")
+    counter.increment("b")
+    increments.fail = True
+
+    asyncio.run(counter.flush())
+
+    assert counter.pending == {"a": 1, "b": 1}
+    assert counter.stats["flush_errors"] == 1
+
+    # Clicks that arrive before the retry add to the restored deltas
+    counter.increment("a")
+    increments.fail = False
+    asyncio.run(counter.flush())
+
+    assert increments.calls == [{"a": 2, "b": 1}]
+    assert not counter.pending
+    assert counter.stats["flushes"] == 1
+
+
+def test_stop_flushes_what_is_pending(increments):
+    counter = DownloadCounter(interval=3600)
+
+    async def lifecycle():
+        counter.start()
+        counter.increment("a")
+        counter.increment("a")
+        await counter.stop()
+
+    asyncio.run(lifecycle())
+
+    # The hour-long interval never elapsed; only the shutdown flush ran
+    assert increments.calls == [{"a": 2}]
+    assert counter.task is None
+    assert not counter.pending
+
+
+def test_background_task_flushes_every_interval(increments):
+    counter = DownloadCounter(interval=0.01)
+
+    async def lifecycle():
+        counter.start()
+        counter.increment("a")
+        await asyncio.sleep(0.05)
+        calls_before_stop = list(increments.calls)
+        await counter.stop()
+        return calls_before_stop
+
+    assert asyncio.run(lifecycle()) == [{"a": 1}]
+    assert increments.calls == [{"a": 1}]
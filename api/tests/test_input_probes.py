@@ -0,0 +1,127 @@
+"""
+Dispatch reads each input once: one ranged GET yields both the header the
+cost model sizes the job from and the ETag the result cache hashes. Probes
+are bounded in number, concurrency and time, and fall back to the params.
+"""
+import asyncio
+import io
+
+import pytest
+
+from app import image_headers
+from app.config import settings
+from app.image_headers import InputProbe, probe_inputs
+
+
+def _png(width, height):
+    Image = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class FakeR2:
+    def __init__(self, delay=0.0):
+        self.objects = {}
+        self.delay = delay
+        self.gets = []
+        self.heads = []
+        self.active = 0
+        self.max_active = 0
+
+    async def _io(self):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+
+    async def read_prefix_async(self, key, length):
+        self.gets.append(key)
+        await self._io()
+        if key not in self.objects:
+            raise FileNotFoundError(key)
+        return self.objects[key][:length], f"etag-{key}"
+
+    async def head_etag_async(self, key):
+        self.heads.append(key)
+        await self._io()
+        return f"etag-{key}"
+
+
+@pytest.fixture
+def r2(monkeypatch):
+    fake = FakeR2()
+    monkeypatch.setattr(image_headers, "read_prefix_async", fake.read_prefix_async)
+    monkeypatch.setattr(image_headers, "head_etag_async", fake.head_etag_async)
+    return fake
+
+
+def test_one_read_per_input_gives_size_and_etag(r2):
+    r2.objects = {"a.png": _png(640, 480), "b.bin": b"not an image"}
+
+    probes = asyncio.run(probe_inputs(["a.png", "b.bin", "missing.png"], read_headers=True))
+
+    assert probes == [
+        InputProbe(etag="etag-a.png", size=(640, 480)),
+        InputProbe(etag="etag-b.bin", size=None),
+        InputProbe(etag=None, size=None),
+    ]
+    assert r2.gets == ["a.png", "b.bin", "missing.png"]
+    assert r2.heads == []
+
+
+def test_etag_only_probes_use_head(r2):
+    probes = asyncio.run(probe_inputs(["clip.png"], read_headers=False))
+
+    assert probes == [InputProbe(etag="etag-clip.png", size=None)]
+    assert r2.gets == []
+
+
+def test_probes_run_in_parallel_up_to_the_limit(r2, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_PROBE_CONCURRENCY", 4)
+    r2.delay = 0.01
+    r2.objects = {f"in-{i}.png": _png(64, 64) for i in range(50)}
+
+    probes = asyncio.run(probe_inputs(list(r2.objects), read_headers=True))
+
+    assert len(probes) == 50
+    assert r2.max_active == 4
+
+
+def test_too_many_inputs_are_not_probed(r2, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_PROBE_MAX_INPUTS", 3)
+
+    assert asyncio.run(probe_inputs([f"in-{i}.png" for i in range(4)], read_headers=True)) is None
+    assert r2.gets == []
+
+
+def test_slow_probes_give_up_as_a_whole(r2, monkeypatch):
+    monkeypatch.setattr(settings, "INPUT_PROBE_TIMEOUT", 0.05)
+    r2.delay = 1.0
+
+    assert asyncio.run(probe_inputs(["slow.png"], read_headers=True)) is None
+
+
+def test_seeded_dispatch_probes_once_and_fingerprints_from_it(client, store, make_job, fake_runpod, monkeypatch):
+    from app.result_cache import result_cache
+    from app.routes import jobs as jobs_routes
+
+    calls = []
+    real_probe = jobs_routes.probe_inputs
+
+    async def counting_probe(keys, *, read_headers):
+        calls.append((list(keys), read_headers))
+        return await real_probe(keys, read_headers=read_headers)
+
+    async def no_cached_result(fingerprint):
+        return None
+
+    monkeypatch.setattr(jobs_routes, "probe_inputs", counting_probe)
+    monkeypatch.setattr(result_cache, "enabled", True)
+    monkeypatch.setattr(result_cache, "lookup", no_cached_result)
+    job_id = make_job(seed=7)
+
+    client.post(f"/api/jobs/{job_id}/dispatch")
+
+    assert calls == [([store[job_id]["input_urls"][0]["key"]], True)]
+    assert store[job_id]["fingerprint"] is not None
@@ -0,0 +1,114 @@
+"""
+/jobs/{id}/events: one watcher fans updates out to every subscriber, idle
+streams get heartbeats, and a slow subscriber only loses stale events.
+"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app import job_events
+from app.config import settings
+from app.routes import jobs as jobs_routes
+
+
+def _parse(body: str) -> tuple[list[dict], int]:
+    """(status events, heartbeat count) from an SSE body."""
+    events, heartbeats = [], 0
+    for block in body.split("\n\n"):
+        if block == ": heartbeat":
+            heartbeats += 1
+        elif block.startswith("event: status\ndata: "):
+            events.append(json.loads(block.split("data: ", 1)[1]))
+    return events, heartbeats
+
+
+@pytest.fixture
+def events_app(store, fake_runpod, monkeypatch):
+    from app.auth import get_user_id_for_stream
+    from app.main import app
+
+    monkeypatch.setattr(settings, "JOB_EVENTS_POLL_INTERVAL", 0.01)
+    monkeypatch.setattr(settings, "JOB_EVENTS_HEARTBEAT_SECONDS", 0.05)
+    monkeypatch.setattr(job_events, "get_job_owned", jobs_routes.get_job_owned)
+    app.dependency_overrides[get_user_id_for_stream] = lambda: "user-1"
+    yield app
+    app.dependency_overrides.clear()
+
+
+def _processing_job(store, make_job, fake_runpod, job_id="job-1"):
+    make_job(job_id)
+    store[job_id].update(status="processing", runpod_job_id="rp-1")
+    fake_runpod.statuses["rp-1"] = {"id": "rp-1", "status": "IN_PROGRESS", "output": {"progress": 10}}
+    return job_id
+
+
+def test_one_watcher_fans_out_to_every_subscriber(events_app, store, make_job, fake_runpod):
+    job_id = _processing_job(store, make_job, fake_runpod)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=events_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+            streams = [asyncio.create_task(http.get(f"/api/jobs/{job_id}/events")) for _ in range(3)]
+            while len(getattr(job_events._watchers.get(job_id), "subscribers", ())) < 3:
+                await asyncio.sleep(0.005)
+            assert len(job_events._watchers) == 1
+
+            fake_runpod.statuses["rp-1"]["output"] = {"progress": 60}
+            await asyncio.sleep(0.05)
+            # A webhook lands the result
+            store[job_id].update(status="completed", output_urls=[{"key": "out/a.png"}])
+            return await asyncio.gather(*streams)
+
+    responses = asyncio.run(scenario())
+
+    bodies = [_parse(resp.text)[0] for resp in responses]
+    assert all(body == bodies[0] for body in bodies)
+    assert [(event["status"], event["progress"]) for event in bodies[0]] == [
+        ("processing", 10),
+        ("processing", 60),
+        ("completed", 100),
+    ]
+    assert bodies[0][-1]["outputs"] == ["out/a.png"]
+    # The watcher is gone once the job is terminal
+    assert job_events._watchers == {}
+
+
+def test_idle_stream_sends_heartbeats(events_app, store, make_job, fake_runpod):
+    job_id = _processing_job(store, make_job, fake_runpod)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=events_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api") as http:
+            stream = asyncio.create_task(http.get(f"/api/jobs/{job_id}/events"))
+            # Nothing changes for several heartbeat intervals
+            await asyncio.sleep(0.3)
+            store[job_id].update(status="failed", error="worker crashed")
+            return await stream
+
+    resp = asyncio.run(scenario())
+
+    assert resp.headers["content-type"].startswith("text/event-stream")
+    events, heartbeats = _parse(resp.text)
+    assert [event["status"] for event in events] == ["processing", "failed"]
+    assert heartbeats >= 3
+
+
+def test_slow_subscriber_keeps_only_the_newest_events():
+    watcher = job_events.JobWatcher(job_id="job-1", user_id="user-1", runpod_job_id=None)
+
+    async def publish():
+        slow, fast = watcher.subscribe(), watcher.subscribe()
+        drained = []
+        for progress in range(40):
+            watcher._publish({"status": "processing", "progress": progress})
+            drained.append(fast.get_nowait()["progress"])
+        return slow, drained
+
+    slow, drained = asyncio.run(publish())
+
+    # The watcher never blocked on the full queue; the slow reader sees the latest state
+    assert drained == list(range(40))
+    backlog = [slow.get_nowait()["progress"] for _ in range(slow.qsize())]
+    assert backlog == list(range(40 - job_events._SUBSCRIBER_QUEUE_SIZE, 40))
@@ -0,0 +1,149 @@
+"""
+GET /api/jobs: the caller's history newest first, keyset paginated, with
+status/job_type filters and one batch of signed thumbnail URLs per page.
+
+A fake PostgREST evaluates the filters, order, keyset `or` and limit the
+route sends, and projects `thumbnail:output_urls->0` like the real select.
+"""
+import re
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+USER = "user-1"
+_KEYSET = re.compile(r'^\(created_at\.lt\."(.*)",and\(created_at\.eq\."(.*)",id\.lt\."(.*)"\)\)$')
+
+
+class FakeJobsTable:
+    def __init__(self):
+        self.rows = []
+        self.requests = []
+        self.app = FastAPI()
+
+        @self.app.get("/rest/v1/jobs")
+        async def select(request: Request):
+            params = request.query_params
+            self.requests.append(dict(params))
+            rows = [row for row in self.rows if row["user_id"] == params["user_id"].removeprefix("eq.")]
+            if "status" in params:
+                statuses = params["status"].removeprefix("in.(").removesuffix(")").split(",")
+                rows = [row for row in rows if row["status"] in statuses]
+            if "job_type" in params:
+                rows = [row for row in rows if row["job_type"] == params["job_type"].removeprefix("eq.")]
+            assert params["order"] == "created_at.desc,id.desc"
+            rows.sort(key=lambda row: (row["created_at"], row["id"]), reverse=True)
+            if "or" in params:
+                created_at, _, after_id = _KEYSET.match(params["or"]).groups()
+                rows = [row for row in rows if (row["created_at"], row["id"]) < (created_at, after_id)]
+            return [
+                {
+                    "id": row["id"],
+                    "status": row["status"],
+                    "job_type": row["job_type"],
+                    "created_at": row["created_at"],
+                    "thumbnail": row["output_urls"][0] if row["output_urls"] else None,
+                }
+                for row in rows[: int(params["limit"])]
+            ]
+
+    def add(self, job_id, *, user_id=USER, status="completed", job_type="img2img", created_at, outputs=1):
+        self.rows.append(
+            {
+                "id": job_id,
+                "user_id": user_id,
+                "status": status,
+                "job_type": job_type,
+                "created_at": created_at,
+                "output_urls": [{"key": f"outputs/{job_id}/{i}.png"} for i in range(outputs)],
+            }
+        )
+
+
+@pytest.fixture
+def jobs_table():
+    from app import upstream
+
+    table = FakeJobsTable()
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=table.app))
+    yield table
+    pool.client = None
+
+
+@pytest.fixture
+def presigns(monkeypatch):
+    """Key batches the route asks R2 to sign."""
+    from app.routes import jobs as jobs_routes
+
+    batches = []
+
+    async def presign_get_many_async(*, keys, expires_seconds=1800):
+        batches.append(list(keys))
+        return {key: f"https://r2.test/{key}?signed" for key in keys}
+
+    monkeypatch.setattr(jobs_routes, "presign_get_many_async", presign_get_many_async)
+    return batches
+
+
+def test_pages_walk_history_once_with_tied_timestamps(client, jobs_table, presigns):
+    for i in range(11):
+        # Pairs share a timestamp, so the id tiebreak decides the order
+        jobs_table.add(f"job-{i:02d}", created_at=f"2026-10-{1 + i // 2:02d}T00:00:00+00:00")
+    jobs_table.add("someone-else", user_id="user-2", created_at="2026-10-30T00:00:00+00:00")
+
+    seen, cursor = [], None
+    while True:
+        resp = client.get("/api/jobs", params={"limit": 4, **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        body = resp.json()
+        seen += [job["id"] for job in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"job-{i:02d}" for i in reversed(range(11))]
+    # One signing batch per page, sized to the page
+    assert [len(batch) for batch in presigns] == [4, 4, 3]
+    # limit + 1 rows are fetched to detect the next page
+    assert {request["limit"] for request in jobs_table.requests} == {"5"}
+
+
+def test_thumbnails_are_signed_and_missing_outputs_stay_null(client, jobs_table, presigns):
+    jobs_table.add("done", created_at="2026-10-02T00:00:00+00:00")
+    jobs_table.add("running", status="processing", created_at="2026-10-03T00:00:00+00:00", outputs=0)
+
+    items = client.get("/api/jobs").json()["items"]
+
+    assert items[0] == {
+        "id": "running", "status": "processing", "job_type": "img2img",
+        "created_at": "2026-10-03T00:00:00+00:00", "thumbnail": None,
+    }
+    assert items[1]["thumbnail"] == {"key": "outputs/done/0.png", "url": "https://r2.test/outputs/done/0.png?signed"}
+    assert presigns == [["outputs/done/0.png"]]
+
+
+def test_status_and_job_type_filters(client, jobs_table, presigns):
+    jobs_table.add("queued-img", status="queued", created_at="2026-10-01T00:00:00+00:00", outputs=0)
+    jobs_table.add("running-vid", status="processing", job_type="img2vid", created_at="2026-10-02T00:00:00+00:00", outputs=0)
+    jobs_table.add("done-vid", job_type="img2vid", created_at="2026-10-03T00:00:00+00:00")
+
+    live = client.get("/api/jobs", params={"status": "queued, processing"}).json()["items"]
+    videos = client.get("/api/jobs", params={"job_type": "img2vid"}).json()["items"]
+
+    assert [job["id"] for job in live] == ["running-vid", "queued-img"]
+    assert [job["id"] for job in videos] == ["done-vid", "running-vid"]
+    assert jobs_table.requests[0]["status"] == "in.(queued,processing)"
+    # A page with nothing to sign skips R2 entirely
+    assert presigns == [["outputs/done-vid/0.png"]]
+
+
+@pytest.mark.parametrize(
+    "params",
+    [{"status": "queued,cancelled"}, {"cursor": "not-a-cursor"}, {"limit": 101}],
+)
+def test_bad_listing_params_are_rejected_before_the_database(client, jobs_table, presigns, params):
+    resp = client.get("/api/jobs", params=params)
+
+    assert resp.status_code in (400, 422)
+    assert jobs_table.requests == []
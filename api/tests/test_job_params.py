@@ -0,0 +1,39 @@
+import pytest
+from fastapi import HTTPException
+
+from app.routes.jobs import _check_params
+
+
+@pytest.mark.parametrize("output_format", ["avif", "jpeg"])
+def test_lossless_rejected_for_lossy_formats(client, output_format):
+    resp = client.post("/api/jobs/create", json={"params": {"output_format": output_format, "lossless": True}})
+    assert resp.status_code == 400
+    assert resp.json()["detail"] == f"lossless is not supported for {output_format}"
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"output_format": "webp", "lossless": True},
+        {"output_format": "png", "lossless": True},
+        {"output_format": "avif", "lossless": False, "quality": 60},
+        {"output_format": "png", "compress_level": 1},
+    ],
+)
+def test_valid_encodings_pass(params):
+    _check_params(params)
+
+
+@pytest.mark.parametrize(
+    "params",
+    [
+        {"output_format": "gif"},
+        {"output_format": "webp", "quality": 0},
+        {"output_format": "png", "compress_level": 10},
+        {"output_format": "webp", "lossless": "yes"},
+    ],
+)
+def test_invalid_encodings_rejected(params):
+    with pytest.raises(HTTPException) as excinfo:
+        _check_params(params)
+    assert excinfo.value.status_code == 400
@@ -0,0 +1,95 @@
+"""
+GET /loras pages stay consistent while download counts change underneath,
+and clients that predate cursors still get the bare offset-paged list.
+
+A fake PostgREST serves the loras table and evaluates the order, limit and
+keyset `or` filter the route sends, so each page is computed from the
+current counts just as the database would.
+"""
+import re
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+_KEYSET = re.compile(r'^\((\w+)\.lt\."(.*)",and\(\w+\.eq\."(.*)",id\.lt\."(.*)"\)\)$')
+
+
+class FakeLorasTable:
+    def __init__(self, count: int):
+        self.rows = [
+            {
+                "id": f"lora-{i:03d}",
+                "name": f"LoRA {i}",
+                "slug": f"lora-{i}",
+                "is_public": True,
+                "download_count": i,
+                # Seeded in batches, so created_at ties are broken by id
+                "created_at": f"2026-01-{1 + i // 4:02d}T00:00:00+00:00",
+            }
+            for i in range(count)
+        ]
+        self.app = FastAPI()
+
+        @self.app.get("/rest/v1/loras")
+        async def select(request: Request):
+            params = request.query_params
+            rows = [row for row in self.rows if row["is_public"]]
+            columns = [term.split(".")[0] for term in params["order"].split(",")]
+            rows.sort(key=lambda row: tuple(row[column] for column in columns), reverse=True)
+            if "or" in params:
+                column, value, _, after_id = _KEYSET.match(params["or"]).groups()
+                cast = type(rows[0][column]) if rows else str
+                rows = [row for row in rows if (row[column], row["id"]) < (cast(value), after_id)]
+            offset = int(params.get("offset", 0))
+            return rows[offset : offset + int(params["limit"])]
+
+
+@pytest.fixture
+def loras_table():
+    from app import upstream
+    from app.catalog_cache import catalog_cache
+
+    table = FakeLorasTable(count=23)
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=table.app))
+    catalog_cache.invalidate()
+    yield table
+    pool.client = None
+    catalog_cache.invalidate()
+
+
+def test_pages_cover_every_lora_once_while_counts_change(client, loras_table):
+    seen = []
+    cursor = None
+    while True:
+        resp = client.get("/api/loras", params={"limit": 5, "paged": "true", **({"cursor": cursor} if cursor else {})})
+        assert resp.status_code == 200
+        body = resp.json()
+        seen += [item["id"] for item in body["items"]]
+        # Flushes between page requests reverse the popularity order
+        for row in loras_table.rows:
+            row["download_count"] += 1000 - 40 * row["download_count"]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(row["id"] for row in loras_table.rows)
+    assert len(seen) == len(set(seen))
+
+
+def test_cursor_from_another_listing_is_rejected(client, loras_table):
+    from app.pagination import encode_cursor
+
+    resp = client.get("/api/loras", params={"cursor": encode_cursor({"download_count": 3, "id": "lora-003"})})
+    assert resp.status_code == 400
+
+
+def test_unpaged_listing_keeps_the_legacy_shape(client, loras_table):
+    resp = client.get("/api/loras", params={"limit": 5, "offset": 5})
+
+    assert resp.status_code == 200
+    body = resp.json()
+    # A bare list, most downloaded first, as before cursors existed
+    assert isinstance(body, list)
+    assert [item["id"] for item in body] == [f"lora-{i:03d}" for i in range(17, 12, -1)]
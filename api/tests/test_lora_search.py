@@ -0,0 +1,59 @@
+"""
+GET /loras/search hands the query to the search_loras RPC and returns its
+rows in relevance order, with ETag revalidation from the search cache.
+"""
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+
+class FakeSearchRPC:
+    def __init__(self):
+        self.calls = []
+        self.app = FastAPI()
+
+        @self.app.post("/rest/v1/rpc/search_loras")
+        async def search(request: Request):
+            args = await request.json()
+            self.calls.append(args)
+            # Already ranked by the database; the route must not reorder
+            return [
+                {"slug": "neon-city", "rank": 0.9, "highlight": "<mark>Neon</mark> City"},
+                {"slug": "aaa-neon", "rank": 0.4, "highlight": "AAA <mark>neon</mark>"},
+            ][: args["p_limit"]]
+
+
+@pytest.fixture
+def search_rpc():
+    from app import upstream
+    from app.catalog_cache import search_cache
+
+    fake = FakeSearchRPC()
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    search_cache.invalidate()
+    yield fake
+    pool.client = None
+    search_cache.invalidate()
+
+
+def test_search_forwards_filters_and_keeps_rank_order(client, search_rpc):
+    resp = client.get("/api/loras/search", params={"q": "  neon ", "category": "style", "is_nsfw": "false", "limit": 5})
+
+    assert resp.status_code == 200
+    assert [row["slug"] for row in resp.json()] == ["neon-city", "aaa-neon"]
+    assert search_rpc.calls == [{"p_query": "neon", "p_category": "style", "p_is_nsfw": False, "p_limit": 5}]
+
+
+def test_repeated_search_revalidates_from_cache(client, search_rpc):
+    first = client.get("/api/loras/search", params={"q": "neon"})
+    again = client.get("/api/loras/search", params={"q": "neon"}, headers={"If-None-Match": first.headers["ETag"]})
+
+    assert again.status_code == 304
+    assert len(search_rpc.calls) == 1
+
+
+@pytest.mark.parametrize("params", [{"q": ""}, {"q": "x" * 101}, {"q": "neon", "limit": 0}])
+def test_search_rejects_bad_queries(client, search_rpc, params):
+    assert client.get("/api/loras/search", params=params).status_code == 422
+    assert search_rpc.calls == []
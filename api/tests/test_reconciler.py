@@ -0,0 +1,107 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app import job_results, reconciler as reconciler_module
+from app.reconciler import Reconciler
+
+
+def _ago(**delta):
+    return (datetime.now(timezone.utc) - timedelta(**delta)).isoformat()
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    """In-memory jobs table behind list_inflight_jobs / finish_job."""
+    rows = {}
+
+    async def list_inflight_jobs(*, limit):
+        inflight = [row for row in rows.values() if row["status"] == "processing"]
+        return sorted(inflight, key=lambda row: row["created_at"])[:limit]
+
+    async def finish_job(*, job_id, user_id, status, outputs=None, error=None):
+        row = rows[job_id]
+        if row["status"] != "processing":
+            return None
+        row.update(status=status, output_urls=outputs or [], error=error)
+        return row
+
+    monkeypatch.setattr(reconciler_module, "list_inflight_jobs", list_inflight_jobs)
+    monkeypatch.setattr(reconciler_module, "finish_job", finish_job)
+    monkeypatch.setattr(job_results, "finish_job", finish_job)
+    return rows
+
+
+def _add(rows, job_id, *, runpod_job_id, created_at, dispatched_at=None):
+    rows[job_id] = {
+        "id": job_id,
+        "user_id": "user-1",
+        "status": "processing",
+        "runpod_job_id": runpod_job_id,
+        "runpod_endpoint_id": None,
+        "created_at": created_at,
+        "dispatched_at": dispatched_at,
+    }
+
+
+def _reconciler(batch_size=200):
+    return Reconciler(interval=10, concurrency=4, batch_size=batch_size, max_age=3600)
+
+
+def test_terminal_lost_and_expired_jobs(fake_runpod, jobs):
+    fake_runpod.statuses["rp-done"] = {
+        "id": "rp-done",
+        "status": "COMPLETED",
+        "output": {"status": "success", "outputs": [{"key": "out.png"}]},
+    }
+    fake_runpod.statuses["rp-running"] = {"id": "rp-running", "status": "IN_PROGRESS"}
+    fake_runpod.statuses["rp-stuck"] = {"id": "rp-stuck", "status": "IN_QUEUE"}
+    _add(jobs, "done", runpod_job_id="rp-done", created_at=_ago(minutes=5))
+    _add(jobs, "running", runpod_job_id="rp-running", created_at=_ago(minutes=4))
+    _add(jobs, "lost", runpod_job_id="rp-expired-status", created_at=_ago(hours=3))
+    _add(jobs, "stuck", runpod_job_id="rp-stuck", created_at=_ago(days=3), dispatched_at=_ago(days=2))
+    # Created long ago but only just dispatched: not expired
+    fake_runpod.statuses["rp-late"] = {"id": "rp-late", "status": "IN_QUEUE"}
+    _add(jobs, "late", runpod_job_id="rp-late", created_at=_ago(days=5), dispatched_at=_ago(minutes=1))
+
+    reconciler = _reconciler()
+    asyncio.run(reconciler.run_once())
+
+    assert jobs["done"]["status"] == "completed"
+    assert jobs["done"]["output_urls"] == [{"key": "out.png"}]
+    assert jobs["running"]["status"] == "processing"
+    assert jobs["late"]["status"] == "processing"
+    assert jobs["lost"]["status"] == "failed"
+    assert "no longer" in jobs["lost"]["error"]
+    assert jobs["stuck"]["status"] == "failed"
+    assert reconciler.metrics["lost"] == 1
+    assert reconciler.metrics["expired"] == 1
+    assert reconciler.metrics["transitions"] == 3
+
+
+def test_dead_jobs_do_not_starve_newer_ones(fake_runpod, jobs):
+    for i in range(6):
+        _add(jobs, f"dead-{i}", runpod_job_id=f"rp-gone-{i}", created_at=_ago(hours=10, minutes=i))
+    fake_runpod.statuses["rp-new"] = {"id": "rp-new", "status": "COMPLETED", "output": {"status": "success", "outputs": []}}
+    _add(jobs, "new", runpod_job_id="rp-new", created_at=_ago(minutes=1))
+
+    reconciler = _reconciler(batch_size=3)
+    for _ in range(3):
+        asyncio.run(reconciler.run_once())
+
+    assert jobs["new"]["status"] == "completed"
+    assert all(jobs[f"dead-{i}"]["status"] == "failed" for i in range(6))
+
+
+def test_jobs_without_runpod_id_only_expire(fake_runpod, jobs):
+    _add(jobs, "unconfirmed", runpod_job_id=None, created_at=_ago(hours=3), dispatched_at=_ago(hours=2))
+    _add(jobs, "just-claimed", runpod_job_id=None, created_at=_ago(minutes=1), dispatched_at=_ago(seconds=5))
+
+    reconciler = _reconciler()
+    asyncio.run(reconciler.run_once())
+
+    assert jobs["unconfirmed"]["status"] == "failed"
+    assert jobs["just-claimed"]["status"] == "processing"
+    # Nothing to poll without an id
+    assert fake_runpod.calls == []
@@ -0,0 +1,238 @@
+"""
+Result cache: which jobs get a fingerprint, what goes into it, and how a hit
+copies another job's outputs instead of running the GPU.
+
+Input ETags come from dispatch's probes. R2 is a dict of key -> (bytes, ETag)
+behind head_etag/copy_object; a fake PostgREST holds the result_cache table
+and the finish_job RPC.
+"""
+import asyncio
+import hashlib
+
+import httpx
+import pytest
+from botocore.exceptions import ClientError
+from fastapi import FastAPI, Request
+
+from app import result_cache as result_cache_module
+from app.result_cache import ResultCache
+
+
+class FakeR2:
+    def __init__(self):
+        self.objects: dict[str, tuple[bytes, str]] = {}
+        self.heads: list[str] = []
+        self.copies: list[tuple[str, str]] = []
+
+    def put(self, key: str, body: bytes):
+        self.objects[key] = (body, hashlib.md5(body).hexdigest())
+
+    async def head_etag_async(self, key):
+        self.heads.append(key)
+        if key not in self.objects:
+            raise ClientError({"Error": {"Code": "404"}}, "HeadObject")
+        return self.objects[key][1]
+
+    async def copy_object_async(self, *, source_key, dest_key, if_match=None):
+        if source_key not in self.objects:
+            raise ClientError({"Error": {"Code": "NoSuchKey"}}, "CopyObject")
+        if if_match is not None and self.objects[source_key][1] != if_match:
+            raise ClientError({"Error": {"Code": "PreconditionFailed"}}, "CopyObject")
+        self.copies.append((source_key, dest_key))
+        self.objects[dest_key] = self.objects[source_key]
+        return self.objects[dest_key][1]
+
+
+class FakePostgREST:
+    def __init__(self):
+        self.jobs: dict[str, dict] = {}
+        self.cache: dict[str, dict] = {}
+        self.app = FastAPI()
+
+        @self.app.get("/rest/v1/result_cache")
+        async def get_entry(request: Request):
+            entry = self.cache.get(request.query_params["fingerprint"].removeprefix("eq."))
+            return [entry] if entry else []
+
+        @self.app.post("/rest/v1/result_cache")
+        async def put_entry(request: Request):
+            entry = await request.json()
+            self.cache[entry["fingerprint"]] = entry
+            return None
+
+        @self.app.delete("/rest/v1/result_cache")
+        async def delete_entry(request: Request):
+            self.cache.pop(request.query_params["fingerprint"].removeprefix("eq."), None)
+            return None
+
+        @self.app.post("/rest/v1/rpc/finish_job")
+        async def finish_job(request: Request):
+            args = await request.json()
+            row = self.jobs[args["p_job_id"]]
+            if row["user_id"] != args["p_user_id"] or row["status"] != "processing":
+                return []
+            row.update(status=args["p_status"], output_urls=row["output_urls"] + args["p_outputs"])
+            return [dict(row)]
+
+        @self.app.post("/rest/v1/rpc/prune_result_cache")
+        async def prune():
+            return 0
+
+    def add_job(self, job_id, *, user_id, status="processing", fingerprint=None, outputs=()):
+        self.jobs[job_id] = {
+            "id": job_id,
+            "user_id": user_id,
+            "status": status,
+            "fingerprint": fingerprint,
+            "output_urls": list(outputs),
+        }
+        return dict(self.jobs[job_id])
+
+
+@pytest.fixture
+def r2(monkeypatch):
+    fake = FakeR2()
+    monkeypatch.setattr(result_cache_module, "head_etag_async", fake.head_etag_async)
+    monkeypatch.setattr(result_cache_module, "copy_object_async", fake.copy_object_async)
+    return fake
+
+
+@pytest.fixture
+def db():
+    from app import upstream
+
+    fake = FakePostgREST()
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    yield fake
+    pool.client = None
+
+
+@pytest.fixture
+def cache():
+    return ResultCache(enabled=True, version="test", retention_days=30)
+
+
+def _job(**overrides):
+    job = {
+        "id": "job-a",
+        "job_type": "img2img",
+        "model_name": "realistic-vision-v5",
+        "lora_names": ["grain", "anime"],
+        "prompt": "a lighthouse",
+        "params": {"seed": 42, "guidance_scale": 7.0, "strength": 0.6, "negative_prompt": None},
+        "input_urls": [{"key": "users/a/jobs/job-a/inputs/in.png"}],
+    }
+    return {**job, **overrides}
+
+
+def test_fingerprint_ignores_representation_but_not_content(cache):
+    def fingerprint(etags=("etag-pixels",), **overrides):
+        return cache.fingerprint(_job(**overrides), input_etags=list(etags))
+
+    base = fingerprint()
+    # 7 vs 7.0, dropped nulls, LoRA order, the params copy dispatch adds and the input's key
+    assert fingerprint(
+        id="job-b",
+        lora_names=["anime", "grain"],
+        params={"seed": 42.0, "guidance_scale": 7, "strength": 0.6, "prompt": "x", "lora_names": []},
+        input_urls=[{"key": "users/b/jobs/job-b/inputs/copy.png"}],
+    ) == base
+    # Anything that changes the pixels changes the fingerprint
+    assert fingerprint(prompt="a lighthouse at night") != base
+    assert fingerprint(params={"seed": 43, "guidance_scale": 7.0, "strength": 0.6}) != base
+    assert fingerprint(model_name="dreamshaper-8") != base
+    assert fingerprint(etags=("etag-other-pixels",)) != base
+    assert ResultCache(enabled=True, version="3", retention_days=30).fingerprint(_job(), input_etags=["etag-pixels"]) != base
+
+
+@pytest.mark.parametrize("seed", [None, -1, True, "42", 4.5])
+def test_unseeded_jobs_are_not_cached(cache, seed):
+    job = _job(params={"guidance_scale": 7.0} if seed is None else {"seed": seed})
+
+    assert not cache.cacheable(job)
+    assert cache.fingerprint(job, input_etags=["etag-pixels"]) is None
+    assert cache.stats["unseeded"] == 1
+
+
+@pytest.mark.parametrize("etags", [None, ["etag-pixels", None]])
+def test_unreadable_inputs_skip_the_cache(cache, etags):
+    assert cache.cacheable(_job())
+    assert cache.fingerprint(_job(), input_etags=etags) is None
+    assert cache.stats["errors"] == 1
+
+
+def _cached_job(cache, r2, db, fingerprint="fp-1"):
+    """Job A (user a) completed with one output, recorded under `fingerprint`."""
+    r2.put("users/a/jobs/job-a/outputs/0.png", b"result")
+    job = db.add_job(
+        "job-a",
+        user_id="a",
+        status="completed",
+        fingerprint=fingerprint,
+        outputs=[{"key": "users/a/jobs/job-a/outputs/0.png", "content_type": "image/png"}],
+    )
+    asyncio.run(cache.record(job))
+    return job
+
+
+def test_hit_copies_outputs_and_finishes_the_job(cache, r2, db):
+    _cached_job(cache, r2, db)
+    db.add_job("job-b", user_id="b", fingerprint="fp-1")
+
+    async def dispatch():
+        outputs = await cache.lookup("fp-1")
+        return await cache.complete_from_cache(job_id="job-b", user_id="b", fingerprint="fp-1", outputs=outputs)
+
+    finished = asyncio.run(dispatch())
+
+    assert finished["status"] == "completed"
+    assert finished["output_urls"] == [{"key": "users/b/jobs/job-b/outputs/0.png", "content_type": "image/png"}]
+    assert r2.copies == [("users/a/jobs/job-a/outputs/0.png", "users/b/jobs/job-b/outputs/0.png")]
+    assert r2.objects["users/b/jobs/job-b/outputs/0.png"][0] == b"result"
+    # The entry now points at the fresh copy, with the ETag the copy returned
+    entry = db.cache["fp-1"]
+    assert entry["source_job_id"] == "job-b"
+    assert entry["outputs"] == [{
+        "key": "users/b/jobs/job-b/outputs/0.png",
+        "content_type": "image/png",
+        "etag": hashlib.md5(b"result").hexdigest(),
+    }]
+    # Only the original record HEADed its output; the hit reused the copy's ETag
+    assert r2.heads == ["users/a/jobs/job-a/outputs/0.png"]
+    assert cache.stats["hits"] == 1
+
+
+def test_miss(cache, r2, db):
+    assert asyncio.run(cache.lookup("fp-unknown")) is None
+    assert cache.stats["misses"] == 1
+
+
+@pytest.mark.parametrize("change", ["deleted", "overwritten"])
+def test_stale_entry_is_deleted(cache, r2, db, change):
+    _cached_job(cache, r2, db)
+    db.add_job("job-b", user_id="b", fingerprint="fp-1")
+    if change == "deleted":
+        del r2.objects["users/a/jobs/job-a/outputs/0.png"]
+    else:
+        r2.put("users/a/jobs/job-a/outputs/0.png", b"someone else's result")
+
+    async def dispatch():
+        outputs = await cache.lookup("fp-1")
+        return await cache.complete_from_cache(job_id="job-b", user_id="b", fingerprint="fp-1", outputs=outputs)
+
+    assert asyncio.run(dispatch()) is None
+    assert "fp-1" not in db.cache
+    assert r2.copies == []
+    assert db.jobs["job-b"]["status"] == "processing"
+    assert cache.stats["stale_entries"] == 1
+
+
+def test_unfinished_or_unseeded_jobs_are_not_recorded(cache, r2, db):
+    r2.put("out.png", b"result")
+    asyncio.run(cache.record({"id": "j1", "status": "failed", "fingerprint": "fp", "output_urls": [{"key": "out.png"}]}))
+    asyncio.run(cache.record({"id": "j2", "status": "completed", "fingerprint": None, "output_urls": [{"key": "out.png"}]}))
+    # An output that can't be read can't be checked later either
+    asyncio.run(cache.record({"id": "j3", "status": "completed", "fingerprint": "fp", "output_urls": [{"key": "gone.png"}]}))
+
+    assert db.cache == {}
@@ -0,0 +1,68 @@
+"""
+RunPod route selection: "job_type:model_name" beats "job_type", which beats
+the default endpoint, and a route's execution policy goes out in milliseconds.
+"""
+import pytest
+
+from app.config import RunPodRoute, settings
+from app.runpod_routes import execution_policy, resolve_route
+
+_ROUTES = {
+    "img2img": RunPodRoute(endpoint_id="image-endpoint"),
+    "img2img:sdxl-base": RunPodRoute(endpoint_id="sdxl-endpoint"),
+    "img2vid": RunPodRoute(endpoint_id="video-endpoint"),
+}
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    monkeypatch.setattr(settings, "RUNPOD_ROUTES", _ROUTES)
+    monkeypatch.setattr(settings, "RUNPOD_ENDPOINT_ID", "default-endpoint")
+    monkeypatch.setattr(settings, "RUNPOD_PRICE_PER_SECOND", 0.0004)
+
+
+@pytest.mark.parametrize(
+    "job_type, model_name, endpoint_id",
+    [
+        ("img2img", "sdxl-base", "sdxl-endpoint"),  # job_type:model_name
+        ("img2img", "realistic-vision-v5", "image-endpoint"),  # falls back to job_type
+        ("img2img", None, "image-endpoint"),
+        ("img2vid", "sdxl-base", "video-endpoint"),  # model key is per job type
+        ("txt2img", "sdxl-base", "default-endpoint"),  # nothing matches
+        ("txt2img", None, "default-endpoint"),
+    ],
+)
+def test_resolve_route_precedence(routes, job_type, model_name, endpoint_id):
+    assert resolve_route(job_type=job_type, model_name=model_name).endpoint_id == endpoint_id
+
+
+def test_default_route_carries_default_price(routes):
+    route = resolve_route(job_type="txt2img")
+
+    assert route == RunPodRoute(endpoint_id="default-endpoint", price_per_second=0.0004)
+
+
+@pytest.mark.parametrize(
+    "execution_timeout, ttl, policy",
+    [
+        (120, None, {"executionTimeout": 120_000}),
+        (None, 3600, {"ttl": 3_600_000}),
+        (1800, 7200, {"executionTimeout": 1_800_000, "ttl": 7_200_000}),
+        (None, None, None),  # endpoint defaults
+        (0, 0, None),
+    ],
+)
+def test_execution_policy_is_in_milliseconds(execution_timeout, ttl, policy):
+    route = RunPodRoute(endpoint_id="e", execution_timeout=execution_timeout, ttl=ttl)
+
+    assert execution_policy(route) == policy
+
+
+def test_dispatch_uses_the_model_route(client, make_job, fake_runpod, routes, monkeypatch):
+    monkeypatch.setitem(_ROUTES, "img2img:realistic-vision-v5", RunPodRoute(endpoint_id="rv-endpoint"))
+    job_id = make_job()
+
+    resp = client.post(f"/api/jobs/{job_id}/dispatch")
+
+    assert resp.status_code == 200
+    assert [endpoint_id for _, endpoint_id in fake_runpod.calls] == ["rv-endpoint"]
@@ -0,0 +1,43 @@
+"""
+/runsync fast path: short image jobs complete inline, and ones that outlive
+the wait continue as normal async jobs.
+"""
+from conftest import USER
+
+
+def _dispatch(client, job_id):
+    return client.post(f"/api/jobs/{job_id}/dispatch")
+
+
+def test_runsync_completes_inline(client, store, make_job, fake_runpod):
+    fake_runpod.runsync_payload = {
+        "status": "COMPLETED",
+        "output": {"status": "success", "outputs": [{"key": f"users/{USER}/jobs/job-1/outputs/o.png"}]},
+    }
+    job_id = make_job()
+
+    resp = _dispatch(client, job_id)
+
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["status"] == "completed"
+    assert body["outputs"][0]["url"].startswith("https://")
+    assert fake_runpod.calls == [("runsync", "default-endpoint")]
+    assert store[job_id]["status"] == "completed"
+
+def test_runsync_past_its_wait_continues_as_async_job(client, store, make_job, fake_runpod):
+    job_id = make_job()
+
+    resp = _dispatch(client, job_id)
+
+    assert resp.json() == {"runpod_job_id": "rp-1", "status": "dispatched"}
+    assert store[job_id]["status"] == "processing"
+    assert store[job_id]["runpod_job_id"] == "rp-1"
+
+def test_long_job_goes_to_run(client, store, make_job, fake_runpod):
+    job_id = make_job(num_inference_steps=150)
+
+    resp = _dispatch(client, job_id)
+
+    assert resp.json()["status"] == "dispatched"
+    assert fake_runpod.calls == [("run", "default-endpoint")]
@@ -0,0 +1,95 @@
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+
+from app.scheduler import DispatchScheduler, order_batch
+
+KEYS = [("img2img", f"model-{i}", ()) for i in range(6)]
+
+
+def _trace(seed=7, jobs=400, users=30):
+    """Bursty arrivals over a skewed set of model keys: (arrived, user_id, key)."""
+    rng = random.Random(seed)
+    weights = [0.35, 0.25, 0.15, 0.1, 0.1, 0.05]
+    now, trace = 0.0, []
+    for _ in range(jobs):
+        now += rng.expovariate(40.0)
+        trace.append((now, f"user-{rng.randrange(users)}", rng.choices(KEYS, weights)[0]))
+    return trace
+
+
+def _switches(keys):
+    return sum(1 for previous, key in zip([None] + keys, keys) if key != previous)
+
+
+def test_trace_replay_groups_submissions():
+    """Replays a trace in hold-sized windows and counts model switches seen by RunPod."""
+    trace = _trace()
+    fifo = [key for _, _, key in trace]
+
+    released, waiting, last_key = [], [], None
+    window_end = 0.25
+    for arrived, user_id, key in trace + [(float("inf"), None, None)]:
+        while arrived >= window_end and waiting:
+            groups, waiting = order_batch(waiting, last_key=last_key, max_per_user=4)
+            for group in groups:
+                released.extend(group)
+            last_key = released[-1].key
+            window_end += 0.25
+        if user_id is None:
+            break
+        if not waiting:
+            window_end = max(window_end, arrived + 0.25)
+        waiting.append(SimpleNamespace(user_id=user_id, key=key, priority=0, arrived=arrived))
+
+    assert len(released) == len(trace)
+    assert _switches([ticket.key for ticket in released]) < 0.6 * _switches(fifo)
+
+
+def test_order_batch_priority_and_per_user_cap():
+    tickets = [
+        SimpleNamespace(user_id="a", key=KEYS[0], priority=0),
+        SimpleNamespace(user_id="a", key=KEYS[0], priority=0),
+        SimpleNamespace(user_id="b", key=KEYS[1], priority=10),
+        SimpleNamespace(user_id="a", key=KEYS[0], priority=0),
+    ]
+    groups, deferred = order_batch(tickets, last_key=None, max_per_user=2)
+    assert [group[0].priority for group in groups] == [10, 0]
+    assert deferred == [tickets[3]]
+
+
+async def _dispatch_all(scheduler, jobs, submit_seconds):
+    order = []
+
+    async def dispatch(user_id, key):
+        async with scheduler.slot(user_id=user_id, key=key):
+            order.append(key)
+            await asyncio.sleep(submit_seconds)
+
+    scheduler.start()
+    try:
+        started = time.monotonic()
+        await asyncio.gather(*(dispatch(user_id, key) for user_id, key in jobs))
+        return order, time.monotonic() - started
+    finally:
+        await scheduler.stop()
+
+
+def test_idle_dispatch_is_not_held():
+    scheduler = DispatchScheduler(enabled=True, hold=0.5, max_per_user=4, submit_gap=0.25)
+    _, elapsed = asyncio.run(_dispatch_all(scheduler, [("a", KEYS[0])], 0.01))
+    assert elapsed < 0.1
+    assert scheduler.metrics["immediate"] == 1
+
+
+def test_concurrent_dispatches_release_groups_concurrently():
+    scheduler = DispatchScheduler(enabled=True, hold=0.5, max_per_user=4, submit_gap=0.25)
+    jobs = [(f"user-{i}", KEYS[i % 4]) for i in range(40)]
+    order, elapsed = asyncio.run(_dispatch_all(scheduler, jobs, 0.05))
+
+    assert len(order) == 40
+    # One immediate submit, then four groups of concurrent submits
+    assert elapsed < 1.0
+    assert scheduler.metrics["max_wait_seconds"] < 0.5
+    assert _switches(order) <= 5
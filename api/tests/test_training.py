@@ -0,0 +1,57 @@
+"""
+GET /training: cursor pages when asked for, the original bare list otherwise.
+"""
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+
+class FakeTrainingJobs:
+    def __init__(self, count: int):
+        self.rows = [
+            {"id": f"train-{i:02d}", "user_id": "user-1", "created_at": f"2026-10-{1 + i:02d}T00:00:00+00:00"}
+            for i in range(count)
+        ]
+        self.requests = []
+        self.app = FastAPI()
+
+        @self.app.get("/rest/v1/training_jobs")
+        async def select(request: Request):
+            params = request.query_params
+            self.requests.append(dict(params))
+            rows = sorted(self.rows, key=lambda row: (row["created_at"], row["id"]), reverse=True)
+            if "or" in params:
+                # Every created_at is distinct here, so the lt branch decides
+                after = params["or"].split('"')[1]
+                rows = [row for row in rows if row["created_at"] < after]
+            return rows[: int(params["limit"])] if "limit" in params else rows
+
+
+@pytest.fixture
+def training_jobs():
+    from app import upstream
+
+    fake = FakeTrainingJobs(count=7)
+    pool = upstream._pools[upstream.SUPABASE_REST]
+    pool.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake.app))
+    yield fake
+    pool.client = None
+
+
+def test_paged_listing_walks_every_job(client, training_jobs):
+    seen, cursor = [], None
+    while True:
+        body = client.get("/api/training", params={"limit": 3, "paged": "true", **({"cursor": cursor} if cursor else {})}).json()
+        seen += [job["id"] for job in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == [f"train-{i:02d}" for i in reversed(range(7))]
+
+
+def test_unpaged_listing_is_the_full_bare_list(client, training_jobs):
+    body = client.get("/api/training").json()
+
+    assert [job["id"] for job in body] == [f"train-{i:02d}" for i in reversed(range(7))]
+    assert "limit" not in training_jobs.requests[0]
@@ -0,0 +1,110 @@
+"""
+upload_base64 against a moto S3 server: small results are one PUT, large
+ones a multipart upload decoded slice by slice, and a failed part aborts
+the upload.
+"""
+import base64
+import os
+import socket
+
+import boto3
+import pytest
+
+from app import r2
+from app.config import settings
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(scope="module")
+def moto_s3():
+    from moto.server import ThreadedMotoServer
+
+    port = _free_port()
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port, verbose=False)
+    server.start()
+    client = boto3.client(
+        "s3",
+        endpoint_url=f"http://127.0.0.1:{port}",
+        aws_access_key_id="testing",
+        aws_secret_access_key="testing",
+        region_name="auto",
+    )
+    client.create_bucket(Bucket=settings.R2_BUCKET_NAME, CreateBucketConfiguration={"LocationConstraint": "auto"})
+    yield client
+    server.stop()
+
+
+@pytest.fixture
+def s3(moto_s3, monkeypatch):
+    monkeypatch.setattr(r2, "_client", moto_s3)
+    return moto_s3
+
+
+@pytest.fixture
+def decodes(monkeypatch):
+    """Length of every base64 string upload_base64 decodes."""
+    lengths = []
+    real = base64.b64decode
+
+    def spy(data, *args, **kwargs):
+        lengths.append(len(data))
+        return real(data, *args, **kwargs)
+
+    monkeypatch.setattr(r2.base64, "b64decode", spy)
+    return lengths
+
+
+def _get(s3, key):
+    return s3.get_object(Bucket=settings.R2_BUCKET_NAME, Key=key)
+
+
+def test_small_result_is_a_single_put(s3, decodes):
+    payload = os.urandom(300_000)
+
+    r2.upload_base64(key="results/small.mp4", data=base64.b64encode(payload).decode())
+
+    obj = _get(s3, "results/small.mp4")
+    assert obj["Body"].read() == payload
+    assert obj["ContentType"] == "video/mp4"
+    assert "-" not in obj["ETag"]
+    assert len(decodes) == 1
+
+
+def test_large_result_streams_through_multipart(s3, decodes):
+    # Two full 8 MiB parts and a partial third
+    payload = os.urandom(2 * 8 * 1024 * 1024 + 123_457)
+    data = base64.b64encode(payload).decode()
+
+    r2.upload_base64(key="results/large.mp4", data=data)
+
+    obj = _get(s3, "results/large.mp4")
+    assert obj["Body"].read() == payload
+    assert obj["ETag"].strip('"').endswith("-3")
+    # Never more than one slice decoded at a time, and the slices cover the input
+    assert max(decodes) == r2._SLICE_B64_CHARS
+    assert sum(decodes) == len(data)
+    assert all(length % 4 == 0 for length in decodes[:-1])
+
+
+def test_failed_part_aborts_the_upload(s3, monkeypatch):
+    real_upload_part = s3.upload_part
+
+    def flaky_upload_part(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise ConnectionError("R2 went away")
+        return real_upload_part(**kwargs)
+
+    monkeypatch.setattr(s3, "upload_part", flaky_upload_part)
+    data = base64.b64encode(os.urandom(2 * 8 * 1024 * 1024 + 10)).decode()
+
+    with pytest.raises(ConnectionError):
+        r2.upload_base64(key="results/broken.mp4", data=data)
+
+    assert s3.list_multipart_uploads(Bucket=settings.R2_BUCKET_NAME).get("Uploads", []) == []
+    with pytest.raises(s3.exceptions.NoSuchKey):
+        _get(s3, "results/broken.mp4")
@@ -35,6 +35,7 @@ export default function GeneratePage() {
   const unmountedRef = useRef(false)
   const pollTimeoutRef = useRef<ReturnType<typeof setTimeout> | null>(null)
   const pollingRef = useRef(false)
+  const eventSourceRef = useRef<EventSource | null>(null)
 
   useEffect(() => {
     const checkUser = async () => {
@@ -52,7 +53,7 @@ export default function GeneratePage() {
 
       try {
         const loraList = await apiClient.listLoras({ is_nsfw: true })
-        setLoras(loraList)
+        setLoras(loraList.items)
       } catch (e) {
         console.error('Failed to load LoRAs:', e)
       }
@@ -63,6 +64,7 @@ export default function GeneratePage() {
     return () => {
       unmountedRef.current = true
       if (pollTimeoutRef.current) clearTimeout(pollTimeoutRef.current)
+      eventSourceRef.current?.close()
     }
   // eslint-disable-next-line react-hooks/exhaustive-deps
   }, [])
@@ -127,6 +129,53 @@ export default function GeneratePage() {
     poll()
   }, [])
 
+  // Follow the job over the server's event stream; poll RunPod only if the
+  // browser has no EventSource or the stream can't be opened
+  const watchJob = useCallback((jobId: string, runpodJobId: string, jobType: string) => {
+    if (typeof EventSource === 'undefined') {
+      pollRunpodStatus(jobId, runpodJobId, jobType)
+      return
+    }
+
+    eventSourceRef.current?.close()
+    eventSourceRef.current = apiClient.streamJobEvents(
+      jobId,
+      async (event) => {
+        if (unmountedRef.current) return
+        if (event.status === 'completed') {
+          eventSourceRef.current = null
+          try {
+            if (event.outputs.length > 0) {
+              const { get_url } = await apiClient.getDownloadUrl(event.outputs[0])
+              setOutputUrl(get_url)
+              setOutputType(jobType === 'img2vid' ? 'video' : 'image')
+            }
+            setStatus('Complete!')
+          } catch (error) {
+            console.error('Failed to load output:', error)
+            setStatus('Error')
+          }
+          setGenerating(false)
+          return
+        }
+        if (event.status === 'failed') {
+          eventSourceRef.current = null
+          setStatus(event.error ? `Generation failed: ${event.error}` : 'Generation failed')
+          setGenerating(false)
+          return
+        }
+        setStatus(event.progress !== null ? `Processing: ${event.progress}%` : `Processing: ${event.status}`)
+      },
+      {
+        runpodJobId: runpodJobId || undefined,
+        onClosed: () => {
+          eventSourceRef.current = null
+          if (!unmountedRef.current) pollRunpodStatus(jobId, runpodJobId, jobType)
+        },
+      }
+    )
+  }, [pollRunpodStatus])
+
   const handleGenerate = async () => {
     if (!selectedFile && activeTab === 'img2vid') {
       alert('Please select an image')
@@ -175,10 +224,20 @@ export default function GeneratePage() {
       }
       setStatus('Sending to GPU...')
 
-      const { runpod_job_id } = await apiClient.dispatchJob(job_id)
+      const dispatched = await apiClient.dispatchJob(job_id)
+      if (dispatched.status === 'completed' || dispatched.status === 'failed') {
+        // Finished inline (fast path or cached result)
+        if (dispatched.outputs?.length) {
+          setOutputUrl(dispatched.outputs[0].url)
+          setOutputType(jobType === 'img2vid' ? 'video' : 'image')
+        }
+        setStatus(dispatched.status === 'completed' ? 'Complete!' : 'Generation failed')
+        setGenerating(false)
+        return
+      }
       setStatus('Processing...')
 
-      pollRunpodStatus(job_id, runpod_job_id, jobType)
+      watchJob(job_id, dispatched.runpod_job_id ?? '', jobType)
     } catch (error) {
       console.error('Generation error:', error)
       setStatus(`Error: ${error instanceof Error ? error.message : 'Unknown'}`)
@@ -23,7 +23,7 @@ export default function TrainPage() {
   const loadTrainingJobs = useCallback(async () => {
     try {
       const jobs = await apiClient.listTrainingJobs()
-      setTrainingJobs(jobs)
+      setTrainingJobs(jobs.items)
     } catch (e) {
       console.error('Failed to load training jobs:', e)
     }
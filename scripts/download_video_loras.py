@@ -33,6 +33,8 @@ R2_BUCKET_NAME = os.getenv("R2_BUCKET_NAME")
 CIVITAI_API_KEY = os.getenv("CIVITAI_API_KEY")
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+PUBLIC_API_URL = os.getenv("PUBLIC_API_URL")
+CATALOG_ADMIN_TOKEN = os.getenv("CATALOG_ADMIN_TOKEN")
 
 # VERIFIED Wan 2.1/2.2 VIDEO LoRAs from CivitAI
 # Format: (slug, civitai_version_id, filename, expected_size_mb, trigger_words)
@@ -166,6 +168,31 @@ def register_lora_in_supabase(lora_data: dict):
     return True
 
 
+def invalidate_catalog_cache():
+    """Tell the API to drop its cached LoRA catalog so new rows show up immediately"""
+    if not PUBLIC_API_URL or not CATALOG_ADMIN_TOKEN:
+        print("  ⚠ Skipping catalog cache invalidation (no PUBLIC_API_URL / CATALOG_ADMIN_TOKEN)")
+        return False
+
+    try:
+        resp = requests.post(
+            f"{PUBLIC_API_URL.rstrip('/')}/api/admin/catalog/invalidate",
+            headers={"X-Admin-Token": CATALOG_ADMIN_TOKEN},
+            json={"namespace": "loras"},
+            timeout=10,
+        )
+    except requests.RequestException as e:
+        print(f"  ⚠ Catalog cache invalidation failed: {e}")
+        return False
+
+    if resp.status_code != 200:
+        print(f"  ⚠ Catalog cache invalidation failed: {resp.text}")
+        return False
+
+    print("✓ Catalog cache invalidated")
+    return True
+
+
 def main():
     print("=" * 60)
     print("QueenCard AI - Wan 2.1/2.2 Video LoRA Downloader")
@@ -234,7 +261,10 @@ def main():
 
         except Exception as e:
             print(f"  ✗ Error: {e}")
-    
+
+    print()
+    invalidate_catalog_cache()
+
     print("\n" + "=" * 60)
     print("LORA_REGISTRY for worker/video_inference.py:")
     print("=" * 60)
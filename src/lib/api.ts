@@ -12,6 +12,7 @@ export interface LoRA {
   base_model: string
   is_nsfw: boolean
   download_count: number
+  created_at?: string
 }
 
 export interface BaseModel {
@@ -24,6 +25,31 @@ export interface BaseModel {
   is_nsfw: boolean
 }
 
+export interface JobEvent {
+  job_id: string
+  status: string
+  progress: number | null
+  outputs: string[]
+  error: string | null
+}
+
+export interface Page<T> {
+  items: T[]
+  next_cursor: string | null
+}
+
+export interface JobSummary {
+  id: string
+  status: string
+  job_type: string
+  prompt: string
+  model_name: string
+  lora_names: string[]
+  error: string | null
+  created_at: string
+  thumbnail: { key: string; type: string; url: string } | null
+}
+
 export class ApiClient {
   private token: string | null = null
 
@@ -62,14 +88,37 @@ export class ApiClient {
     lora_names?: string[]
     params?: Record<string, unknown>
   }) {
-    return this.request<{ job_id: string; status: string; job_type: string }>('/jobs/create', {
+    return this.request<{
+      job_id: string
+      status: string
+      job_type: string
+      estimate: { gpu_seconds: number; eta_seconds: number; cost: number } | null
+    }>('/jobs/create', {
       method: 'POST',
       body: JSON.stringify(data),
     })
   }
 
+  async listJobs(params?: { status?: string; job_type?: string; limit?: number; cursor?: string }) {
+    const query = new URLSearchParams()
+    if (params?.status) query.set('status', params.status)
+    if (params?.job_type) query.set('job_type', params.job_type)
+    if (params?.limit) query.set('limit', String(params.limit))
+    if (params?.cursor) query.set('cursor', params.cursor)
+    return this.request<Page<JobSummary>>(`/jobs?${query}`)
+  }
+
   async dispatchJob(jobId: string) {
-    return this.request<{ runpod_job_id: string; status: string }>(`/jobs/${jobId}/dispatch`, {
+    // Short jobs (and result-cache hits) finish inline: status is then
+    // completed/failed and outputs carry signed URLs. runpod_job_id is null
+    // for cache hits.
+    return this.request<{
+      runpod_job_id: string | null
+      status: string
+      cached?: boolean
+      outputs?: Array<{ key: string; type?: string; url: string }>
+      error?: string | null
+    }>(`/jobs/${jobId}/dispatch`, {
       method: 'POST',
     })
   }
@@ -92,6 +141,29 @@ export class ApiClient {
     return this.request<{ status: string; output?: unknown }>(`/jobs/${jobId}/runpod-status?runpod_job_id=${runpodJobId}`)
   }
 
+  streamJobEvents(
+    jobId: string,
+    onEvent: (event: JobEvent) => void,
+    options?: { runpodJobId?: string; onClosed?: () => void }
+  ) {
+    // EventSource can't send headers, so the token goes in the query string
+    const query = new URLSearchParams()
+    if (this.token) query.set('access_token', this.token)
+    if (options?.runpodJobId) query.set('runpod_job_id', options.runpodJobId)
+    const source = new EventSource(`${API_URL}/jobs/${jobId}/events?${query}`)
+    source.addEventListener('status', (e) => {
+      const event = JSON.parse((e as MessageEvent).data) as JobEvent
+      if (event.status === 'completed' || event.status === 'failed') source.close()
+      onEvent(event)
+    })
+    source.onerror = () => {
+      // EventSource retries dropped connections itself; CLOSED means it gave up
+      // (e.g. the endpoint answered with an error), so the caller should poll
+      if (source.readyState === EventSource.CLOSED) options?.onClosed?.()
+    }
+    return source
+  }
+
   // Storage
   async getUploadUrl(jobId: string, filename: string, mime: string, bytes: number) {
     return this.request<{ key: string; put_url: string }>('/storage/upload-url', {
@@ -100,6 +172,13 @@ export class ApiClient {
     })
   }
 
+  async getUploadUrls(jobId: string, files: Array<{ filename: string; mime: string; bytes: number }>) {
+    return this.request<{ uploads: Array<{ key: string; put_url: string }> }>('/storage/upload-urls', {
+      method: 'POST',
+      body: JSON.stringify({ job_id: jobId, files }),
+    })
+  }
+
   async getDownloadUrl(key: string) {
     return this.request<{ get_url: string }>('/storage/download-url', {
       method: 'POST',
@@ -107,13 +186,28 @@ export class ApiClient {
     })
   }
 
+  async getDownloadUrls(data: { job_id?: string; keys?: string[] }) {
+    return this.request<{ urls: Array<{ key: string; get_url: string }> }>('/storage/download-urls', {
+      method: 'POST',
+      body: JSON.stringify(data),
+    })
+  }
+
   // LoRAs
-  async listLoras(params?: { category?: string; is_nsfw?: boolean; search?: string }) {
-    const query = new URLSearchParams()
+  async listLoras(params?: {
+    category?: string
+    is_nsfw?: boolean
+    search?: string
+    limit?: number
+    cursor?: string
+  }) {
+    const query = new URLSearchParams({ paged: 'true' })
     if (params?.category) query.set('category', params.category)
     if (params?.is_nsfw !== undefined) query.set('is_nsfw', String(params.is_nsfw))
     if (params?.search) query.set('search', params.search)
-    return this.request<LoRA[]>(`/loras?${query}`)
+    if (params?.limit) query.set('limit', String(params.limit))
+    if (params?.cursor) query.set('cursor', params.cursor)
+    return this.request<Page<LoRA>>(`/loras?${query}`)
   }
 
   async getLoraCategories() {
@@ -140,14 +234,17 @@ export class ApiClient {
     })
   }
 
-  async listTrainingJobs() {
-    return this.request<Array<{
+  async listTrainingJobs(params?: { limit?: number; cursor?: string }) {
+    const query = new URLSearchParams({ paged: 'true' })
+    if (params?.limit) query.set('limit', String(params.limit))
+    if (params?.cursor) query.set('cursor', params.cursor)
+    return this.request<Page<{
       id: string
       status: string
       training_type: string
       progress: number
       config: Record<string, unknown>
-    }>>('/training')
+    }>>(`/training?${query}`)
   }
 
   async startTraining(jobId: string) {
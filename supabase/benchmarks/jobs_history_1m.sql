@@ -0,0 +1,111 @@
+-- GET /api/jobs on a seeded table of a million jobs.
+--
+-- Run against a scratch database with the migrations applied:
+--     psql "$DATABASE_URL" -f supabase/benchmarks/jobs_history_1m.sql
+--
+-- Seeds 1M jobs across 10k users, plus one heavy user with 100k of them,
+-- then EXPLAIN ANALYZEs the queries list_jobs_for_user sends through
+-- PostgREST: the first page, a page deep into the keyset, and the status and
+-- job_type filters. It then drops the migration 010 indexes and runs the
+-- same queries again. Everything is rolled back at the end.
+--
+-- Foreign keys to auth.users are skipped with session_replication_role,
+-- which needs a superuser. DROP INDEX locks jobs until the rollback, so
+-- don't point this at a live database.
+
+\set ON_ERROR_STOP on
+\timing on
+\set heavy_user '00000000-0000-0000-0000-000000000001'
+
+BEGIN;
+
+SET LOCAL session_replication_role = replica;
+SELECT setseed(0.14);
+
+INSERT INTO jobs (user_id, status, job_type, prompt, params, model_name,
+                  input_urls, output_urls, created_at)
+SELECT CASE WHEN i <= 100000 THEN :'heavy_user'::uuid
+            ELSE ('00000000-0000-0000-0001-' || lpad(to_hex(i % 10000), 12, '0'))::uuid
+       END,
+       -- Mostly finished history with a thin tail of live jobs
+       CASE WHEN r < 0.85 THEN 'completed' WHEN r < 0.95 THEN 'failed'
+            WHEN r < 0.98 THEN 'processing' ELSE 'queued' END,
+       (ARRAY['img2img', 'txt2img', 'img2vid', 'txt2vid'])[1 + i % 4],
+       'benchmark prompt ' || i,
+       '{"num_inference_steps": 30}'::jsonb,
+       'sd15',
+       '[]'::jsonb,
+       CASE WHEN r < 0.85
+            THEN jsonb_build_array(jsonb_build_object('key', 'outputs/bench/' || i || '.png', 'content_type', 'image/png'))
+            ELSE '[]'::jsonb END,
+       -- Spread over a year, with some same-instant ties broken by id
+       now() - (i / 2) * interval '30 seconds'
+FROM generate_series(1, 1000000) AS g(i),
+     LATERAL (SELECT random() AS r WHERE g.i IS NOT NULL) draw;
+
+ANALYZE jobs;
+
+SELECT count(*) AS jobs, count(DISTINCT user_id) AS users,
+       count(*) FILTER (WHERE user_id = :'heavy_user') AS heavy_user_jobs
+FROM jobs;
+
+-- Cursor 50k rows into the heavy user's history, as page() would encode it
+SELECT created_at AS cursor_created_at, id AS cursor_id
+FROM jobs WHERE user_id = :'heavy_user'
+ORDER BY created_at DESC, id DESC OFFSET 50000 LIMIT 1 \gset
+
+\set select 'id, status, job_type, prompt, model_name, lora_names, error, created_at, output_urls->0 AS thumbnail'
+
+\echo '--- first page'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs WHERE user_id = :'heavy_user'
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- keyset page 50k rows in'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs
+WHERE user_id = :'heavy_user'
+  AND (created_at < :'cursor_created_at' OR (created_at = :'cursor_created_at' AND id < :'cursor_id'))
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- status=queued,processing'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs
+WHERE user_id = :'heavy_user' AND status IN ('queued', 'processing')
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- job_type=img2vid'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs
+WHERE user_id = :'heavy_user' AND job_type = 'img2vid'
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- first page, typical user'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs WHERE user_id = '00000000-0000-0000-0001-000000000abc'
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+-- Same queries without the migration 010 indexes
+
+DROP INDEX idx_jobs_user_created_id;
+DROP INDEX idx_jobs_user_status;
+
+\echo '--- first page, no indexes'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs WHERE user_id = :'heavy_user'
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- keyset page 50k rows in, no indexes'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs
+WHERE user_id = :'heavy_user'
+  AND (created_at < :'cursor_created_at' OR (created_at = :'cursor_created_at' AND id < :'cursor_id'))
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+\echo '--- status=queued,processing, no indexes'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT :select FROM jobs
+WHERE user_id = :'heavy_user' AND status IN ('queued', 'processing')
+ORDER BY created_at DESC, id DESC LIMIT 25;
+
+ROLLBACK;
@@ -0,0 +1,89 @@
+-- search_loras on a synthetic catalog of 100k LoRAs.
+--
+-- Run against a scratch database with the migrations applied:
+--     psql "$DATABASE_URL" -f supabase/benchmarks/lora_search_100k.sql
+--
+-- Everything runs in one transaction that is rolled back at the end. That
+-- includes the second half, which drops the search indexes to show what the
+-- same queries cost without them. DROP INDEX locks the table until the
+-- rollback, so don't point this at a live database.
+
+\set ON_ERROR_STOP on
+\timing on
+
+BEGIN;
+
+SELECT setseed(0.42);
+
+CREATE TEMP TABLE bench_words ON COMMIT DROP AS
+SELECT ARRAY[
+    'neon', 'cyberpunk', 'anime', 'watercolor', 'portrait', 'landscape', 'pixel', 'noir',
+    'fantasy', 'steampunk', 'vaporwave', 'sketch', 'oil', 'painting', 'chibi', 'gothic',
+    'retro', 'cinematic', 'photoreal', 'ukiyo', 'lowpoly', 'isometric', 'ink', 'pastel',
+    'dragon', 'knight', 'city', 'forest', 'robot', 'samurai', 'witch', 'mecha'
+] AS w, ARRAY['general', 'style', 'character', 'concept', 'clothing', 'pose'] AS categories;
+
+INSERT INTO loras (name, slug, description, r2_key, category, tags, trigger_words,
+                   base_model, is_nsfw, is_public, download_count, created_at)
+SELECT initcap(a || ' ' || b || ' ' || c),
+       'bench-' || i,
+       'A ' || b || ' ' || d || ' LoRA trained on ' || c || ' images with a ' || a || ' look',
+       'loras/bench-' || i || '.safetensors',
+       categories[1 + i % cardinality(categories)],
+       jsonb_build_array(a, d),
+       jsonb_build_array(a || '_' || (i % 500)),
+       CASE WHEN i % 3 = 0 THEN 'sdxl' ELSE 'sd15' END,
+       i % 7 = 0,
+       i % 10 <> 0,
+       floor(random() * 10000)::int,
+       now() - i * interval '1 minute'
+FROM bench_words,
+     generate_series(1, 100000) AS g(i),
+     LATERAL (
+         SELECT w[1 + floor(random() * cardinality(w))::int] AS a,
+                w[1 + floor(random() * cardinality(w))::int] AS b,
+                w[1 + floor(random() * cardinality(w))::int] AS c,
+                w[1 + floor(random() * cardinality(w))::int] AS d
+         -- Correlate with g.i so the picks are redrawn for every row
+         WHERE g.i IS NOT NULL
+     ) picks;
+
+ANALYZE loras;
+
+SELECT count(*) AS loras, count(*) FILTER (WHERE is_public) AS public FROM loras;
+
+-- With the indexes from migration 008
+
+\echo '--- common term'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('neon');
+\echo '--- two prefixes'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('cyber drag');
+\echo '--- typo, trigram fallback only'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('steampnuk');
+\echo '--- filtered by category and nsfw'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('samurai', 'character', false);
+\echo '--- old /loras?search= filter'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, name, slug FROM loras
+WHERE is_public AND name ILIKE '%samurai%'
+ORDER BY download_count DESC LIMIT 20;
+
+-- Same queries with the search indexes gone
+
+DROP INDEX idx_loras_search_vector;
+DROP INDEX idx_loras_name_trgm;
+DROP INDEX idx_loras_slug_trgm;
+
+\echo '--- common term, no indexes'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('neon');
+\echo '--- two prefixes, no indexes'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('cyber drag');
+\echo '--- typo, no indexes'
+EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM search_loras('steampnuk');
+\echo '--- old /loras?search= filter, no indexes'
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT id, name, slug FROM loras
+WHERE is_public AND name ILIKE '%samurai%'
+ORDER BY download_count DESC LIMIT 20;
+
+ROLLBACK;
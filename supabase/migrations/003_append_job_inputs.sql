@@ -0,0 +1,17 @@
+-- Append several input entries to a queued job in a single statement.
+-- Returns the updated row, or nothing if the job is missing, not owned
+-- by the caller, or no longer queued.
+CREATE OR REPLACE FUNCTION append_job_inputs(p_job_id UUID, p_user_id UUID, p_entries JSONB)
+RETURNS SETOF jobs
+LANGUAGE sql
+AS $$
+    UPDATE jobs
+    SET input_urls = COALESCE(input_urls, '[]'::jsonb) || p_entries
+    WHERE id = p_job_id
+      AND user_id = p_user_id
+      AND status = 'queued'
+    RETURNING *;
+$$;
+
+REVOKE EXECUTE ON FUNCTION append_job_inputs(UUID, UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION append_job_inputs(UUID, UUID, JSONB) TO service_role;
@@ -0,0 +1,17 @@
+-- Server-side JSONB append so writers never read-modify-write whole arrays.
+-- The function appends with || in one statement and returns the updated row
+-- (or nothing if the row is missing or not owned by the caller).
+
+CREATE OR REPLACE FUNCTION append_training_images(p_job_id UUID, p_user_id UUID, p_entries JSONB)
+RETURNS SETOF training_jobs
+LANGUAGE sql
+AS $$
+    UPDATE training_jobs
+    SET input_images = COALESCE(input_images, '[]'::jsonb) || p_entries
+    WHERE id = p_job_id
+      AND user_id = p_user_id
+    RETURNING *;
+$$;
+
+REVOKE EXECUTE ON FUNCTION append_training_images(UUID, UUID, JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION append_training_images(UUID, UUID, JSONB) TO service_role;
@@ -0,0 +1,28 @@
+-- Move a job to a terminal state exactly once.
+-- Appends outputs and sets status/error in one statement, but only while the
+-- job is in processing, so webhook deliveries and status polls that race
+-- each other (or retry) cannot double-append outputs, flip a finished job or
+-- finish one that was released back to queued.
+-- Returns the updated row on the transition, nothing otherwise.
+CREATE OR REPLACE FUNCTION finish_job(
+    p_job_id UUID,
+    p_user_id UUID,
+    p_status TEXT,
+    p_outputs JSONB DEFAULT '[]'::jsonb,
+    p_error TEXT DEFAULT NULL
+)
+RETURNS SETOF jobs
+LANGUAGE sql
+AS $$
+    UPDATE jobs
+    SET status = p_status,
+        output_urls = COALESCE(output_urls, '[]'::jsonb) || COALESCE(p_outputs, '[]'::jsonb),
+        error = p_error
+    WHERE id = p_job_id
+      AND user_id = p_user_id
+      AND status = 'processing'
+    RETURNING *;
+$$;
+
+REVOKE EXECUTE ON FUNCTION finish_job(UUID, UUID, TEXT, JSONB, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION finish_job(UUID, UUID, TEXT, JSONB, TEXT) TO service_role;
@@ -0,0 +1,9 @@
+-- Remember which RunPod job is running each of our jobs so the API can
+-- reconcile in-flight work without relying on a browser to poll.
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS runpod_job_id TEXT;
+
+-- The reconciler scans in-flight jobs oldest first, including ones whose
+-- RunPod id was never stored so they can still expire
+CREATE INDEX IF NOT EXISTS idx_jobs_inflight
+    ON jobs(created_at)
+    WHERE status = 'processing';
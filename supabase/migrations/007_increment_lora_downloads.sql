@@ -0,0 +1,19 @@
+-- Apply a batch of download-count deltas in one statement.
+-- p_deltas is a JSON object of {"<lora uuid>": <increment>, ...}; each row is
+-- bumped relative to its current value, so concurrent flushes never lose counts.
+CREATE OR REPLACE FUNCTION increment_lora_downloads(p_deltas JSONB)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH updated AS (
+        UPDATE loras l
+        SET download_count = COALESCE(l.download_count, 0) + d.value::INTEGER
+        FROM jsonb_each_text(p_deltas) AS d(key, value)
+        WHERE l.id = d.key::UUID
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM updated;
+$$;
+
+REVOKE EXECUTE ON FUNCTION increment_lora_downloads(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION increment_lora_downloads(JSONB) TO service_role;
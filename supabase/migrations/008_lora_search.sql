@@ -0,0 +1,75 @@
+-- Ranked full-text + fuzzy search over the LoRA catalog.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+-- Weighted document: name and trigger words rank highest, then tags, then description.
+-- 'simple' keeps names/trigger words unstemmed; the description gets English stemming.
+ALTER TABLE loras ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', COALESCE(name, '')), 'A') ||
+        setweight(jsonb_to_tsvector('simple', COALESCE(trigger_words, '[]'::jsonb), '["string"]'), 'A') ||
+        setweight(jsonb_to_tsvector('simple', COALESCE(tags, '[]'::jsonb), '["string"]'), 'B') ||
+        setweight(to_tsvector('english', COALESCE(description, '')), 'C')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_loras_search_vector ON loras USING GIN (search_vector);
+
+-- Trigram indexes serve fuzzy/prefix matches on names and also make the
+-- existing `name ilike %term%` filter in list_loras index-assisted.
+CREATE INDEX IF NOT EXISTS idx_loras_name_trgm ON loras USING GIN (name gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_loras_slug_trgm ON loras USING GIN (slug gin_trgm_ops);
+
+-- Ranked search. Every query term is matched as a prefix, and names within
+-- trigram distance also match, so typos and partial words still find results.
+CREATE OR REPLACE FUNCTION search_loras(
+    p_query TEXT,
+    p_category TEXT DEFAULT NULL,
+    p_is_nsfw BOOLEAN DEFAULT NULL,
+    p_limit INTEGER DEFAULT 20
+)
+RETURNS TABLE (
+    id UUID,
+    name TEXT,
+    slug TEXT,
+    description TEXT,
+    preview_url TEXT,
+    category TEXT,
+    tags JSONB,
+    trigger_words JSONB,
+    base_model TEXT,
+    is_nsfw BOOLEAN,
+    download_count INTEGER,
+    rank REAL,
+    highlight TEXT
+)
+LANGUAGE sql
+STABLE
+AS $$
+    WITH q AS (
+        SELECT to_tsquery('simple', string_agg(quote_literal(lexeme) || ':*', ' & ')) AS ts
+        FROM unnest(tsvector_to_array(to_tsvector('simple', p_query))) AS lexeme
+    ),
+    matches AS (
+        SELECT l.*,
+               (COALESCE(ts_rank_cd(l.search_vector, q.ts), 0) + similarity(l.name, p_query))::REAL AS rank,
+               q.ts
+        FROM loras l, q
+        WHERE l.is_public = true
+          AND (p_category IS NULL OR l.category = p_category)
+          AND (p_is_nsfw IS NULL OR l.is_nsfw = p_is_nsfw)
+          AND ((q.ts IS NOT NULL AND l.search_vector @@ q.ts) OR l.name % p_query)
+        ORDER BY rank DESC, l.download_count DESC, l.id
+        LIMIT LEAST(GREATEST(p_limit, 1), 100)
+    )
+    -- Highlight only the rows actually returned; ts_headline is the expensive part
+    SELECT m.id, m.name, m.slug, m.description, m.preview_url, m.category, m.tags,
+           m.trigger_words, m.base_model, m.is_nsfw, m.download_count, m.rank,
+           CASE WHEN m.ts IS NULL THEN m.name
+                ELSE ts_headline('simple', m.name || ' — ' || COALESCE(m.description, ''), m.ts,
+                                 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5')
+           END AS highlight
+    FROM matches m
+    ORDER BY m.rank DESC, m.download_count DESC, m.id;
+$$;
+
+GRANT EXECUTE ON FUNCTION search_loras(TEXT, TEXT, BOOLEAN, INTEGER) TO anon, authenticated, service_role;
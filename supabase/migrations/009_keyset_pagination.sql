@@ -0,0 +1,16 @@
+-- Keyset pagination support for LoRA listing and training-job listing.
+
+-- list_loras pages on (created_at, id): download_count changes between page
+-- requests, which would make rows skip or repeat across page boundaries.
+-- Keyset comparisons need a non-null sort key.
+UPDATE loras SET created_at = NOW() WHERE created_at IS NULL;
+ALTER TABLE loras ALTER COLUMN created_at SET NOT NULL;
+
+-- list_loras: ORDER BY created_at DESC, id DESC over public rows
+CREATE INDEX IF NOT EXISTS idx_loras_public_created_id
+    ON loras(created_at DESC, id DESC)
+    WHERE is_public = true;
+
+-- list_training_jobs: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_training_jobs_user_created_id
+    ON training_jobs(user_id, created_at DESC, id DESC);
@@ -0,0 +1,10 @@
+-- Per-user job history. Without these, listing a user's jobs scans the
+-- whole table; id is the primary key, so get_job_owned is already indexed.
+
+-- GET /api/jobs: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+CREATE INDEX IF NOT EXISTS idx_jobs_user_created_id
+    ON jobs(user_id, created_at DESC, id DESC);
+
+-- GET /api/jobs?status=...: per-user status filters and counts
+CREATE INDEX IF NOT EXISTS idx_jobs_user_status
+    ON jobs(user_id, status);
@@ -0,0 +1,35 @@
+-- Content-addressed result cache: fingerprint of a seeded job -> its outputs.
+-- Rows expire with the R2 objects they reference (OUTPUT_RETENTION_DAYS);
+-- NULL expires_at means outputs are never deleted.
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+
+CREATE TABLE IF NOT EXISTS result_cache (
+    fingerprint TEXT PRIMARY KEY,
+    outputs JSONB NOT NULL,
+    source_job_id UUID REFERENCES jobs(id) ON DELETE SET NULL,
+    expires_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_result_cache_expires_at
+    ON result_cache(expires_at)
+    WHERE expires_at IS NOT NULL;
+
+-- Only the API (service role) reads or writes the cache
+ALTER TABLE result_cache ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Service role full access result_cache" ON result_cache FOR ALL USING (auth.role() = 'service_role');
+
+CREATE OR REPLACE FUNCTION prune_result_cache()
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH deleted AS (
+        DELETE FROM result_cache
+        WHERE expires_at < NOW()
+        RETURNING 1
+    )
+    SELECT COUNT(*)::INTEGER FROM deleted;
+$$;
+
+REVOKE EXECUTE ON FUNCTION prune_result_cache() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION prune_result_cache() TO service_role;
@@ -0,0 +1,3 @@
+-- Jobs are routed to per-job-type RunPod endpoints; status polls must hit the
+-- same endpoint. NULL means the default RUNPOD_ENDPOINT_ID (older rows).
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS runpod_endpoint_id TEXT;
@@ -0,0 +1,22 @@
+-- Per-job GPU timings reported by workers, used to fit the API's cost model.
+-- work_units = megapixels x frames x denoising steps, summed over outputs.
+-- work_seconds excludes model load, which is kept separately.
+CREATE TABLE IF NOT EXISTS job_timings (
+    job_id UUID PRIMARY KEY REFERENCES jobs(id) ON DELETE CASCADE,
+    job_type TEXT NOT NULL,
+    model_name TEXT NOT NULL,
+    work_units DOUBLE PRECISION NOT NULL,
+    work_seconds DOUBLE PRECISION NOT NULL,
+    load_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+    phases JSONB NOT NULL DEFAULT '{}'::jsonb,
+    execution_ms INTEGER,
+    delay_ms INTEGER,
+    created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- The cost model reads the most recent records
+CREATE INDEX IF NOT EXISTS idx_job_timings_created_at ON job_timings(created_at DESC);
+
+-- Only the API (service role) reads or writes timings
+ALTER TABLE job_timings ENABLE ROW LEVEL SECURITY;
+CREATE POLICY "Service role full access job_timings" ON job_timings FOR ALL USING (auth.role() = 'service_role');
@@ -0,0 +1,4 @@
+-- When a job was last claimed for dispatch. The reconciler fails jobs that
+-- RunPod has not finished within RECONCILER_MAX_AGE of this; NULL (older
+-- rows) falls back to created_at.
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS dispatched_at TIMESTAMPTZ;
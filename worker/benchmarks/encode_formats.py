@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Encode time and output size for each output_format setting the worker offers.
+
+Run from worker/:
+    python benchmarks/encode_formats.py [--image path/to/output.png] [--repeat 5]
+
+Uses inference.output_encoding, so the encoder options are exactly the ones
+jobs get. Without --image a synthetic 512x768 test card is used; real SD
+outputs compress differently, so pass one for numbers worth quoting.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# r2_client builds its client at import; the benchmark never uses it
+for name, placeholder in [
+    ("R2_ENDPOINT", "http://127.0.0.1:9"),
+    ("R2_ACCESS_KEY_ID", "unused"),
+    ("R2_SECRET_ACCESS_KEY", "unused"),
+]:
+    os.environ.setdefault(name, placeholder)
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from inference import output_encoding  # noqa: E402
+
+SETTINGS = [
+    {"output_format": "png"},
+    {"output_format": "png", "compress_level": 1},
+    {"output_format": "webp", "quality": 90},
+    {"output_format": "webp", "quality": 75},
+    {"output_format": "webp", "lossless": True},
+    {"output_format": "jpeg", "quality": 90},
+    {"output_format": "avif", "quality": 90},
+    {"output_format": "avif", "quality": 60},
+]
+
+
+def _test_card(width=512, height=768):
+    """Smooth gradients with mild noise and hard edges, roughly like a render."""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    rgb = np.stack([x / width, y / height, 0.5 + 0.5 * np.sin((x + y) / 40)], axis=-1) * 255
+    rgb += np.random.default_rng(0).normal(0, 6, rgb.shape)
+    rgb[height // 3:height // 2, width // 4:3 * width // 4] = (230, 40, 60)
+    return Image.fromarray(rgb.clip(0, 255).astype(np.uint8))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--image", help="image to encode (default: synthetic test card)")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    image = Image.open(args.image).convert("RGB") if args.image else _test_card()
+    print(f"{image.width}x{image.height}, median of {args.repeat} runs")
+    print(f"{'setting':<40} {'ms':>8} {'KB':>8} {'vs png':>7}")
+    png_size = None
+    for params in SETTINGS:
+        _, _, save_kwargs = output_encoding(params)
+        label = ", ".join(f"{key}={value}" for key, value in params.items())
+        if save_kwargs["format"] != params["output_format"].upper():
+            label += f" (as {save_kwargs['format']})"
+        timings = []
+        for _ in range(args.repeat):
+            buffer = io.BytesIO()
+            start = time.perf_counter()
+            image.save(buffer, **save_kwargs)
+            timings.append(time.perf_counter() - start)
+        size = buffer.tell()
+        png_size = png_size or size
+        print(f"{label:<40} {statistics.median(timings) * 1000:>8.1f} {size / 1024:>8.1f} {size / png_size:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
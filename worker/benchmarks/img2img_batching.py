@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+img2img throughput by batch size, on the worker's real pipeline.
+
+Run on a GPU worker image from worker/:
+    python benchmarks/img2img_batching.py --batches 1,2,4,8 --count 16 --size 512
+
+Inputs are synthetic and nothing touches R2; the model downloads from the Hub
+on first use like in production. Prints images/s and peak VRAM per batch size.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# r2_client builds its client at import; the benchmark never uses it
+for name, placeholder in [
+    ("R2_ENDPOINT", "http://127.0.0.1:9"),
+    ("R2_ACCESS_KEY_ID", "unused"),
+    ("R2_SECRET_ACCESS_KEY", "unused"),
+]:
+    os.environ.setdefault(name, placeholder)
+
+import numpy as np  # noqa: E402
+import torch  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import inference  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--model", default="realistic-vision-v5", choices=sorted(inference.MODELS))
+    parser.add_argument("--batches", default="1,2,4,8", help="comma-separated batch sizes")
+    parser.add_argument("--count", type=int, default=16, help="images per run")
+    parser.add_argument("--size", type=int, default=512, help="square input size in pixels")
+    parser.add_argument("--steps", type=int, default=30)
+    parser.add_argument("--strength", type=float, default=0.75)
+    args = parser.parse_args()
+
+    pipe = inference.get_pipeline(args.model, [])
+    rng = np.random.default_rng(0)
+    size = (args.size // 8) * 8
+    items = [
+        (index, Image.fromarray(rng.integers(0, 256, (size, size, 3), dtype=np.uint8)), 1000 + index)
+        for index in range(args.count)
+    ]
+    pipe_kwargs = {
+        "prompt": "a photo of a lighthouse on a cliff at dusk",
+        "negative_prompt": "blurry, low quality, distorted",
+        "strength": args.strength,
+        "guidance_scale": 7.5,
+        "num_inference_steps": args.steps,
+    }
+
+    def run(batch):
+        inference.MAX_BATCH_SIZE = batch
+        inference._batch_limits.clear()
+        for _ in inference._generate_batched(
+            pipe, items, size=(size, size), pipe_kwargs=pipe_kwargs,
+            progress_callback=None, done=0, total=len(items), metrics=None,
+        ):
+            pass
+
+    # Warm-up: CUDA kernels, cuDNN autotuning, allocator
+    run(1)
+
+    print(f"{args.model} {size}x{size}, {args.count} images, {args.steps} steps x strength {args.strength}")
+    print(f"{'batch':>5} {'seconds':>8} {'images/s':>9} {'speedup':>8} {'peak GB':>8}")
+    baseline = None
+    for batch in [int(value) for value in args.batches.split(",")]:
+        torch.cuda.synchronize()
+        torch.cuda.reset_peak_memory_stats()
+        start = time.perf_counter()
+        run(batch)
+        torch.cuda.synchronize()
+        seconds = time.perf_counter() - start
+        rate = args.count / seconds
+        baseline = baseline or rate
+        peak = torch.cuda.max_memory_allocated() / 1024 ** 3
+        # An OOM-driven fallback shows up as a lower effective batch
+        effective = inference._batch_limits.get((size, size), batch)
+        note = f" (fell back to {effective})" if effective < batch else ""
+        print(f"{batch:>5} {seconds:>8.2f} {rate:>9.2f} {rate / baseline:>7.2f}x {peak:>8.1f}{note}")
+
+
+if __name__ == "__main__":
+    main()
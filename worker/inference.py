@@ -3,12 +3,18 @@ Stable Diffusion 1.5 Image-to-Image inference.
 
 For NSFW image generation with LoRA support.
 """
+import io
 import uuid
 import os
 import gc
+import threading
+import time
+from contextlib import closing, contextmanager
 import torch
 from PIL import Image
-from r2_client import download, upload
+from io_pipeline import Uploader, prefetch
+from lora_store import fetch as fetch_lora
+from r2_client import open_object, put_bytes
 
 # Global pipeline cache
 _pipeline = None
@@ -23,6 +29,23 @@ MODELS = {
     # Add more NSFW-capable models as needed
 }
 
+# Upper bound on images per img2img pipeline call; the actual batch adapts to free VRAM
+MAX_BATCH_SIZE = int(os.environ.get("IMG2IMG_MAX_BATCH", "8"))
+# Rough peak VRAM per megapixel in a batch (fp16 UNet activations with CFG, VAE decode)
+_BYTES_PER_MPIX = 4.5 * 1024 ** 3
+# Largest batch that fit per (width, height), lowered on every OOM
+_batch_limits = {}
+# Transfers report timings from I/O threads
+_metrics_lock = threading.Lock()
+
+# output_format -> (Pillow format, file extension, ContentType)
+OUTPUT_FORMATS = {
+    "png": ("PNG", "png", "image/png"),
+    "webp": ("WEBP", "webp", "image/webp"),
+    "jpeg": ("JPEG", "jpg", "image/jpeg"),
+    "avif": ("AVIF", "avif", "image/avif"),
+}
+
 # LoRA registry - store LoRAs in R2
 LORA_REGISTRY = {
     # "lora-name": "r2-key-to-lora.safetensors"
@@ -36,6 +59,40 @@ def clear_memory():
         torch.cuda.empty_cache()
 
 
+def make_step_callback(progress_callback, done, total, count=1):
+    """diffusers callback_on_step_end that reports overall job progress (0-100).
+
+    `count` is how many of the `total` items this pipeline call produces.
+    """
+    def on_step_end(pipe, step, timestep, callback_kwargs):
+        steps = getattr(pipe, "num_timesteps", 0) or 1
+        progress_callback(int(100 * (done + count * (step + 1) / steps) / total))
+        return callback_kwargs
+    return on_step_end
+
+
+@contextmanager
+def timed(metrics, phase):
+    """Add the wall time of a block to metrics["phases"][phase], in seconds.
+
+    Overlapping blocks (e.g. parallel downloads) each add their own time.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            with _metrics_lock:
+                phases = metrics.setdefault("phases", {})
+                phases[phase] = phases.get(phase, 0.0) + time.perf_counter() - start
+
+
+def add_work(metrics, *, width, height, frames, steps):
+    """Accumulate work units (megapixels x frames x denoising steps) for the API's cost model."""
+    if metrics is not None:
+        metrics["work_units"] = metrics.get("work_units", 0.0) + width * height / 1e6 * frames * steps
+
+
 def get_pipeline(model_name: str, lora_names: list = None):
     """Load or reuse the Stable Diffusion pipeline with optional LoRAs."""
     global _pipeline, _current_model, _loaded_loras
@@ -87,10 +144,8 @@ def get_pipeline(model_name: str, lora_names: list = None):
             lora_r2_key = LORA_REGISTRY[lora_name]
             print(f"Loading LoRA: {lora_name}")
 
-            # Download LoRA from R2
-            local_lora = f"/tmp/loras/{lora_name}.safetensors"
-            os.makedirs("/tmp/loras", exist_ok=True)
-            download(lora_r2_key, local_lora)
+            # Cached on the network volume across workers
+            local_lora = fetch_lora(lora_r2_key)
 
             _pipeline.load_lora_weights(local_lora, adapter_name=lora_name)
             _loaded_loras.append(lora_name)
@@ -104,6 +159,117 @@ def get_pipeline(model_name: str, lora_names: list = None):
     return _pipeline
 
 
+def _batch_size_for(width, height):
+    """Images per pipeline call at this size, bounded by free VRAM and past OOMs."""
+    limit = _batch_limits.get((width, height), MAX_BATCH_SIZE)
+    if not torch.cuda.is_available():
+        return limit
+    free, _ = torch.cuda.mem_get_info()
+    fits = int(free * 0.9 // (_BYTES_PER_MPIX * width * height / 1e6))
+    return max(1, min(limit, fits))
+
+
+def _load_input(key, metrics):
+    """Download and decode one input, resized to a multiple of 8 (required by SD)."""
+    with timed(metrics, "download"):
+        buffer = open_object(key)
+    with buffer:
+        init_image = Image.open(buffer).convert("RGB")
+
+    width, height = init_image.size
+    width = (width // 8) * 8
+    height = (height // 8) * 8
+    return init_image.resize((width, height), Image.LANCZOS)
+
+
+def output_encoding(params):
+    """(extension, ContentType, Image.save kwargs) for a job's output_format params.
+
+    Falls back to WebP when this Pillow build has no AVIF encoder. `lossless`
+    is rejected for JPEG and AVIF, which can't honour it.
+    """
+    output_format = params.get("output_format", "png")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output_format: {output_format}")
+    lossless = bool(params.get("lossless", False))
+    if lossless and output_format in ("jpeg", "avif"):
+        raise ValueError(f"lossless is not supported for {output_format}")
+    Image.init()
+    if output_format == "avif" and "AVIF" not in Image.SAVE:
+        print("AVIF encoder not available, saving WebP")
+        output_format = "webp"
+
+    pil_format, extension, content_type = OUTPUT_FORMATS[output_format]
+    quality = int(params.get("quality", 90))
+    if pil_format == "PNG":
+        # zlib level 0-9; lower encodes faster for somewhat larger files (Pillow default 6)
+        options = {"compress_level": int(params.get("compress_level", 6))}
+    elif pil_format == "JPEG":
+        options = {"quality": quality, "optimize": True}
+    elif pil_format == "WEBP":
+        # libwebp effort 0-6; 4 is its default speed/size balance
+        options = {"quality": quality, "lossless": lossless, "method": 4}
+    else:
+        options = {"quality": quality}
+    return extension, content_type, {"format": pil_format, **options}
+
+
+def _save_output(image, output_key, encoding, metrics):
+    """Encode and upload one output; runs on an Uploader thread (Pillow encoders release the GIL)."""
+    _, content_type, save_kwargs = encoding
+    buffer = io.BytesIO()
+    with timed(metrics, "encode"):
+        image.save(buffer, **save_kwargs)
+    with timed(metrics, "upload"):
+        put_bytes(buffer.getvalue(), output_key, content_type=content_type)
+
+
+def _generate_batched(pipe, items, *, size, pipe_kwargs, progress_callback, done, total, metrics):
+    """Run same-size (index, image, seed) items through the pipeline in batches.
+
+    Halves the batch and retries on CUDA OOM, remembering the limit for this size.
+    Yields (index, output image) as each batch finishes.
+    """
+    finished = 0
+    pending = list(items)
+    while pending:
+        batch = pending[:_batch_size_for(*size)]
+        count = len(batch)
+        # Fresh generators per attempt, so an OOM retry reproduces the same noise
+        seeds = [item_seed for _, _, item_seed in batch]
+        generators = None
+        if all(item_seed is not None for item_seed in seeds):
+            generators = [torch.Generator(device=pipe.device).manual_seed(item_seed) for item_seed in seeds]
+        try:
+            with timed(metrics, "inference"):
+                result = pipe(
+                    prompt=[pipe_kwargs["prompt"]] * count,
+                    negative_prompt=[pipe_kwargs["negative_prompt"]] * count,
+                    image=[image for _, image, _ in batch],
+                    strength=pipe_kwargs["strength"],
+                    guidance_scale=pipe_kwargs["guidance_scale"],
+                    num_inference_steps=pipe_kwargs["num_inference_steps"],
+                    # One generator per image keeps each output independent of batching
+                    generator=generators,
+                    callback_on_step_end=(
+                        make_step_callback(progress_callback, done + finished, total, count)
+                        if progress_callback else None
+                    ),
+                )
+        except torch.cuda.OutOfMemoryError:
+            if count == 1:
+                raise
+            clear_memory()
+            _batch_limits[size] = max(1, count // 2)
+            print(f"OOM at batch {count} for {size[0]}x{size[1]}, retrying with {_batch_limits[size]}")
+            continue
+
+        for (index, _, _), image in zip(batch, result.images):
+            yield index, image
+        finished += count
+        pending = pending[count:]
+
+
 def run_inference(
     job_id,
     user_id,
@@ -112,8 +278,19 @@ def run_inference(
     model_name,
     lora_names,
     params,
+    progress_callback=None,
+    metrics=None,
 ):
-    """Run img2img inference on input images."""
+    """Run img2img inference on input images.
+
+    With params["seed"] set, input i is generated from seed + i with its own
+    generator, so an output depends only on its input and position, not on
+    which batch it ran in. Before batching, one generator seeded once was
+    shared by all inputs in turn: only the first output of a multi-input job
+    is unchanged from those versions.
+
+    If `metrics` is a dict it receives per-phase seconds and work units.
+    """
     outputs = []
 
     # Get parameters with defaults
@@ -123,55 +300,59 @@ def run_inference(
     guidance_scale = params.get("guidance_scale", 7.5)
     num_inference_steps = params.get("num_inference_steps", 30)
     seed = params.get("seed", None)
+    encoding = output_encoding(params)
 
     # Get the pipeline
-    pipe = get_pipeline(model_name, lora_names)
-
-    # Set up generator for reproducibility
-    generator = None
-    if seed is not None:
-        generator = torch.Generator(device="cuda").manual_seed(seed)
-
-    for key in input_keys:
-        local_input = f"/tmp/{uuid.uuid4()}.png"
-        local_output = f"/tmp/{uuid.uuid4()}.png"
-
-        # Download input image
-        download(key, local_input)
-
-        # Load and prepare image
-        init_image = Image.open(local_input).convert("RGB")
-
-        # Resize to multiple of 8 (required by SD)
-        width, height = init_image.size
-        width = (width // 8) * 8
-        height = (height // 8) * 8
-        init_image = init_image.resize((width, height), Image.LANCZOS)
-
-        # Run inference
-        result = pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            image=init_image,
-            strength=strength,
-            guidance_scale=guidance_scale,
-            num_inference_steps=num_inference_steps,
-            generator=generator,
-        )
-
-        # Save output
-        output_image = result.images[0]
-        output_image.save(local_output, "PNG")
-
-        # Upload to R2
-        output_key = f"{output_prefix}{uuid.uuid4()}.png"
-        upload(local_output, output_key)
-
-        outputs.append({"key": output_key})
-
-        # Cleanup
-        os.remove(local_input)
-        os.remove(local_output)
+    with timed(metrics, "load"):
+        pipe = get_pipeline(model_name, lora_names)
+
+    pipe_kwargs = {
+        "prompt": prompt,
+        "negative_prompt": negative_prompt,
+        "strength": strength,
+        "guidance_scale": guidance_scale,
+        "num_inference_steps": num_inference_steps,
+    }
+    output_keys = [f"{output_prefix}{uuid.uuid4()}.{encoding[0]}" for _ in input_keys]
+    buckets = {}
+    done = 0
+
+    # Each finished batch encodes and uploads while the next one denoises
+    with Uploader() as uploader:
+
+        def flush(size):
+            nonlocal done
+            items = buckets.pop(size)
+            for index, output_image in _generate_batched(
+                pipe,
+                items,
+                size=size,
+                pipe_kwargs=pipe_kwargs,
+                progress_callback=progress_callback,
+                done=done,
+                total=len(input_keys),
+                metrics=metrics,
+            ):
+                uploader.submit(_save_output, output_image, output_keys[index], encoding, metrics)
+            done += len(items)
+            # img2img only denoises the last `strength` fraction of the schedule
+            add_work(metrics, width=size[0], height=size[1], frames=len(items), steps=int(num_inference_steps * strength))
+
+        # Inputs download and decode in parallel, bucketed by size; a bucket
+        # denoises as soon as it fills a batch while later inputs keep loading
+        with closing(prefetch(input_keys, lambda key: _load_input(key, metrics))) as loaded:
+            for index, init_image in enumerate(loaded):
+                # Seed per input so an image's output doesn't depend on its batch-mates
+                item_seed = seed + index if seed is not None else None
+                bucket = buckets.setdefault(init_image.size, [])
+                bucket.append((index, init_image, item_seed))
+                if len(bucket) >= _batch_size_for(*init_image.size):
+                    flush(init_image.size)
+        # Partial buckets left once every input is in
+        for size in list(buckets):
+            flush(size)
+
+    outputs.extend({"key": output_key} for output_key in output_keys)
 
     return outputs
 
@@ -0,0 +1,76 @@
+"""
+Overlap R2 transfers with GPU work.
+
+`prefetch` downloads and decodes inputs on a thread pool a few items ahead of
+the consumer; `Uploader` encodes and uploads finished outputs in the
+background while the next item denoises. Both are bounded, so a slow R2
+stalls the GPU loop instead of piling decoded images or video frames up in
+memory, and both re-raise a thread's exception in the calling thread.
+"""
+import itertools
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+# Concurrent R2 transfers per job, in each direction
+IO_THREADS = int(os.environ.get("WORKER_IO_THREADS", "4"))
+
+
+def prefetch(items, load, *, depth=IO_THREADS):
+    """Yield load(item) for each item, in order, with up to `depth` loads running ahead."""
+    items = iter(items)
+    pool = ThreadPoolExecutor(max_workers=depth, thread_name_prefix="prefetch")
+    pending = deque(pool.submit(load, item) for item in itertools.islice(items, depth))
+    try:
+        while pending:
+            future = pending.popleft()
+            # Keep the pool busy while the caller works on this one
+            for item in itertools.islice(items, 1):
+                pending.append(pool.submit(load, item))
+            yield future.result()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+class Uploader:
+    """Background output tasks; `submit` blocks while `max_pending` are unfinished.
+
+    Leaving the `with` block waits for every task and re-raises the first
+    failure, so a handler never reports keys that were not uploaded.
+    """
+
+    def __init__(self, *, workers=IO_THREADS, max_pending=None):
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload")
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 2)
+        self._futures = []
+
+    def submit(self, fn, *args, **kwargs):
+        self._raise_failed()
+        self._slots.acquire()
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        self._futures.append(future)
+        return future
+
+    def _raise_failed(self):
+        for future in self._futures:
+            if future.done() and not future.cancelled() and future.exception() is not None:
+                raise future.exception()
+
+    def wait(self):
+        wait(self._futures, return_when=FIRST_EXCEPTION)
+        self._raise_failed()
+        # No failures means FIRST_EXCEPTION waited for everything
+        for future in self._futures:
+            future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self._pool.shutdown(wait=True, cancel_futures=True)
@@ -10,6 +10,27 @@ import requests
 
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.environ.get("SUPABASE_SERVICE_ROLE_KEY")
+# Optional: tell the API to drop its cached catalog after an upsert
+PUBLIC_API_URL = os.environ.get("PUBLIC_API_URL")
+CATALOG_ADMIN_TOKEN = os.environ.get("CATALOG_ADMIN_TOKEN")
+
+
+def invalidate_catalog_cache(namespace: str = "loras") -> bool:
+    """Ask the API to invalidate its LoRA catalog cache. Best effort."""
+    if not PUBLIC_API_URL or not CATALOG_ADMIN_TOKEN:
+        return False
+
+    try:
+        resp = requests.post(
+            f"{PUBLIC_API_URL.rstrip('/')}/api/admin/catalog/invalidate",
+            headers={"X-Admin-Token": CATALOG_ADMIN_TOKEN},
+            json={"namespace": namespace},
+            timeout=5,
+        )
+        return resp.status_code == 200
+    except Exception as e:
+        print(f"[lora_registry] Catalog invalidation failed: {e}")
+        return False
 
 
 def register_lora(
@@ -75,6 +96,7 @@ def register_lora(
         resp = requests.post(url, headers=headers, json=[lora_data], timeout=10)
         if resp.status_code in (200, 201):
             print(f"[lora_registry] Registered '{slug}' in Supabase")
+            invalidate_catalog_cache()
             return True
         else:
             print(f"[lora_registry] Failed to register '{slug}': {resp.text}")
@@ -0,0 +1,143 @@
+"""
+Persistent LoRA weight cache on the RunPod network volume.
+
+Files are stored as LORA_CACHE_DIR/<hash of R2 key>-<ETag>.safetensors, so a
+re-uploaded LoRA gets a new name and stale copies are never loaded. Every
+fetch revalidates with a HEAD; if R2 is unreachable the newest local copy of
+that key is used. Downloads go to a temp file in the same directory and are
+renamed into place, under a per-key flock so concurrent workers sharing the
+volume download each file once. A hit bumps the file's mtime, and the least
+recently used files are evicted to keep the directory under
+LORA_CACHE_MAX_GB.
+"""
+import fcntl
+import glob
+import hashlib
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from r2_client import download_ranged, head
+
+# Falls back to local disk when no network volume is attached
+LORA_CACHE_DIR = os.environ.get("LORA_CACHE_DIR") or (
+    "/runpod-volume/lora-cache" if os.path.isdir("/runpod-volume") else "/tmp/loras"
+)
+LORA_CACHE_MAX_BYTES = int(float(os.environ.get("LORA_CACHE_MAX_GB", "50")) * 1024 ** 3)
+# Files used this recently are never evicted; another worker may be loading them
+_IN_USE_SECONDS = 600
+
+stats = {
+    "hits": 0,
+    "misses": 0,
+    "stale_served": 0,
+    "evictions": 0,
+    "bytes_downloaded": 0,
+    "download_seconds": 0.0,
+}
+
+
+def _key_hash(r2_key):
+    return hashlib.sha256(r2_key.encode()).hexdigest()[:16]
+
+
+@contextmanager
+def _locked(name):
+    """Exclusive flock on LORA_CACHE_DIR/<name>.lock, shared by every process on the volume."""
+    with open(os.path.join(LORA_CACHE_DIR, f"{name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _cached_files():
+    return glob.glob(os.path.join(LORA_CACHE_DIR, "*.safetensors"))
+
+
+def _evict(needed):
+    """Delete least recently used files until `needed` more bytes fit."""
+    # Partial downloads left by a worker that was killed mid-transfer
+    for part in glob.glob(os.path.join(LORA_CACHE_DIR, "*.part")):
+        try:
+            if os.path.getmtime(part) < time.time() - 3600:
+                os.remove(part)
+        except FileNotFoundError:
+            pass
+
+    entries = []
+    for path in _cached_files():
+        try:
+            info = os.stat(path)
+        except FileNotFoundError:
+            continue
+        entries.append((info.st_mtime, info.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    cutoff = time.time() - _IN_USE_SECONDS
+    for mtime, size, path in sorted(entries):
+        if total + needed <= LORA_CACHE_MAX_BYTES or mtime > cutoff:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        stats["evictions"] += 1
+        print(f"[lora_store] Evicted {os.path.basename(path)} ({size / 1e6:.0f} MB)")
+
+
+def fetch(r2_key):
+    """Local path of the current version of an R2 LoRA, downloading it if needed."""
+    os.makedirs(LORA_CACHE_DIR, exist_ok=True)
+    key_hash = _key_hash(r2_key)
+
+    try:
+        etag, size = head(r2_key)
+    except Exception as e:
+        copies = sorted(glob.glob(os.path.join(LORA_CACHE_DIR, f"{key_hash}-*.safetensors")), key=os.path.getmtime)
+        if not copies:
+            raise
+        stats["stale_served"] += 1
+        print(f"[lora_store] Could not revalidate {r2_key} ({e}), using cached copy")
+        os.utime(copies[-1])
+        return copies[-1]
+
+    path = os.path.join(LORA_CACHE_DIR, f"{key_hash}-{etag}.safetensors")
+    if os.path.exists(path):
+        stats["hits"] += 1
+        os.utime(path)
+        return path
+
+    with _locked(key_hash):
+        # Another worker may have finished it while we waited for the lock
+        if os.path.exists(path):
+            stats["hits"] += 1
+            os.utime(path)
+            return path
+
+        stats["misses"] += 1
+        with _locked("evict"):
+            _evict(size)
+
+        tmp_path = f"{path}.{uuid.uuid4().hex}.part"
+        start = time.perf_counter()
+        try:
+            print(f"[lora_store] Downloading {r2_key} ({size / 1e6:.0f} MB)")
+            download_ranged(r2_key, tmp_path, etag=etag, size=size)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        stats["download_seconds"] += time.perf_counter() - start
+        stats["bytes_downloaded"] += size
+
+        # Older versions of this key can never be served again
+        for old in glob.glob(os.path.join(LORA_CACHE_DIR, f"{key_hash}-*.safetensors")):
+            if old != path:
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+    return path
@@ -1,5 +1,10 @@
 import boto3
 import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 
 # Normalize endpoint: allow either the full URL or just the account ID
 _endpoint_raw = os.environ.get("R2_ENDPOINT", "").strip()
@@ -9,20 +14,110 @@ if _endpoint_raw and not _endpoint_raw.startswith("http"):
 else:
     _endpoint_url = _endpoint_raw
 
+# boto3 clients are thread-safe; one pooled client serves all I/O threads
 s3 = boto3.client(
     "s3",
     endpoint_url=_endpoint_url,
     aws_access_key_id=os.environ["R2_ACCESS_KEY_ID"],
     aws_secret_access_key=os.environ["R2_SECRET_ACCESS_KEY"],
     region_name="auto",
+    config=Config(
+        max_pool_connections=int(os.environ.get("R2_MAX_CONNECTIONS", "32")),
+        retries={"max_attempts": 5, "mode": "adaptive"},
+        connect_timeout=10,
+        read_timeout=60,
+    ),
 )
 
 # Accept either R2_BUCKET or R2_BUCKET_NAME
 BUCKET = os.environ.get("R2_BUCKET") or os.environ.get("R2_BUCKET_NAME")
 
+# Objects above this size move as parallel multipart transfers
+_MULTIPART_BYTES = int(os.environ.get("R2_MULTIPART_THRESHOLD", str(16 * 1024 * 1024)))
+_transfer = TransferConfig(
+    multipart_threshold=_MULTIPART_BYTES,
+    multipart_chunksize=_MULTIPART_BYTES,
+    max_concurrency=8,
+)
+
+# Large weight files are fetched as parallel ranged GETs of this size
+_RANGE_BYTES = 32 * 1024 * 1024
+_RANGE_WORKERS = 16
+
+# Buffers above this size spill to disk. Spills default to the system temp dir:
+# container /dev/shm is often only 64 MB, too small for a rendered MP4
+SPILL_BYTES = int(os.environ.get("WORKER_SPILL_THRESHOLD", str(64 * 1024 * 1024)))
+SPILL_DIR = os.environ.get("WORKER_SPILL_DIR") or None
+
 def download(key, local_path):
-    s3.download_file(BUCKET, key, local_path)
+    s3.download_file(BUCKET, key, local_path, Config=_transfer)
+
+def download_ranged(key, local_path, etag, size):
+    """Download `size` bytes with parallel ranged GETs written straight into place.
+
+    Every range is requested If-Match `etag`, so an object replaced mid-download
+    fails with a 412 instead of mixing two versions.
+    """
+    ranges = [(start, min(start + _RANGE_BYTES, size) - 1) for start in range(0, size, _RANGE_BYTES)]
+    fd = os.open(local_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+
+    def fetch_range(byte_range):
+        start, end = byte_range
+        body = s3.get_object(Bucket=BUCKET, Key=key, Range=f"bytes={start}-{end}", IfMatch=f'"{etag}"')["Body"]
+        offset = start
+        for chunk in body.iter_chunks(1024 * 1024):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+        if offset != end + 1:
+            raise IOError(f"Short read for {key} bytes {start}-{end}: got {offset - start}")
+
+    try:
+        os.ftruncate(fd, size)
+        if ranges:
+            with ThreadPoolExecutor(max_workers=min(_RANGE_WORKERS, len(ranges))) as pool:
+                # list() surfaces the first failed range
+                list(pool.map(fetch_range, ranges))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def head(key):
+    """(etag, size) of an object, ETag without quotes."""
+    resp = s3.head_object(Bucket=BUCKET, Key=key)
+    return resp["ETag"].strip('"'), resp["ContentLength"]
+
+def upload(local_path, key, content_type=None):
+    extra = {"ContentType": content_type} if content_type else None
+    s3.upload_file(local_path, BUCKET, key, ExtraArgs=extra, Config=_transfer)
+
+def put_bytes(data, key, content_type=None):
+    extra = {"ContentType": content_type} if content_type else {}
+    s3.put_object(Bucket=BUCKET, Key=key, Body=data, **extra)
+
+def open_object(key):
+    """Object as a seekable file, held in memory unless it exceeds SPILL_BYTES.
 
-def upload(local_path, key):
-    s3.upload_file(local_path, BUCKET, key)
+    A spilled buffer is an unlinked temp file, so nothing is left on disk
+    whether or not the caller closes it cleanly.
+    """
+    buffer = tempfile.SpooledTemporaryFile(max_size=SPILL_BYTES, dir=SPILL_DIR)
+    try:
+        s3.download_fileobj(BUCKET, key, buffer, Config=_transfer)
+    except BaseException:
+        buffer.close()
+        raise
+    buffer.seek(0)
+    return buffer
 
+@contextmanager
+def spill_path(suffix=""):
+    """Temp path in SPILL_DIR for tools that need a filename; removed on exit."""
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=SPILL_DIR)
+    os.close(fd)
+    try:
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
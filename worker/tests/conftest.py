@@ -0,0 +1,46 @@
+"""
+Worker tests run the worker modules against a local moto S3 server standing
+in for R2. The R2_* variables must be set before r2_client is imported, since
+it builds its client at import time.
+"""
+import os
+import socket
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+_PORT = _free_port()
+os.environ.update(
+    {
+        "R2_ENDPOINT": f"http://127.0.0.1:{_PORT}",
+        "R2_ACCESS_KEY_ID": "testing",
+        "R2_SECRET_ACCESS_KEY": "testing",
+        "R2_BUCKET": "worker-tests",
+    }
+)
+
+
+@pytest.fixture(scope="session")
+def r2():
+    """The r2_client module, talking to a fresh moto bucket."""
+    from moto.server import ThreadedMotoServer
+
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=_PORT, verbose=False)
+    server.start()
+    import r2_client
+
+    r2_client.s3.create_bucket(
+        Bucket=r2_client.BUCKET,
+        CreateBucketConfiguration={"LocationConstraint": "auto"},
+    )
+    yield r2_client
+    server.stop()
@@ -0,0 +1,144 @@
+"""
+Batched img2img matches one-image-at-a-time img2img.
+
+Runs a tiny randomly initialised SD 1.5 pipeline on CPU, so it needs torch,
+transformers and diffusers but no GPU or Hub access.
+"""
+import json
+
+import pytest
+
+torch = pytest.importorskip("torch")
+pytest.importorskip("diffusers")
+pytest.importorskip("transformers")
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def _byte_alphabet():
+    """The 256 printable characters CLIP's byte-level BPE starts from."""
+    printable = list(range(ord("!"), ord("~") + 1)) + list(range(ord("¡"), ord("¬") + 1)) + list(range(ord("®"), ord("ÿ") + 1))
+    codes = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            codes.append(256 + extra)
+            extra += 1
+    return [chr(code) for code in codes]
+
+
+def _tiny_tokenizer(tmp_path):
+    """Character-level CLIP tokenizer (no merges), written locally instead of fetched."""
+    from transformers import CLIPTokenizer
+
+    vocab = {"<|startoftext|>": 0, "<|endoftext|>": 1}
+    for suffix in ("", "</w>"):
+        for char in _byte_alphabet():
+            vocab.setdefault(char + suffix, len(vocab))
+    vocab_path, merges_path = tmp_path / "vocab.json", tmp_path / "merges.txt"
+    vocab_path.write_text(json.dumps(vocab))
+    merges_path.write_text("#version: 0.2\n")
+    return CLIPTokenizer(str(vocab_path), str(merges_path), model_max_length=77)
+
+
+@pytest.fixture(scope="module")
+def tiny_pipe(tmp_path_factory):
+    from diffusers import AutoencoderKL, DPMSolverMultistepScheduler, StableDiffusionImg2ImgPipeline, UNet2DConditionModel
+    from transformers import CLIPTextConfig, CLIPTextModel
+
+    torch.manual_seed(0)
+    unet = UNet2DConditionModel(
+        block_out_channels=(32, 64),
+        layers_per_block=1,
+        sample_size=16,
+        in_channels=4,
+        out_channels=4,
+        down_block_types=("DownBlock2D", "CrossAttnDownBlock2D"),
+        up_block_types=("CrossAttnUpBlock2D", "UpBlock2D"),
+        cross_attention_dim=32,
+        norm_num_groups=8,
+    )
+    vae = AutoencoderKL(
+        block_out_channels=(32, 64),
+        in_channels=3,
+        out_channels=3,
+        down_block_types=("DownEncoderBlock2D", "DownEncoderBlock2D"),
+        up_block_types=("UpDecoderBlock2D", "UpDecoderBlock2D"),
+        latent_channels=4,
+        norm_num_groups=8,
+    )
+    text_encoder = CLIPTextModel(
+        CLIPTextConfig(
+            bos_token_id=0,
+            eos_token_id=1,
+            pad_token_id=1,
+            hidden_size=32,
+            intermediate_size=37,
+            num_attention_heads=4,
+            num_hidden_layers=2,
+            vocab_size=600,
+        )
+    )
+    pipe = StableDiffusionImg2ImgPipeline(
+        unet=unet,
+        vae=vae,
+        text_encoder=text_encoder,
+        tokenizer=_tiny_tokenizer(tmp_path_factory.mktemp("tokenizer")),
+        scheduler=DPMSolverMultistepScheduler(steps_offset=1),
+        safety_checker=None,
+        feature_extractor=None,
+        requires_safety_checker=False,
+    )
+    pipe.set_progress_bar_config(disable=True)
+    return pipe
+
+
+def _inputs(count, size=(64, 64)):
+    rng = np.random.default_rng(1)
+    return [Image.fromarray(rng.integers(0, 256, (*size[::-1], 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def _generate(pipe, images, *, batch, monkeypatch):
+    import inference
+
+    monkeypatch.setattr(inference, "MAX_BATCH_SIZE", batch)
+    monkeypatch.setattr(inference, "_batch_limits", {})
+    items = [(index, image, 1234 + index) for index, image in enumerate(images)]
+    outputs = dict(
+        inference._generate_batched(
+            pipe,
+            items,
+            size=images[0].size,
+            pipe_kwargs={
+                "prompt": "a lighthouse at dusk",
+                "negative_prompt": "blurry",
+                "strength": 0.6,
+                "guidance_scale": 7.5,
+                "num_inference_steps": 4,
+            },
+            progress_callback=None,
+            done=0,
+            total=len(items),
+            metrics=None,
+        )
+    )
+    return [np.asarray(outputs[index], dtype=np.int16) for index in range(len(items))]
+
+
+def test_batched_outputs_match_unbatched(tiny_pipe, monkeypatch):
+    images = _inputs(5)
+    one_by_one = _generate(tiny_pipe, images, batch=1, monkeypatch=monkeypatch)
+    batched = _generate(tiny_pipe, images, batch=4, monkeypatch=monkeypatch)
+
+    for single, together in zip(one_by_one, batched):
+        # Batched matmuls may round differently; a seed mix-up would differ everywhere
+        assert np.abs(single - together).max() <= 2
+
+
+def test_each_image_gets_its_own_noise(tiny_pipe, monkeypatch):
+    # Same input twice: only the per-image seed (seed + index) tells them apart
+    image = _inputs(1)[0]
+    first, second = _generate(tiny_pipe, [image, image], batch=2, monkeypatch=monkeypatch)
+    assert np.abs(first - second).max() > 2
+
@@ -0,0 +1,181 @@
+"""
+prefetch and Uploader against moto: ordering, bounded read-ahead and error
+propagation, plus img2img generating a full bucket while later inputs are
+still loading.
+"""
+import io
+import threading
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+from PIL import Image
+
+from io_pipeline import Uploader, prefetch
+
+
+def _png(width, height, shade):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (shade, shade, shade)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def test_prefetch_yields_in_input_order(r2):
+    keys = [f"prefetch/order-{i}" for i in range(8)]
+    for i, key in enumerate(keys):
+        r2.put_bytes(str(i).encode(), key)
+
+    def load(key):
+        index = int(key.rsplit("-", 1)[1])
+        # Later items finish first
+        time.sleep(0.01 * (8 - index))
+        with r2.open_object(key) as buffer:
+            return int(buffer.read())
+
+    assert list(prefetch(keys, load, depth=4)) == list(range(8))
+
+
+def test_prefetch_runs_at_most_depth_ahead():
+    started = []
+    lock = threading.Lock()
+
+    def load(item):
+        with lock:
+            started.append(item)
+        return item
+
+    consumed = 0
+    for item in prefetch(range(20), load, depth=3):
+        time.sleep(0.005)
+        consumed += 1
+        with lock:
+            # The item being handed out plus `depth` behind it
+            assert len(started) <= consumed + 3
+    assert consumed == 20
+
+
+def test_prefetch_raises_at_the_failed_item(r2):
+    r2.put_bytes(b"a", "prefetch/present-0")
+    r2.put_bytes(b"c", "prefetch/present-2")
+    keys = ["prefetch/present-0", "prefetch/missing-1", "prefetch/present-2"]
+
+    def load(key):
+        with r2.open_object(key) as buffer:
+            return buffer.read()
+
+    loaded = prefetch(keys, load, depth=3)
+    assert next(loaded) == b"a"
+    with pytest.raises(ClientError):
+        next(loaded)
+
+
+def test_uploader_uploads_everything_before_exit(r2):
+    keys = [f"uploader/out-{i}" for i in range(10)]
+    with Uploader(workers=3, max_pending=2) as uploader:
+        for i, key in enumerate(keys):
+            uploader.submit(r2.put_bytes, str(i).encode(), key)
+
+    for i, key in enumerate(keys):
+        with r2.open_object(key) as buffer:
+            assert buffer.read() == str(i).encode()
+
+
+def test_uploader_bounds_pending_tasks():
+    running = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def task():
+        nonlocal running, peak
+        with lock:
+            running += 1
+            peak = max(peak, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+
+    with Uploader(workers=4, max_pending=2) as uploader:
+        for _ in range(10):
+            uploader.submit(task)
+    assert peak <= 2
+
+
+def test_uploader_failure_surfaces_on_submit_and_exit(r2):
+    def fail():
+        raise IOError("R2 unreachable")
+
+    with pytest.raises(IOError, match="R2 unreachable"):
+        with Uploader(workers=1) as uploader:
+            uploader.submit(fail)
+            time.sleep(0.05)
+            # The next submit sees the earlier failure
+            uploader.submit(r2.put_bytes, b"x", "uploader/after-failure")
+
+    with pytest.raises(IOError, match="R2 unreachable"):
+        with Uploader(workers=1) as uploader:
+            uploader.submit(fail)
+
+
+class _EchoPipeline:
+    """Stands in for the diffusers pipeline: returns its inputs, logging each call."""
+
+    def __init__(self, events):
+        self.events = events
+
+    def __call__(self, *, image, **kwargs):
+        self.events.append(("generate", len(image)))
+
+        class Result:
+            images = list(image)
+
+        return Result()
+
+
+def test_img2img_generates_full_buckets_while_inputs_load(r2, monkeypatch):
+    import inference
+
+    events = []
+    real_prefetch = inference.prefetch
+
+    def logged_prefetch(items, load, **kwargs):
+        for index, image in enumerate(real_prefetch(items, load, **kwargs)):
+            events.append(("input", index))
+            yield image
+
+    monkeypatch.setattr(inference, "prefetch", logged_prefetch)
+    monkeypatch.setattr(inference, "get_pipeline", lambda model_name, lora_names: _EchoPipeline(events))
+    monkeypatch.setattr(inference, "MAX_BATCH_SIZE", 2)
+    monkeypatch.setattr(inference, "_batch_limits", {})
+
+    # Two sizes interleaved: 64x64 fills a batch at inputs 0 and 2, 32x32 stays partial
+    sizes = [(64, 64), (32, 32), (64, 64), (64, 64)]
+    keys = []
+    for i, (width, height) in enumerate(sizes):
+        keys.append(f"img2img/in-{i}.png")
+        r2.put_bytes(_png(width, height, 40 * i), keys[-1])
+
+    outputs = inference.run_inference(
+        job_id="job-1",
+        user_id="user-1",
+        input_keys=keys,
+        output_prefix="img2img/out/",
+        model_name="realistic-vision-v5",
+        lora_names=[],
+        params={"output_format": "png"},
+    )
+
+    assert events == [
+        ("input", 0),
+        ("input", 1),
+        ("input", 2),
+        ("generate", 2),
+        ("input", 3),
+        ("generate", 1),
+        ("generate", 1),
+    ]
+    # Outputs line up with inputs however the buckets were scheduled
+    for i, output in enumerate(outputs):
+        with r2.open_object(output["key"]) as buffer:
+            image = Image.open(buffer)
+            assert image.size == sizes[i]
+            assert image.getpixel((0, 0)) == (40 * i,) * 3
@@ -0,0 +1,85 @@
+import os
+
+import pytest
+from botocore.exceptions import ClientError
+
+
+@pytest.fixture
+def store(r2, tmp_path, monkeypatch):
+    import lora_store
+
+    monkeypatch.setattr(lora_store, "LORA_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(lora_store, "stats", {key: 0 for key in lora_store.stats})
+    # Several ranges per file, so the parallel path is exercised
+    monkeypatch.setattr(r2, "_RANGE_BYTES", 4096)
+    return lora_store
+
+
+def _weights(size, fill):
+    return bytes((i * fill) % 251 for i in range(size))
+
+
+def test_cold_miss_downloads_then_hits(r2, store):
+    data = _weights(10_000, 7)
+    r2.put_bytes(data, "loras/cold.safetensors")
+
+    path = store.fetch("loras/cold.safetensors")
+    with open(path, "rb") as f:
+        assert f.read() == data
+    assert store.stats["misses"] == 1
+    assert store.stats["bytes_downloaded"] == len(data)
+
+    assert store.fetch("loras/cold.safetensors") == path
+    assert store.stats["hits"] == 1
+    assert not [name for name in os.listdir(store.LORA_CACHE_DIR) if name.endswith(".part")]
+
+
+def test_reupload_replaces_cached_version(r2, store):
+    r2.put_bytes(_weights(5000, 3), "loras/changed.safetensors")
+    old_path = store.fetch("loras/changed.safetensors")
+
+    new_data = _weights(6000, 5)
+    r2.put_bytes(new_data, "loras/changed.safetensors")
+    new_path = store.fetch("loras/changed.safetensors")
+
+    assert new_path != old_path
+    assert not os.path.exists(old_path)
+    with open(new_path, "rb") as f:
+        assert f.read() == new_data
+
+
+def test_unreachable_r2_serves_cached_copy(r2, store, monkeypatch):
+    r2.put_bytes(_weights(3000, 11), "loras/offline.safetensors")
+    path = store.fetch("loras/offline.safetensors")
+
+    def unreachable(key):
+        raise ConnectionError("R2 down")
+
+    monkeypatch.setattr(store, "head", unreachable)
+    assert store.fetch("loras/offline.safetensors") == path
+    assert store.stats["stale_served"] == 1
+
+
+def test_lru_eviction_keeps_recent_files(r2, store, monkeypatch):
+    monkeypatch.setattr(store, "LORA_CACHE_MAX_BYTES", 8000)
+    monkeypatch.setattr(store, "_IN_USE_SECONDS", -1)
+    r2.put_bytes(_weights(4000, 1), "loras/a.safetensors")
+    r2.put_bytes(_weights(4000, 2), "loras/b.safetensors")
+    r2.put_bytes(_weights(4000, 4), "loras/c.safetensors")
+
+    path_a = store.fetch("loras/a.safetensors")
+    os.utime(path_a, (1, 1))
+    path_b = store.fetch("loras/b.safetensors")
+    store.fetch("loras/c.safetensors")
+
+    assert not os.path.exists(path_a)
+    assert os.path.exists(path_b)
+    assert store.stats["evictions"] == 1
+
+
+def test_download_ranged_rejects_changed_object(r2, tmp_path):
+    r2.put_bytes(b"x" * 9000, "loras/race.safetensors")
+    _, size = r2.head("loras/race.safetensors")
+    with pytest.raises(ClientError) as excinfo:
+        r2.download_ranged("loras/race.safetensors", str(tmp_path / "out"), etag="0" * 32, size=size)
+    assert excinfo.value.response["Error"]["Code"] in ("PreconditionFailed", "412")
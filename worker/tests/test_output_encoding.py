@@ -0,0 +1,47 @@
+import io
+
+import pytest
+from PIL import Image
+
+from inference import output_encoding
+
+
+def _roundtrip(image, params):
+    extension, content_type, save_kwargs = output_encoding(params)
+    buffer = io.BytesIO()
+    image.save(buffer, **save_kwargs)
+    buffer.seek(0)
+    return extension, content_type, Image.open(buffer).convert("RGB")
+
+
+def _gradient():
+    return Image.linear_gradient("L").resize((64, 64)).convert("RGB")
+
+
+@pytest.mark.parametrize("output_format", ["avif", "jpeg"])
+def test_lossless_rejected_for_lossy_formats(output_format):
+    with pytest.raises(ValueError, match="lossless is not supported"):
+        output_encoding({"output_format": output_format, "lossless": True})
+
+
+def test_lossless_webp_keeps_every_pixel():
+    image = _gradient()
+    extension, content_type, decoded = _roundtrip(image, {"output_format": "webp", "lossless": True})
+    assert (extension, content_type) == ("webp", "image/webp")
+    assert list(decoded.getdata()) == list(image.getdata())
+
+
+def test_png_compress_level_is_passed_through():
+    image = _gradient()
+    _, _, save_kwargs = output_encoding({"output_format": "png", "compress_level": 1})
+    assert save_kwargs == {"format": "PNG", "compress_level": 1}
+    assert list(_roundtrip(image, {"output_format": "png", "compress_level": 1})[2].getdata()) == list(image.getdata())
+
+
+def test_avif_uses_requested_quality():
+    Image.init()
+    if "AVIF" not in Image.SAVE:
+        pytest.skip("Pillow built without AVIF")
+    extension, _, save_kwargs = output_encoding({"output_format": "avif", "quality": 55})
+    assert extension == "avif"
+    assert save_kwargs == {"format": "AVIF", "quality": 55}
@@ -10,8 +10,12 @@ import uuid
 import os
 import gc
 import torch
+from contextlib import closing
 from PIL import Image
-from r2_client import download, upload
+from io_pipeline import Uploader, prefetch
+from lora_store import fetch as fetch_lora
+from r2_client import open_object, spill_path, upload
+from inference import add_work, make_step_callback, timed
 from huggingface_hub import login
 
 # Login to HuggingFace if token is available (required for gated models like Wan)
@@ -142,11 +146,8 @@ def load_loras(pipe, lora_names):
 
         if lora_name in LORA_REGISTRY:
             lora_r2_key = LORA_REGISTRY[lora_name]
-            local_lora = f"/tmp/loras/{lora_name}.safetensors"
-            os.makedirs("/tmp/loras", exist_ok=True)
-
-            print(f"Downloading LoRA: {lora_name}")
-            download(lora_r2_key, local_lora)
+            print(f"Fetching LoRA: {lora_name}")
+            local_lora = fetch_lora(lora_r2_key)
 
             print(f"Loading LoRA: {lora_name}")
             pipe.load_lora_weights(local_lora, adapter_name=lora_name)
@@ -175,18 +176,40 @@ def export_video(frames, output_path, fps=8):
     print(f"Video saved: {output_path}")
 
 
+def _load_input(key, width, height, metrics):
+    """Download one I2V input and resize it to the target dimensions."""
+    with timed(metrics, "download"):
+        buffer = open_object(key)
+    with buffer:
+        image = Image.open(buffer).convert("RGB")
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _save_video(frames, output_key, fps, metrics):
+    # ffmpeg needs a real file; it lives in the spill dir only until uploaded (multipart)
+    with spill_path(".mp4") as local_output:
+        with timed(metrics, "encode"):
+            export_video(frames, local_output, fps=fps)
+        with timed(metrics, "upload"):
+            upload(local_output, output_key, content_type="video/mp4")
+    print(f"Video uploaded: {output_key}")
+
+
 def run_video_inference(
     job_id,
     user_id,
     input_keys,
     output_prefix,
     params,
+    progress_callback=None,
+    metrics=None,
 ):
     """
     Generate video using Wan 2.1.
 
     If input_keys is provided: Image-to-Video
     If only prompt is provided: Text-to-Video
+    If `metrics` is a dict it receives per-phase seconds and work units.
     """
     outputs = []
 
@@ -214,94 +237,82 @@ def run_video_inference(
     if input_keys and len(input_keys) > 0:
         # Image-to-Video mode
         print(f"Running Image-to-Video with {len(input_keys)} input(s)")
-        pipe = get_wan_i2v_pipeline()
-
-        # Load LoRAs if specified
-        if lora_names:
-            load_loras(pipe, lora_names)
-
-        for key in input_keys:
-            local_input = f"/tmp/{uuid.uuid4()}.png"
-            local_output = f"/tmp/{uuid.uuid4()}.mp4"
+        with timed(metrics, "load"):
+            pipe = get_wan_i2v_pipeline()
+
+            # Load LoRAs if specified
+            if lora_names:
+                load_loras(pipe, lora_names)
+
+        # The next input downloads, and the previous video encodes and uploads,
+        # while this one generates. One pending video bounds frames held in memory.
+        with (
+            closing(prefetch(input_keys, lambda key: _load_input(key, width, height, metrics), depth=1)) as loaded,
+            Uploader(workers=1, max_pending=1) as uploader,
+        ):
+            for index, image in enumerate(loaded):
+                print(f"Generating I2V: {num_frames} frames at {width}x{height}")
+                print(f"Prompt: {prompt}")
+
+                # Generate video
+                with timed(metrics, "inference"):
+                    output = pipe(
+                        image=image,
+                        prompt=prompt,
+                        negative_prompt=negative_prompt,
+                        num_frames=num_frames,
+                        guidance_scale=guidance_scale,
+                        num_inference_steps=num_inference_steps,
+                        generator=generator,
+                        callback_on_step_end=(
+                            make_step_callback(progress_callback, index, len(input_keys))
+                            if progress_callback else None
+                        ),
+                    )
+                add_work(metrics, width=width, height=height, frames=num_frames, steps=num_inference_steps)
+
+                output_key = f"{output_prefix}{uuid.uuid4()}.mp4"
+                uploader.submit(_save_video, output.frames[0], output_key, fps, metrics)
+
+                outputs.append({
+                    "key": output_key,
+                    "type": "video",
+                    "mode": "i2v",
+                    "fps": fps,
+                    "num_frames": num_frames,
+                })
 
-            # Download input image
-            download(key, local_input)
-
-            # Load and prepare image
-            image = Image.open(local_input).convert("RGB")
+    else:
+        # Text-to-Video mode
+        print(f"Running Text-to-Video")
+        with timed(metrics, "load"):
+            pipe = get_wan_t2v_pipeline()
 
-            # Resize to target dimensions
-            image = image.resize((width, height), Image.LANCZOS)
+            # Load LoRAs if specified
+            if lora_names:
+                load_loras(pipe, lora_names)
 
-            print(f"Generating I2V: {num_frames} frames at {width}x{height}")
-            print(f"Prompt: {prompt}")
+        print(f"Generating T2V: {num_frames} frames at {width}x{height}")
+        print(f"Prompt: {prompt}")
 
-            # Generate video
+        # Generate video
+        with timed(metrics, "inference"):
             output = pipe(
-                image=image,
                 prompt=prompt,
                 negative_prompt=negative_prompt,
                 num_frames=num_frames,
+                width=width,
+                height=height,
                 guidance_scale=guidance_scale,
                 num_inference_steps=num_inference_steps,
                 generator=generator,
+                callback_on_step_end=make_step_callback(progress_callback, 0, 1) if progress_callback else None,
             )
+        add_work(metrics, width=width, height=height, frames=num_frames, steps=num_inference_steps)
 
-            # Export video
-            frames = output.frames[0]
-            export_video(frames, local_output, fps=fps)
-
-            # Upload to R2
-            output_key = f"{output_prefix}{uuid.uuid4()}.mp4"
-            upload(local_output, output_key)
-
-            outputs.append({
-                "key": output_key,
-                "type": "video",
-                "mode": "i2v",
-                "fps": fps,
-                "num_frames": num_frames,
-            })
-
-            # Cleanup
-            os.remove(local_input)
-            os.remove(local_output)
-
-            print(f"I2V video generated: {output_key}")
-
-    else:
-        # Text-to-Video mode
-        print(f"Running Text-to-Video")
-        pipe = get_wan_t2v_pipeline()
-
-        # Load LoRAs if specified
-        if lora_names:
-            load_loras(pipe, lora_names)
-
-        local_output = f"/tmp/{uuid.uuid4()}.mp4"
-
-        print(f"Generating T2V: {num_frames} frames at {width}x{height}")
-        print(f"Prompt: {prompt}")
-
-        # Generate video
-        output = pipe(
-            prompt=prompt,
-            negative_prompt=negative_prompt,
-            num_frames=num_frames,
-            width=width,
-            height=height,
-            guidance_scale=guidance_scale,
-            num_inference_steps=num_inference_steps,
-            generator=generator,
-        )
-
-        # Export video
-        frames = output.frames[0]
-        export_video(frames, local_output, fps=fps)
-
-        # Upload to R2
+        # Export and upload
         output_key = f"{output_prefix}{uuid.uuid4()}.mp4"
-        upload(local_output, output_key)
+        _save_video(output.frames[0], output_key, fps, metrics)
 
         outputs.append({
             "key": output_key,
@@ -311,9 +322,6 @@ def run_video_inference(
             "num_frames": num_frames,
         })
 
-        # Cleanup
-        os.remove(local_output)
-
         print(f"T2V video generated: {output_key}")
 
     return outputs
@@ -1,6 +1,20 @@
+import os
 import runpod
-from inference import run_inference
-from video_inference import run_video_inference
+import lora_store
+
+# Which job types this worker image serves: "image", "video" or "all".
+# Must match the API's RUNPOD_ROUTES so an endpoint only gets jobs it can run.
+# An image-only worker never imports video_inference (no Wan pipelines, no HF login).
+WORKER_ROLE = os.environ.get("WORKER_ROLE", "all")
+VIDEO_JOB_TYPES = {"img2vid", "txt2vid"}
+
+if WORKER_ROLE not in ("all", "image", "video"):
+    raise ValueError(f"Unknown WORKER_ROLE: {WORKER_ROLE}")
+
+if WORKER_ROLE in ("all", "image"):
+    from inference import run_inference
+if WORKER_ROLE in ("all", "video"):
+    from video_inference import run_video_inference
 
 def handler(event):
     """
@@ -29,12 +43,27 @@ def handler(event):
         params["prompt"] = prompt
         params["lora_names"] = lora_names  # Pass LoRAs to video inference too
 
+        is_video = job_type in VIDEO_JOB_TYPES
+        if (is_video and WORKER_ROLE == "image") or (not is_video and WORKER_ROLE == "video"):
+            raise ValueError(f"{job_type} job routed to a {WORKER_ROLE}-only worker")
+
         print(f"Processing {job_type} job {job_id} for user {user_id}")
         print(f"Model: {model_name}, LoRAs: {lora_names}")
         print(f"Prompt: {prompt}")
         print(f"Input keys: {input_keys}")
 
-        if job_type in ["img2vid", "txt2vid"]:
+        last_progress = {"value": -1}
+
+        def report_progress(pct):
+            # Surfaces in RunPod /status output; throttle to 5% steps
+            if pct >= last_progress["value"] + 5 or pct >= 100:
+                last_progress["value"] = pct
+                runpod.serverless.progress_update(event, {"progress": pct})
+
+        # Per-phase seconds and work units; the API fits its cost model on these
+        metrics = {}
+
+        if is_video:
             # Video generation with Wan 2.1
             # For txt2vid, input_keys should be empty
             results = run_video_inference(
@@ -43,6 +72,8 @@ def handler(event):
                 input_keys=input_keys if job_type == "img2vid" else [],
                 output_prefix=output_prefix,
                 params=params,
+                progress_callback=report_progress,
+                metrics=metrics,
             )
         else:
             # Default: Image to image with SD 1.5
@@ -54,15 +85,20 @@ def handler(event):
                 model_name=model_name,
                 lora_names=lora_names,
                 params=params,
+                progress_callback=report_progress,
+                metrics=metrics,
             )
 
         print(f"Job {job_id} completed with {len(results)} outputs")
+        # Process-lifetime counters, so hit rates can be read off any recent job
+        metrics["lora_cache"] = dict(lora_store.stats)
 
         return {
             "status": "success",
             "job_id": job_id,
             "job_type": job_type,
-            "outputs": results
+            "outputs": results,
+            "metrics": metrics,
         }
     except Exception as e:
         print(f"Error processing job: {str(e)}")